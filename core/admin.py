@@ -1,11 +1,28 @@
-from django.contrib import admin
+from datetime import timedelta
+
+from django.contrib import admin, messages
 from django.contrib.admin.models import LogEntry
+from django.contrib.admin.views.main import PAGE_VAR
+from django.core.exceptions import PermissionDenied, ValidationError
+from django.http import FileResponse, Http404, HttpResponse
+from django.shortcuts import get_object_or_404, redirect
+from django.template.response import TemplateResponse
 from django.utils.html import format_html
-from django.urls import reverse
-from .forms import ItemVendaInlineForm
-from .models import Produto, Estoque, Venda, ItemVenda
+from django.urls import path, reverse
+from django.utils.dateparse import parse_date
+from django.utils.timezone import localdate
+from .forms import ItemVendaInlineFormSet, ImportacaoEstoqueForm
+from .busca import filtrar_produtos
+from .importacao import ImportacaoInvalida, importar_estoque, ler_arquivo
+from .paginacao import PaginadorEstimado
+from .relatorios import LIMITE_PRODUTOS, relatorio_periodo
+from .reposicao import COLUNAS as COLUNAS_REPOSICAO, escrever_csv, relatorio_reposicao
+from .models import (
+    Produto, Estoque, Venda, ItemVenda, Exportacao, MovimentoEstoque, RelatorioPeriodo, EstoqueInsuficiente,
+)
 from import_export.admin import ExportMixin, ImportMixin
 from .resources import VendaResource, ItemVendaResource, EstoqueResource
+from .services import registrar_venda
 
 # Personaliza o título e cabeçalho da interface do Django Admin
 admin.site.site_header = "Gestão de vendas e estoque"
@@ -13,11 +30,31 @@ admin.site.site_title = "Gestão de vendas e estoque"
 admin.site.index_title = "Bem-vindo à Gestão de vendas e estoque"
 
 
+class PaginacaoEstimadaMixin:
+    """Listagem de tabela grande: contagem limitada pelo PaginadorEstimado e sem o segundo COUNT(*) ao filtrar."""
+
+    paginator = PaginadorEstimado
+    show_full_result_count = False
+
+    def get_paginator(self, request, queryset, per_page, orphans=0, allow_empty_first_page=True):
+        # A página pedida define até onde contar, para que a navegação passe do limite de contagem
+        try:
+            pagina = max(1, int(request.GET.get(PAGE_VAR, 1)))
+        except ValueError:
+            pagina = 1
+        return self.paginator(queryset, per_page, orphans, allow_empty_first_page, pagina=pagina)
+
+
 @admin.register(LogEntry)
-class LogEntryAdmin(admin.ModelAdmin):
+class LogEntryAdmin(PaginacaoEstimadaMixin, admin.ModelAdmin):
     list_display = ('action_time', 'user', 'content_type', 'object_link', 'action_flag', 'change_message')
     list_filter = ('user', 'content_type', 'action_flag')
     search_fields = ('object_repr', 'change_message')
+    list_per_page = 50
+
+    def get_queryset(self, request):
+        # object_link usa o content_type de cada linha
+        return super().get_queryset(request).select_related('content_type', 'user')
 
     def object_link(self, obj):
         if obj.action_flag == 3:  # DELETED
@@ -41,39 +78,306 @@ class LogEntryAdmin(admin.ModelAdmin):
         return False  # Impede editar
 
 
+class ExportacaoEmSegundoPlanoMixin:
+    """Adiciona a ação que agenda a exportação dos registros selecionados para o worker."""
+
+    recurso_exportacao = None
+    actions = ['exportar_em_segundo_plano']
+
+    @admin.action(description="Exportar selecionados em segundo plano (CSV)")
+    def exportar_em_segundo_plano(self, request, queryset):
+        exportacao = Exportacao.objects.create(
+            usuario=request.user,
+            recurso=self.recurso_exportacao,
+            ids=list(queryset.values_list('pk', flat=True)),
+        )
+        self.message_user(
+            request,
+            f"{exportacao} agendada. O arquivo ficará disponível em Exportações quando for concluído.",
+            messages.SUCCESS,
+        )
+
+
+@admin.register(Exportacao)
+class ExportacaoAdmin(admin.ModelAdmin):
+    list_display = ['id', 'recurso', 'formato', 'usuario', 'status', 'progresso', 'duracao', 'criada_em', 'link_arquivo']
+    list_filter = ['status', 'recurso', 'formato']
+    fields = ['recurso', 'formato', 'inicio', 'fim']
+    readonly_fields = ['usuario', 'status', 'progresso', 'duracao', 'erro', 'criada_em', 'iniciada_em', 'concluida_em',
+                       'link_arquivo']
+
+    def get_fields(self, request, obj=None):
+        if obj:
+            return self.fields + self.readonly_fields
+        return self.fields
+
+    def get_readonly_fields(self, request, obj=None):
+        if obj:
+            return self.fields + self.readonly_fields
+        return []
+
+    def save_model(self, request, obj, form, change):
+        if not obj.pk:
+            obj.usuario = request.user
+        super().save_model(request, obj, form, change)
+
+    def has_change_permission(self, request, obj=None):
+        return False  # Exportações não são editadas, apenas criadas
+
+    def get_urls(self):
+        return [
+            path('<int:pk>/baixar/', self.admin_site.admin_view(self.baixar), name='core_exportacao_baixar'),
+        ] + super().get_urls()
+
+    def baixar(self, request, pk):
+        exportacao = get_object_or_404(Exportacao, pk=pk, status='CONCLUIDA')
+        if not self.has_view_permission(request, exportacao) or not exportacao.arquivo:
+            raise Http404("Arquivo não disponível.")
+        return FileResponse(exportacao.arquivo.open('rb'), as_attachment=True,
+                            filename=exportacao.arquivo.name.rsplit('/', 1)[-1])
+
+    @admin.display(description='Progresso')
+    def progresso(self, obj):
+        if obj.total_linhas:
+            return f"{obj.linhas_processadas}/{obj.total_linhas} ({obj.linhas_processadas * 100 // obj.total_linhas}%)"
+        return obj.linhas_processadas
+
+    @admin.display(description='Arquivo')
+    def link_arquivo(self, obj):
+        if obj.status != 'CONCLUIDA':
+            return '-'
+        return format_html('<a href="{}">Baixar</a>', reverse('admin:core_exportacao_baixar', args=[obj.pk]))
+
+
 @admin.register(Produto)
 class ProdutoAdmin(ExportMixin, admin.ModelAdmin):
     list_display = ['nome', 'codigo_barras', 'preco']
     search_fields = ['nome', 'codigo_barras']
+    ordering = ['nome']
+
+    def get_search_results(self, request, queryset, search_term):
+        # Usa o índice de busca de produtos (core/busca.py) em vez de LIKE '%termo%' em cada coluna
+        queryset, may_have_duplicates = filtrar_produtos(queryset, search_term), False
+
+        # No autocomplete do item de venda só aparecem produtos com estoque
+        if request.GET.get('model_name') == 'itemvenda' and request.GET.get('field_name') == 'produto':
+            queryset = queryset.filter(estoque__quantidade__gt=0)
+        return queryset, may_have_duplicates
 
 
 @admin.register(Estoque)
-class EstoqueAdmin(ExportMixin, admin.ModelAdmin):
+class EstoqueAdmin(ExportacaoEmSegundoPlanoMixin, ExportMixin, admin.ModelAdmin):
     resource_class = EstoqueResource
+    recurso_exportacao = 'estoque'
     list_display = ['produto', 'quantidade']
     search_fields = ['produto__nome', 'produto__codigo_barras']
+    list_per_page = 100
+    import_export_change_list_template = 'admin/core/estoque/change_list.html'  # Acrescenta o botão de importação
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('produto')
+
+    def get_search_results(self, request, queryset, search_term):
+        return filtrar_produtos(queryset, search_term, campo='produto_id'), False
+
+    def save_model(self, request, obj, form, change):
+        # A edição manual entra no livro de movimentos como a diferença para o valor gravado
+        anterior = 0
+        if change:
+            anterior = Estoque.objects.select_for_update().values_list('quantidade', flat=True).get(pk=obj.pk)
+        super().save_model(request, obj, form, change)
+        if obj.quantidade != anterior:
+            MovimentoEstoque.objects.create(
+                produto_id=obj.produto_id,
+                tipo='AJUSTE' if change else 'REPOSICAO',
+                quantidade=obj.quantidade - anterior,
+                usuario=request.user,
+                observacao="Alteração pelo admin",
+            )
+
+    def delete_queryset(self, request, queryset):
+        MovimentoEstoque.objects.bulk_create([
+            MovimentoEstoque(produto_id=produto_id, tipo='AJUSTE', quantidade=-quantidade, usuario=request.user,
+                             observacao="Estoque excluído pelo admin")
+            for produto_id, quantidade in queryset.exclude(quantidade=0).values_list('produto_id', 'quantidade')
+        ])
+        super().delete_queryset(request, queryset)
+
+    def delete_model(self, request, obj):
+        self.delete_queryset(request, Estoque.objects.filter(pk=obj.pk))
+
+    def get_urls(self):
+        return [
+            path('importar/', self.admin_site.admin_view(self.importar), name='core_estoque_importar'),
+            path('reposicao/', self.admin_site.admin_view(self.reposicao), name='core_estoque_reposicao'),
+        ] + super().get_urls()
+
+    def reposicao(self, request):
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+
+        def numero(nome, padrao, tipo=int):
+            try:
+                return max(tipo(request.GET.get(nome, padrao)), 0)
+            except ValueError:
+                return padrao
+
+        dias, limiar, cobertura = max(numero('dias', 30), 1), numero('limiar', 7, float), numero('cobertura', 30)
+        todos = bool(request.GET.get('todos'))
+        relatorio = relatorio_reposicao(dias, limiar, cobertura, apenas_criticos=not todos)
+
+        if request.GET.get('formato') == 'csv':
+            resposta = HttpResponse(content_type='text/csv; charset=utf-8')
+            resposta['Content-Disposition'] = 'attachment; filename="reposicao.csv"'
+            escrever_csv(relatorio, resposta)
+            return resposta
+
+        return TemplateResponse(request, 'admin/core/estoque/reposicao.html', {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': "Reposição de estoque",
+            'relatorio': relatorio,
+            'colunas': COLUNAS_REPOSICAO,
+            'dias': dias,
+            'limiar': limiar,
+            'cobertura': cobertura,
+            'todos': todos,
+        })
+
+    def importar(self, request):
+        if not self.has_change_permission(request) or not self.has_add_permission(request):
+            raise PermissionDenied
+
+        form = ImportacaoEstoqueForm(request.POST or None, request.FILES or None)
+        erros = []
+        if form.is_valid():
+            arquivo = form.cleaned_data['arquivo']
+            try:
+                resultado = importar_estoque(
+                    ler_arquivo(arquivo, arquivo.name),
+                    form.cleaned_data['modo'],
+                    tudo_ou_nada=form.cleaned_data['tudo_ou_nada'],
+                    usuario=request.user,
+                )
+            except ImportacaoInvalida as erro:
+                self.message_user(request, str(erro), messages.ERROR)
+                erros = erro.erros
+            else:
+                erros = resultado['erros']
+                self.message_user(
+                    request,
+                    f"{resultado['atualizados']} estoques atualizados e {resultado['criados']} criados.",
+                    messages.SUCCESS,
+                )
+                if not erros:
+                    return redirect('admin:core_estoque_changelist')
+                self.message_user(request, f"{len(erros)} linha(s) não foram importadas.", messages.WARNING)
+
+        return TemplateResponse(request, 'admin/core/estoque/importar.html', {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': "Importar estoque",
+            'form': form,
+            'erros': erros[:500],  # O suficiente para corrigir o arquivo sem gerar uma página gigante
+        })
+
+
+@admin.register(MovimentoEstoque)
+class MovimentoEstoqueAdmin(PaginacaoEstimadaMixin, admin.ModelAdmin):
+    list_display = ['criado_em', 'produto', 'tipo', 'quantidade', 'venda', 'usuario', 'observacao']
+    list_filter = ['tipo', 'criado_em']
+    search_fields = ['produto__nome', 'produto__codigo_barras', 'observacao']
+    list_select_related = ['produto', 'venda', 'usuario']
+    list_per_page = 100
+
+    # O livro é só de inserção: os movimentos são gerados pelas vendas, importações e ajustes
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
 
 
 class ItemVendaInline(admin.TabularInline):
     model = ItemVenda
-    form = ItemVendaInlineForm  # <- Usando o form com o label personalizado
+    formset = ItemVendaInlineFormSet
     extra = 1
     readonly_fields = ['preco_unitario']
+    # O select do produto é carregado sob demanda pela busca do admin, em vez de embutir o catálogo em cada linha
+    autocomplete_fields = ['produto']
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        # Chamado uma vez por formset: o mesmo queryset de produtos com estoque valida todas as linhas
+        if db_field.name == 'produto':
+            kwargs['queryset'] = Produto.objects.filter(estoque__quantidade__gt=0)
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+    def formfield_for_dbfield(self, db_field, request, **kwargs):
+        # PositiveIntegerField aceita 0, mas um item de venda precisa de pelo menos uma unidade
+        if db_field.name == 'quantidade':
+            kwargs['min_value'] = 1
+        return super().formfield_for_dbfield(db_field, request, **kwargs)
 
 
 @admin.register(Venda)
-class VendaAdmin(ExportMixin, admin.ModelAdmin):
+class VendaAdmin(ExportacaoEmSegundoPlanoMixin, ExportMixin, admin.ModelAdmin):
     resource_class = VendaResource  # <-- Aqui está a mágica
+    recurso_exportacao = 'vendas'
     inlines = [ItemVendaInline]
     readonly_fields = ['data', 'usuario']
+    # valor_total é gravado na própria venda, então já é ordenável sem anotar a soma dos itens
     list_display = ['id', 'data', 'usuario', 'forma_pagamento', 'valor_total']
     list_filter = ['data', 'usuario', 'forma_pagamento']
+    list_per_page = 50
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('usuario')
+
+    def changeform_view(self, request, object_id=None, form_url='', extra_context=None):
+        try:
+            return super().changeform_view(request, object_id, form_url, extra_context)
+        except EstoqueInsuficiente as erro:
+            # Outro caixa consumiu o estoque entre a validação e a gravação: a transação já foi desfeita,
+            # então o formulário é montado de novo com os mesmos dados e o erro nos itens
+            request.erro_estoque = erro.messages
+            return super().changeform_view(request, object_id, form_url, extra_context)
+
+    def get_formset_kwargs(self, request, obj, inline, prefix):
+        kwargs = super().get_formset_kwargs(request, obj, inline, prefix)
+        if isinstance(inline, ItemVendaInline) and getattr(request, 'erro_estoque', None):
+            kwargs['erro_estoque'] = request.erro_estoque
+        return kwargs
 
     def save_model(self, request, obj, form, change):
         if not obj.pk:
             obj.usuario = request.user  # Atribui o usuário logado ao criar a venda
+            return  # A venda nova é gravada junto com os itens em save_related
         super().save_model(request, obj, form, change)
 
+    def save_related(self, request, form, formsets, change):
+        if change:
+            return super().save_related(request, form, formsets, change)
+
+        # Grava a venda e todos os itens do inline de uma vez
+        itens = [
+            (item_form.cleaned_data['produto'], item_form.cleaned_data['quantidade'])
+            for formset in formsets
+            for item_form in formset.forms
+            if item_form.has_changed() and item_form.cleaned_data.get('produto')
+            and not item_form.cleaned_data.get('DELETE')
+        ]
+        venda = registrar_venda(form.instance.usuario, form.instance.forma_pagamento, itens, venda=form.instance)
+
+        # Preenche o que o admin espera de um formset salvo, para o histórico (LogEntry)
+        for formset in formsets:
+            formset.new_objects = list(venda.itens.select_related('produto'))
+            formset.changed_objects = []
+            formset.deleted_objects = []
+
     def has_change_permission(self, request, obj=None):
         if obj:  # Se a venda já existe
             return False  # Impede editar completamente
@@ -81,14 +385,75 @@ class VendaAdmin(ExportMixin, admin.ModelAdmin):
 
 
 @admin.register(ItemVenda)
-class ItemVendaAdmin(ExportMixin, admin.ModelAdmin):
+class ItemVendaAdmin(PaginacaoEstimadaMixin, ExportacaoEmSegundoPlanoMixin, ExportMixin, admin.ModelAdmin):
     resource_class = ItemVendaResource
+    recurso_exportacao = 'itens'
     list_display = ['venda', 'produto', 'quantidade', 'preco_unitario']
     search_fields = ['produto__nome', 'venda__id', 'venda__usuario__username']
     readonly_fields = ['venda', 'produto', 'quantidade', 'preco_unitario']  # Só leitura no detalhe
+    list_per_page = 50
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('venda', 'produto')
 
     def has_add_permission(self, request):
         return False  # Impede adicionar
 
     def has_change_permission(self, request, obj=None):
         return False  # Impede editar
+
+
+@admin.register(RelatorioPeriodo)
+class RelatorioPeriodoAdmin(admin.ModelAdmin):
+    list_display = ['__str__', 'limite_produtos', 'gerado_em', 'link_relatorio']
+    date_hierarchy = 'inicio'
+    change_list_template = 'admin/core/relatorioperiodo/change_list.html'
+
+    # Os relatórios são guardados por relatorio_periodo; excluir um força o recálculo na próxima consulta
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        return [
+            path('relatorio/', self.admin_site.admin_view(self.relatorio), name='core_relatorioperiodo_relatorio'),
+        ] + super().get_urls()
+
+    @admin.display(description='Relatório')
+    def link_relatorio(self, obj):
+        url = reverse('admin:core_relatorioperiodo_relatorio')
+        return format_html('<a href="{}?inicio={}&fim={}&produtos={}">Abrir</a>', url, obj.inicio, obj.fim,
+                           obj.limite_produtos)
+
+    def relatorio(self, request):
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+
+        # Sem datas, o mês passado: o relatório de fechamento mais pedido
+        fim_padrao = localdate().replace(day=1) - timedelta(days=1)
+        inicio = parse_date(request.GET.get('inicio', '')) or fim_padrao.replace(day=1)
+        fim = parse_date(request.GET.get('fim', '')) or fim_padrao
+        try:
+            produtos = int(request.GET.get('produtos', LIMITE_PRODUTOS))
+        except ValueError:
+            produtos = LIMITE_PRODUTOS
+
+        relatorio, erro = None, None
+        try:
+            relatorio = relatorio_periodo(inicio, fim, produtos, recalcular=bool(request.GET.get('recalcular')))
+        except ValidationError as excecao:
+            erro = excecao.messages[0]
+
+        return TemplateResponse(request, 'admin/core/relatorioperiodo/relatorio.html', {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': "Relatório de vendas do período",
+            'relatorio': relatorio,
+            'erro': erro,
+            'inicio': inicio,
+            'fim': fim,
+            'produtos': produtos,
+        })
+
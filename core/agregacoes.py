@@ -0,0 +1,49 @@
+"""Métricas de vendas de várias janelas de tempo calculadas numa única passada no banco.
+
+Cada janela é um par de datas ``(inicio, fim)`` com fim exclusivo; qualquer um dos dois pode ser
+None (sem limite). Para um novo indicador basta acrescentar uma janela, sem consultas extras.
+O resultado de cada janela tem o formato::
+
+    {'valor': Decimal, 'itens': int, 'vendas': int, 'formas': {forma_pagamento: vendas}}
+"""
+from django.db.models import F, Q, Sum
+
+from .models import VendaDiaria
+
+
+def _filtro_janela(campo, janela):
+    inicio, fim = janela
+    filtro = Q()
+    if inicio is not None:
+        filtro &= Q(**{f'{campo}__gte': inicio})
+    if fim is not None:
+        filtro &= Q(**{f'{campo}__lt': fim})
+    return filtro
+
+
+def _consolidar(linhas, janelas):
+    """Soma as linhas agrupadas por forma de pagamento em totais por janela."""
+    resultado = {nome: {'valor': 0, 'itens': 0, 'vendas': 0, 'formas': {}} for nome in janelas}
+    for linha in linhas:
+        for nome, metricas in resultado.items():
+            vendas = linha[f'{nome}__vendas'] or 0
+            metricas['valor'] += linha[f'{nome}__valor'] or 0
+            metricas['itens'] += linha[f'{nome}__itens'] or 0
+            metricas['vendas'] += vendas
+            if vendas:
+                metricas['formas'][linha['forma']] = vendas
+    return resultado
+
+
+def agregar_resumo(janelas):
+    """Métricas por janela a partir do resumo diário (VendaDiaria). Uma consulta."""
+    anotacoes = {}
+    for nome, janela in janelas.items():
+        filtro = _filtro_janela('data', janela)
+        anotacoes[f'{nome}__valor'] = Sum('valor_total', filter=filtro)
+        anotacoes[f'{nome}__itens'] = Sum('quantidade_itens', filter=filtro)
+        anotacoes[f'{nome}__vendas'] = Sum('quantidade_vendas', filter=filtro)
+
+    linhas = VendaDiaria.objects.values(forma=F('forma_pagamento')).annotate(**anotacoes).order_by('forma')
+    return _consolidar(linhas, janelas)
+
@@ -0,0 +1,205 @@
+"""Séries temporais de vendas (receita, quantidade, vendas e ticket médio) agrupadas por período.
+
+O agrupamento por período (Trunc*) e as somas ficam no banco; em Python só se completa os períodos
+sem venda e calcula a média móvel (por somas acumuladas) e a variação em relação ao período anterior.
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from itertools import accumulate
+
+from django.core.exceptions import ValidationError
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum
+from django.db.models.functions import TruncDay, TruncHour, TruncMonth, TruncWeek
+from django.utils.timezone import localtime, make_aware
+
+from .models import ItemVenda, Venda, VendaDiaria
+
+GRANULARIDADES = ('hora', 'dia', 'semana', 'mes')
+DIMENSOES = ('forma_pagamento', 'produto')
+MAXIMO_PERIODOS = 10000
+
+_TRUNC = {'hora': TruncHour, 'dia': TruncDay, 'semana': TruncWeek, 'mes': TruncMonth}
+
+
+def _inicio_periodo(dia, granularidade):
+    if granularidade == 'semana':
+        return dia - timedelta(days=dia.weekday())
+    if granularidade == 'mes':
+        return dia.replace(day=1)
+    return dia
+
+
+def _quantidade_periodos(inicio, fim, granularidade):
+    """Quantos períodos _periodos geraria, sem montar a lista."""
+    if granularidade == 'mes':
+        return (fim.year - inicio.year) * 12 + fim.month - inicio.month + 1
+    if granularidade == 'semana':
+        return (fim - _inicio_periodo(inicio, granularidade)).days // 7 + 1
+    dias = (fim - inicio).days + 1
+    return dias * 24 if granularidade == 'hora' else dias
+
+
+def _periodos(inicio, fim, granularidade):
+    """Todos os períodos entre inicio e fim (datas, inclusive), inclusive os sem venda."""
+    if granularidade == 'hora':
+        atual = datetime.combine(inicio, time.min)
+        limite = datetime.combine(fim + timedelta(days=1), time.min)
+        passo = timedelta(hours=1)
+    else:
+        atual = _inicio_periodo(inicio, granularidade)
+        limite = fim + timedelta(days=1)
+        passo = timedelta(weeks=1) if granularidade == 'semana' else timedelta(days=1)
+
+    periodos = []
+    while atual < limite:
+        periodos.append(atual)
+        if granularidade == 'mes':
+            atual = (atual + timedelta(days=32)).replace(day=1)
+        else:
+            atual += passo
+    return periodos
+
+
+def _chave(valor, granularidade):
+    """Normaliza o período vindo do banco (date ou datetime com fuso) para a chave usada na série."""
+    if isinstance(valor, datetime):
+        valor = localtime(valor) if valor.tzinfo else valor
+        return valor.replace(minute=0, second=0, microsecond=0, tzinfo=None) if granularidade == 'hora' else valor.date()
+    return valor
+
+
+def _linhas_resumo(inicio, fim, granularidade, dimensao):
+    """Agrupamento a partir do resumo diário: bem mais leve quando não é preciso abrir por produto ou hora."""
+    periodo = F('data') if granularidade == 'dia' else _TRUNC[granularidade]('data')
+    campos = {'periodo': periodo}
+    if dimensao:
+        campos['serie'] = F('forma_pagamento')
+    return VendaDiaria.objects.filter(data__gte=inicio, data__lte=fim).values(**campos).annotate(
+        receita=Sum('valor_total'),
+        quantidade=Sum('quantidade_itens'),
+        vendas=Sum('quantidade_vendas'),
+    ).order_by()
+
+
+def _intervalo(inicio, fim):
+    return make_aware(datetime.combine(inicio, time.min)), make_aware(datetime.combine(fim + timedelta(days=1), time.min))
+
+
+def _linhas_vendas(inicio, fim, granularidade, dimensao):
+    """Agrupamento sobre as vendas, que já guardam valor e quantidade de itens: dispensa o join com os itens."""
+    de, ate = _intervalo(inicio, fim)
+    campos = {'periodo': _TRUNC[granularidade]('data')}
+    if dimensao:
+        campos['serie'] = F('forma_pagamento')
+    return Venda.objects.filter(data__gte=de, data__lt=ate).values(**campos).annotate(
+        receita=Sum('valor_total'),
+        quantidade=Sum('quantidade_itens'),
+        vendas=Count('id'),
+    ).order_by()
+
+
+def _linhas_produtos(inicio, fim, granularidade, limite_series):
+    """Agrupamento por produto, restrito aos ``limite_series`` produtos de maior receita no intervalo."""
+    de, ate = _intervalo(inicio, fim)
+    valor = DecimalField(max_digits=14, decimal_places=2)
+    receita = Sum(ExpressionWrapper(F('quantidade') * F('preco_unitario'), output_field=valor), output_field=valor)
+    itens = ItemVenda.objects.filter(venda__data__gte=de, venda__data__lt=ate)
+
+    # Escolher os produtos antes evita truncar a data de todos os itens do intervalo
+    maiores = itens.values('produto_id').annotate(receita=receita).order_by('-receita')[:limite_series]
+    # A série é o id do produto: produtos com o mesmo nome não podem ser somados; o nome vai como rótulo
+    return itens.filter(produto_id__in=[linha['produto_id'] for linha in maiores]).values(
+        periodo=_TRUNC[granularidade]('venda__data'),
+        serie=F('produto_id'),
+        rotulo=F('produto__nome'),
+    ).annotate(
+        receita=receita,
+        quantidade=Sum('quantidade'),
+        vendas=Count('venda', distinct=True),
+    ).order_by()
+
+
+def _media_movel(valores, janela):
+    """Média dos últimos ``janela`` valores em cada posição, usando somas acumuladas."""
+    acumulado = [0, *accumulate(valores)]
+    return [
+        (acumulado[i + 1] - acumulado[max(0, i + 1 - janela)]) / min(i + 1, janela)
+        for i in range(len(valores))
+    ]
+
+
+def _variacao(valores):
+    """Variação percentual de cada período sobre o anterior (None quando o anterior é zero)."""
+    return [None] + [
+        round((atual - anterior) * 100 / anterior, 2) if anterior else None
+        for anterior, atual in zip(valores, valores[1:])
+    ]
+
+
+def _serie(rotulo, periodos, por_periodo, media_movel):
+    receita = [por_periodo.get(p, {}).get('receita') or Decimal('0') for p in periodos]
+    quantidade = [por_periodo.get(p, {}).get('quantidade') or 0 for p in periodos]
+    vendas = [por_periodo.get(p, {}).get('vendas') or 0 for p in periodos]
+    receita = [float(round(valor, 2)) for valor in receita]
+    return {
+        'rotulo': rotulo,
+        'receita': receita,
+        'quantidade': quantidade,
+        'vendas': vendas,
+        'ticket_medio': [round(r / v, 2) if v else None for r, v in zip(receita, vendas)],
+        'receita_media_movel': [round(valor, 2) for valor in _media_movel(receita, media_movel)],
+        'variacao_receita': _variacao(receita),
+        'total_receita': round(sum(receita), 2),
+    }
+
+
+def serie_vendas(inicio, fim, granularidade='dia', dimensao=None, media_movel=7, limite_series=10):
+    """Série de vendas entre ``inicio`` e ``fim`` (datas, inclusive) por período e, opcionalmente, por dimensão.
+
+    Com ``dimensao`` ('forma_pagamento' ou 'produto') volta uma série por valor da dimensão; para produtos
+    a chave é o id e o nome vai em ``rotulo``, e ficam só as ``limite_series`` de maior receita no intervalo. Levanta ValidationError para parâmetros inválidos.
+    """
+    if granularidade not in GRANULARIDADES:
+        raise ValidationError(f"Granularidade inválida: use {', '.join(GRANULARIDADES)}.")
+    if dimensao and dimensao not in DIMENSOES:
+        raise ValidationError(f"Dimensão inválida: use {', '.join(DIMENSOES)}.")
+    if fim < inicio:
+        raise ValidationError("A data final não pode ser anterior à inicial.")
+    if media_movel < 1:
+        raise ValidationError("A janela da média móvel deve ser de pelo menos 1 período.")
+    if limite_series < 1:
+        raise ValidationError("O limite de séries deve ser de pelo menos 1.")
+    # Conferido antes de gerar os períodos: um intervalo de séculos por hora levaria milhões de voltas
+    if _quantidade_periodos(inicio, fim, granularidade) > MAXIMO_PERIODOS:
+        raise ValidationError("Intervalo grande demais para essa granularidade.")
+
+    periodos = _periodos(inicio, fim, granularidade)
+
+    # Produto e hora não existem no resumo diário; o resto sai dele, sem varrer vendas nem itens
+    if dimensao == 'produto':
+        linhas = _linhas_produtos(inicio, fim, granularidade, limite_series)
+    elif granularidade == 'hora':
+        linhas = _linhas_vendas(inicio, fim, granularidade, dimensao)
+    else:
+        linhas = _linhas_resumo(inicio, fim, granularidade, dimensao)
+
+    agrupado, rotulos = {}, {}
+    for linha in linhas:
+        serie = str(linha.get('serie', 'total'))
+        rotulos[serie] = linha.get('rotulo', serie)
+        agrupado.setdefault(serie, {})[_chave(linha['periodo'], granularidade)] = linha
+
+    series = {
+        serie: _serie(rotulos[serie], periodos, por_periodo, media_movel) for serie, por_periodo in agrupado.items()
+    }
+    if not dimensao and not series:
+        series = {'total': _serie('total', periodos, {}, media_movel)}
+
+    return {
+        'inicio': inicio.isoformat(),
+        'fim': fim.isoformat(),
+        'granularidade': granularidade,
+        'dimensao': dimensao,
+        'periodos': [periodo.isoformat() for periodo in periodos],
+        'series': dict(sorted(series.items(), key=lambda item: (item[1]['rotulo'], item[0]))),
+    }
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from . import signals  # noqa: F401  (registra os receivers)
+        from . import middleware  # noqa: F401  (mede as consultas de toda conexão aberta daqui em diante)
@@ -0,0 +1,93 @@
+"""Busca de produtos por nome ou código de barras usando o índice criado na migração 0011.
+
+No SQLite o índice é a tabela FTS5 core_produto_busca (busca por prefixo de cada palavra); no
+PostgreSQL é o índice de trigramas em core_produto.nome (trecho do nome e semelhança, tolerando
+erros de digitação). Sem índice disponível, cai no icontains de sempre.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import Produto
+
+TABELA_FTS = 'core_produto_busca'
+_PALAVRA = re.compile(r'\w+')
+
+_indice_sqlite = {}
+
+
+def _tem_fts():
+    """Se a tabela FTS5 existe no banco atual (a migração pula a criação quando o SQLite não tem FTS5)."""
+    if connection.vendor != 'sqlite':
+        return False
+    nome = connection.settings_dict['NAME']
+    if nome not in _indice_sqlite:
+        _indice_sqlite[nome] = TABELA_FTS in connection.introspection.table_names()
+    return _indice_sqlite[nome]
+
+
+def expressao_fts(termo):
+    """Converte o texto digitado numa consulta FTS5: todas as palavras, cada uma como prefixo."""
+    return ' AND '.join(f'"{palavra}"*' for palavra in _PALAVRA.findall(termo))
+
+
+def filtrar_produtos(queryset, termo, campo='pk'):
+    """Restringe ``queryset`` aos produtos que casam com ``termo``; ``campo`` aponta para o id do produto."""
+    termo = termo.strip()
+    if not termo:
+        return queryset
+
+    if _tem_fts():
+        expressao = expressao_fts(termo)
+        if not expressao:
+            return queryset.none()
+        ids = RawSQL(f"SELECT rowid FROM {TABELA_FTS} WHERE {TABELA_FTS} MATCH %s", [expressao])
+        return queryset.filter(**{f'{campo}__in': ids})
+
+    # PostgreSQL usa o índice de trigramas no icontains; nos demais bancos é a varredura de antes
+    prefixo = '' if campo == 'pk' else campo.rsplit('_id', 1)[0] + '__'
+    return queryset.filter(
+        Q(**{f'{prefixo}nome__icontains': termo}) | Q(**{f'{prefixo}codigo_barras__startswith': termo})
+    )
+
+
+def buscar_produtos(termo, limite=20):
+    """Produtos mais relevantes para ``termo``, com preço e estoque, para a busca do caixa."""
+    termo = termo.strip()
+    if not termo:
+        return []
+
+    produtos = Produto.objects.values('id', 'codigo_barras', 'nome', 'preco', 'estoque__quantidade')
+    if _tem_fts():
+        expressao = expressao_fts(termo)
+        if not expressao:
+            return []
+        # A ordenação por relevância (bm25) só existe dentro da consulta FTS
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid FROM {TABELA_FTS} WHERE {TABELA_FTS} MATCH %s ORDER BY rank LIMIT %s",
+                [expressao, limite],
+            )
+            ids = [linha[0] for linha in cursor.fetchall()]
+        por_id = {linha['id']: linha for linha in produtos.filter(pk__in=ids)}
+        produtos = [por_id[produto_id] for produto_id in ids if produto_id in por_id]
+    elif connection.vendor == 'postgresql':
+        # word_similarity acha o termo dentro do nome mesmo com letras trocadas ou faltando
+        produtos = produtos.annotate(relevancia=RawSQL("word_similarity(%s, core_produto.nome)", [termo])).filter(
+            Q(codigo_barras__startswith=termo) | Q(pk__in=RawSQL("SELECT id FROM core_produto WHERE %s <%% nome", [termo]))
+        ).order_by('-relevancia', 'nome')[:limite]
+    else:
+        produtos = filtrar_produtos(produtos, termo).order_by('nome')[:limite]
+
+    return [
+        {
+            'id': linha['id'],
+            'codigo_barras': linha['codigo_barras'],
+            'nome': linha['nome'],
+            'preco': str(linha['preco']),
+            'estoque': linha['estoque__quantidade'] or 0,
+        }
+        for linha in produtos
+    ]
@@ -0,0 +1,105 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import Produto
+
+
+class CacheLRU:
+    """Cache LRU em memória do processo, seguro entre threads, com expiração por item."""
+
+    def __init__(self, tamanho_maximo, ttl):
+        self.tamanho_maximo = tamanho_maximo
+        self.ttl = ttl
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, chave):
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is None:
+                return None
+            valor, expira_em = item
+            if expira_em < time.monotonic():
+                del self._itens[chave]
+                return None
+            self._itens.move_to_end(chave)
+            return valor
+
+    def set(self, chave, valor):
+        with self._lock:
+            self._itens[chave] = (valor, time.monotonic() + self.ttl)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.tamanho_maximo:
+                self._itens.popitem(last=False)
+
+    def remover(self, chave):
+        with self._lock:
+            self._itens.pop(chave, None)
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+
+
+# O TTL limita por quanto tempo outro processo pode mostrar um estoque desatualizado;
+# a venda em si sempre confere o estoque no banco (ItemVenda.baixar_estoque).
+cache_produtos = CacheLRU(
+    getattr(settings, 'CATALOGO_CACHE_TAMANHO', 10000),
+    getattr(settings, 'CATALOGO_CACHE_TTL', 30),
+)
+
+# Código de barras em cache de cada produto, para invalidar pelo id
+_codigos_em_cache = {}
+
+
+def _consulta_codigo(codigo_barras):
+    return Produto.objects.filter(codigo_barras=codigo_barras).values(
+        'id', 'codigo_barras', 'nome', 'preco', 'estoque__quantidade'
+    )
+
+
+def _guardar(linha):
+    dados = {
+        'id': linha['id'],
+        'codigo_barras': linha['codigo_barras'],
+        'nome': linha['nome'],
+        'preco': str(linha['preco']),
+        'estoque': linha['estoque__quantidade'] or 0,
+    }
+    cache_produtos.set(dados['codigo_barras'], dados)
+    _codigos_em_cache[dados['id']] = dados['codigo_barras']
+    return dados
+
+
+def produto_por_codigo(codigo_barras):
+    """Dados do produto usados na leitura do código de barras no caixa, ou None se não existir."""
+    dados = cache_produtos.get(codigo_barras)
+    if dados is None:
+        linha = _consulta_codigo(codigo_barras).first()
+        dados = _guardar(linha) if linha else None
+    return dados
+
+
+async def aproduto_por_codigo(codigo_barras):
+    """Versão assíncrona de produto_por_codigo; o acerto no cache não sai do event loop."""
+    dados = cache_produtos.get(codigo_barras)
+    if dados is None:
+        linha = await _consulta_codigo(codigo_barras).afirst()
+        dados = _guardar(linha) if linha else None
+    return dados
+
+
+def invalidar_produtos(produto_ids):
+    """Remove os produtos do cache depois do commit da transação atual."""
+    def invalidar():
+        for produto_id in produto_ids:
+            codigo_barras = _codigos_em_cache.pop(produto_id, None)
+            if codigo_barras is not None:
+                cache_produtos.remover(codigo_barras)
+
+    produto_ids = list(produto_ids)
+    transaction.on_commit(invalidar)
@@ -0,0 +1,144 @@
+"""Instantâneo colunar (Parquet) dos itens vendidos, desnormalizado para análise.
+
+Cada linha é um item com a data, o usuário e a forma de pagamento da venda e o nome e o código de
+barras do produto. O arquivo é gravado em blocos (row groups) direto do iterator, mês a mês pelo
+índice de data da venda, sem montar a tabela inteira em memória. Depende do pyarrow, que é opcional
+(requirements-opcionais.txt).
+"""
+import os
+from datetime import date, datetime, time
+
+from django.utils import timezone
+
+from .models import ItemVenda, Venda
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+COMPRESSOES = ('zstd', 'snappy', 'gzip', 'none')
+NOME_ARQUIVO = 'itens.parquet'
+
+CAMPOS = ('venda_id', 'venda__data', 'venda__usuario__username', 'produto__nome', 'produto__codigo_barras',
+          'quantidade', 'preco_unitario', 'venda__forma_pagamento')
+
+
+def esquema():
+    return pa.schema([
+        ('venda_id', pa.int64()),
+        ('data', pa.timestamp('us', tz='UTC')),
+        ('usuario', pa.string()),
+        ('produto', pa.string()),
+        ('codigo_barras', pa.string()),
+        ('quantidade', pa.int32()),
+        ('preco_unitario', pa.decimal128(10, 2)),
+        ('subtotal', pa.decimal128(12, 2)),
+        ('forma_pagamento', pa.string()),
+    ])
+
+
+def _inicio_do_mes(ano, mes):
+    return timezone.make_aware(datetime.combine(date(ano, mes, 1), time.min))
+
+
+def _proximo(ano, mes):
+    return (ano + 1, 1) if mes == 12 else (ano, mes + 1)
+
+
+def meses(inicio, fim):
+    """Meses (ano, mês) do horário local entre os datetimes ``inicio`` e ``fim``, inclusive."""
+    inicio, fim = timezone.localtime(inicio), timezone.localtime(fim)
+    ano, mes = inicio.year, inicio.month
+    while (ano, mes) <= (fim.year, fim.month):
+        yield ano, mes
+        ano, mes = _proximo(ano, mes)
+
+
+def _itens_do_mes(ano, mes, tamanho_bloco):
+    """Itens do mês em blocos de colunas, na ordem da venda."""
+    itens = ItemVenda.objects.filter(
+        venda__data__gte=_inicio_do_mes(ano, mes), venda__data__lt=_inicio_do_mes(*_proximo(ano, mes)),
+    ).order_by('venda__data', 'venda_id', 'pk').values_list(*CAMPOS)
+
+    colunas = {nome: [] for nome in esquema().names}
+    for venda_id, data, usuario, produto, codigo_barras, quantidade, preco, forma in itens.iterator(tamanho_bloco):
+        colunas['venda_id'].append(venda_id)
+        colunas['data'].append(data)
+        colunas['usuario'].append(usuario)
+        colunas['produto'].append(produto)
+        colunas['codigo_barras'].append(codigo_barras)
+        colunas['quantidade'].append(quantidade)
+        colunas['preco_unitario'].append(preco)
+        colunas['subtotal'].append(quantidade * preco)
+        colunas['forma_pagamento'].append(forma)
+        if len(colunas['venda_id']) == tamanho_bloco:
+            yield colunas
+            colunas = {nome: [] for nome in colunas}
+    if colunas['venda_id']:
+        yield colunas
+
+
+def _gravar(escritor, blocos):
+    linhas = 0
+    for colunas in blocos:
+        escritor.write_table(pa.Table.from_pydict(colunas, schema=escritor.schema))
+        linhas += len(colunas['venda_id'])
+    return linhas
+
+
+def _escritor(caminho, compressao):
+    return pq.ParquetWriter(caminho, esquema(), compression=compressao)
+
+
+def particao(saida, ano, mes):
+    return os.path.join(saida, f"mes={ano:04d}-{mes:02d}")
+
+
+def gravar_instantaneo(saida, particionar=False, acrescentar=False, compressao='zstd', tamanho_bloco=50000):
+    """Grava o instantâneo e devolve {(ano, mês): linhas} do que foi escrito.
+
+    Sem ``particionar``, ``saida`` é um único arquivo com todas as vendas. Particionado, ``saida`` é um
+    diretório com uma partição mes=AAAA-MM por mês (no formato que pyarrow, DuckDB e Spark leem como
+    uma tabela só), e só entram meses fechados, porque o mês corrente ainda muda. Com ``acrescentar``,
+    os meses que já têm partição são pulados. Cada partição é gravada num arquivo temporário e
+    renomeada no fim, então uma execução interrompida não deixa um mês pela metade.
+    """
+    if pa is None:
+        raise ImportError("O instantâneo em Parquet precisa do pyarrow (pip install -r requirements-opcionais.txt).")
+    if acrescentar and not particionar:
+        raise ValueError("O modo de acréscimo só funciona com a saída particionada por mês.")
+    compressao = None if compressao == 'none' else compressao
+
+    primeira = Venda.objects.order_by('data').values_list('data', flat=True).first()
+    if primeira is None:
+        return {}
+    todos = list(meses(primeira, timezone.now()))
+
+    gravados = {}
+    if not particionar:
+        temporario = f"{saida}.tmp"
+        with _escritor(temporario, compressao) as escritor:
+            for ano, mes in todos:
+                linhas = _gravar(escritor, _itens_do_mes(ano, mes, tamanho_bloco))
+                if linhas:
+                    gravados[ano, mes] = linhas
+        os.replace(temporario, saida)
+        return gravados
+
+    os.makedirs(saida, exist_ok=True)
+    for ano, mes in todos[:-1]:
+        diretorio = particao(saida, ano, mes)
+        if acrescentar and os.path.exists(os.path.join(diretorio, NOME_ARQUIVO)):
+            continue
+        blocos = _itens_do_mes(ano, mes, tamanho_bloco)
+        primeiro = next(blocos, None)
+        if primeiro is None:
+            continue
+        os.makedirs(diretorio, exist_ok=True)
+        temporario = os.path.join(diretorio, f"{NOME_ARQUIVO}.tmp")
+        with _escritor(temporario, compressao) as escritor:
+            gravados[ano, mes] = _gravar(escritor, [primeiro]) + _gravar(escritor, blocos)
+        os.replace(temporario, os.path.join(diretorio, NOME_ARQUIVO))
+    return gravados
@@ -0,0 +1,105 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import close_old_connections
+from django.utils.timezone import localdate
+
+from .agregacoes import agregar_resumo
+
+
+def cache_dashboard():
+    return caches['dashboard']
+
+
+def _chave(periodo, inicio_mes):
+    return f"dashboard:{periodo}:{inicio_mes:%Y-%m}"
+
+
+def _janelas(inicio_mes):
+    # 'historico': tudo antes do mês atual, muda raramente e fica mais tempo em cache.
+    # 'mes': mês atual, com TTL curto como garantia caso alguma invalidação se perca.
+    return {
+        'historico': ((None, inicio_mes), settings.DASHBOARD_CACHE_TTL_HISTORICO),
+        'mes': ((inicio_mes, None), settings.DASHBOARD_CACHE_TTL_MES),
+    }
+
+
+def totais(inicio_mes, periodos=('historico', 'mes')):
+    """Totais dos períodos pedidos; os que não estão em cache são calculados juntos, numa só consulta."""
+    janelas = _janelas(inicio_mes)
+    chaves = {periodo: _chave(periodo, inicio_mes) for periodo in periodos}
+    em_cache = cache_dashboard().get_many(chaves.values())
+    resultado = {periodo: em_cache[chave] for periodo, chave in chaves.items() if chave in em_cache}
+
+    faltando = [periodo for periodo in periodos if periodo not in resultado]
+    if faltando:
+        calculados = agregar_resumo({periodo: janelas[periodo][0] for periodo in faltando})
+        for periodo, metricas in calculados.items():
+            cache_dashboard().set(chaves[periodo], metricas, janelas[periodo][1])
+        resultado.update(calculados)
+    return resultado
+
+
+def totais_historicos(inicio_mes):
+    return totais(inicio_mes, ['historico'])['historico']
+
+
+def totais_mes(inicio_mes):
+    return totais(inicio_mes, ['mes'])['mes']
+
+
+def invalidar_dashboard(dia=None):
+    """Descarta o cache afetado por uma venda do dia informado (ou todo o cache, sem dia)."""
+    inicio_mes = localdate().replace(day=1)
+    chaves = [_chave('mes', inicio_mes)]
+    if dia is None or dia < inicio_mes:
+        chaves.append(_chave('historico', inicio_mes))
+    cache_dashboard().delete_many(chaves)
+
+
+def _montar_contexto(historico, mes):
+    formas_geral = dict(historico['formas'])
+    for forma, total in mes['formas'].items():
+        formas_geral[forma] = formas_geral.get(forma, 0) + total
+
+    return {
+        'total_geral': historico['valor'] + mes['valor'],
+        'total_mes': mes['valor'],
+        'total_itens_geral': historico['itens'] + mes['itens'],
+        'total_itens_mes': mes['itens'],
+        'formas_geral': [{'forma_pagamento': forma, 'total': total} for forma, total in sorted(formas_geral.items())],
+        'formas_mes': [{'forma_pagamento': forma, 'total': total} for forma, total in mes['formas'].items()],
+    }
+
+
+def contexto_dashboard():
+    periodos = totais(localdate().replace(day=1))
+    return _montar_contexto(periodos['historico'], periodos['mes'])
+
+
+def _em_thread_propria(funcao):
+    """Executa ``funcao`` numa thread do pool com conexão própria, em paralelo às demais.
+
+    Os métodos assíncronos do ORM (aaggregate etc.) passam todos pela mesma thread e por isso
+    rodam um depois do outro; com thread_sensitive=False cada consulta usa sua própria conexão.
+    """
+    def executar(*args):
+        close_old_connections()
+        try:
+            return funcao(*args)
+        finally:
+            close_old_connections()
+
+    return sync_to_async(executar, thread_sensitive=False)
+
+
+async def acontexto_dashboard():
+    """Versão assíncrona de contexto_dashboard: histórico e mês atual são calculados ao mesmo tempo."""
+    inicio_mes = localdate().replace(day=1)
+    historico, mes = await asyncio.gather(
+        _em_thread_propria(totais_historicos)(inicio_mes),
+        _em_thread_propria(totais_mes)(inicio_mes),
+    )
+    return _montar_contexto(historico, mes)
@@ -0,0 +1,155 @@
+import csv
+import tempfile
+from datetime import datetime, time, timedelta
+
+from django.core.files import File
+from django.http import StreamingHttpResponse, FileResponse
+from django.utils import timezone
+
+from .models import Exportacao
+from .resources import VendaResource, ItemVendaResource, EstoqueResource
+
+# Resources disponíveis para exportação, pelo nome usado na URL
+RECURSOS = {
+    'vendas': VendaResource,
+    'itens': ItemVendaResource,
+    'estoque': EstoqueResource,
+}
+
+try:
+    import openpyxl  # noqa: F401  (necessário só para XLSX)
+    FORMATOS = ('csv', 'xlsx')
+except ImportError:
+    FORMATOS = ('csv',)
+
+
+# Campo de data usado no filtro por período de cada recurso
+CAMPOS_DATA = {
+    'vendas': 'data',
+    'itens': 'venda__data',
+}
+
+# A cada quantas linhas o progresso de uma exportação em segundo plano é gravado
+INTERVALO_PROGRESSO = 5000
+
+
+def _inicio_do_dia(dia):
+    return timezone.make_aware(datetime.combine(dia, time.min))
+
+
+def filtrar_periodo(recurso, queryset, inicio=None, fim=None):
+    """Filtra o queryset pelo período como intervalo (>= início, < dia seguinte ao fim)."""
+    campo = CAMPOS_DATA.get(recurso)
+    if campo and inicio:
+        queryset = queryset.filter(**{f'{campo}__gte': _inicio_do_dia(inicio)})
+    if campo and fim:
+        queryset = queryset.filter(**{f'{campo}__lt': _inicio_do_dia(fim + timedelta(days=1))})
+    return queryset
+
+
+class _Eco:
+    """Arquivo falso para o csv.writer: devolve a linha em vez de guardá-la."""
+
+    def write(self, valor):
+        return valor
+
+
+def gerar_csv(linhas):
+    escritor = csv.writer(_Eco())
+    for linha in linhas:
+        yield escritor.writerow(linha)
+
+
+def gravar_xlsx(linhas, arquivo):
+    """Grava as linhas em modo write_only do openpyxl, que não mantém a planilha em memória."""
+    from openpyxl import Workbook
+
+    planilha = Workbook(write_only=True)
+    aba = planilha.create_sheet()
+    for linha in linhas:
+        aba.append(linha)
+    planilha.save(arquivo)
+
+
+def resposta_exportacao(resource, formato, nome_arquivo, queryset=None):
+    linhas = resource.exportar_linhas(queryset)
+
+    if formato == 'csv':
+        resposta = StreamingHttpResponse(gerar_csv(linhas), content_type='text/csv; charset=utf-8')
+        resposta['Content-Disposition'] = f'attachment; filename="{nome_arquivo}.csv"'
+        return resposta
+
+    # O XLSX é um zip e só pode ser enviado depois de completo: grava num arquivo temporário
+    arquivo = tempfile.TemporaryFile()
+    gravar_xlsx(linhas, arquivo)
+    arquivo.seek(0)
+    return FileResponse(
+        arquivo,
+        as_attachment=True,
+        filename=f"{nome_arquivo}.xlsx",
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    )
+
+
+def recuperar_exportacoes_travadas(limite, ignorar=()):
+    """Devolve para a fila as exportações em processamento há mais que ``limite`` (timedelta).
+
+    São as que ficaram presas quando o worker que as assumiu caiu no meio. ``ignorar`` são as que o
+    próprio worker ainda está processando. Retorna quantas foram recuperadas.
+    """
+    return Exportacao.objects.filter(
+        status='PROCESSANDO', iniciada_em__lt=timezone.now() - limite,
+    ).exclude(pk__in=list(ignorar)).update(status='PENDENTE', iniciada_em=None, linhas_processadas=0)
+
+
+def processar_exportacao(exportacao_id):
+    """Gera o arquivo de uma exportação pendente, registrando progresso e duração.
+
+    Retorna False se outra thread ou processo já tiver assumido a exportação.
+    """
+    assumida = Exportacao.objects.filter(pk=exportacao_id, status='PENDENTE').update(
+        status='PROCESSANDO', iniciada_em=timezone.now()
+    )
+    if not assumida:
+        return False
+
+    exportacao = Exportacao.objects.get(pk=exportacao_id)
+    campos = ['status', 'erro', 'arquivo', 'linhas_processadas', 'concluida_em']
+    try:
+        resource = RECURSOS[exportacao.recurso]()
+        queryset = filtrar_periodo(exportacao.recurso, resource.get_queryset(), exportacao.inicio, exportacao.fim)
+        if exportacao.ids is not None:
+            queryset = queryset.filter(pk__in=exportacao.ids)
+        Exportacao.objects.filter(pk=exportacao.pk).update(total_linhas=queryset.count())
+
+        def linhas_com_progresso():
+            for numero, linha in enumerate(resource.exportar_linhas(queryset)):
+                # A primeira linha é o cabeçalho
+                if numero and numero % INTERVALO_PROGRESSO == 0:
+                    Exportacao.objects.filter(pk=exportacao.pk).update(linhas_processadas=numero)
+                yield linha
+            exportacao.linhas_processadas = numero
+
+        with tempfile.TemporaryFile() as arquivo:
+            if exportacao.formato == 'csv':
+                for texto in gerar_csv(linhas_com_progresso()):
+                    arquivo.write(texto.encode('utf-8'))
+            else:
+                gravar_xlsx(linhas_com_progresso(), arquivo)
+            arquivo.seek(0)
+
+            nome = f"{exportacao.recurso}-{exportacao.pk}.{exportacao.formato}"
+            exportacao.arquivo.save(nome, File(arquivo), save=False)
+
+        exportacao.status = 'CONCLUIDA'
+    except Exception as erro:
+        exportacao.status = 'ERRO'
+        exportacao.erro = repr(erro)
+        # O objeto em memória não acompanha o progresso gravado durante a geração: fica o do banco
+        campos = ['status', 'erro', 'concluida_em']
+        raise
+    finally:
+        exportacao.concluida_em = timezone.now()
+        exportacao.save(update_fields=campos)
+
+    return True
@@ -1,16 +1,45 @@
+from collections import defaultdict
+
 from django import forms
-from .models import ItemVenda, Produto, Estoque
+from django.core.exceptions import ValidationError
+from .models import Estoque
+
 
-class ItemVendaInlineForm(forms.ModelForm):
-    class Meta:
-        model = ItemVenda
-        fields = '__all__'
+class ItemVendaInlineFormSet(forms.BaseInlineFormSet):
+    """Confere o estoque pela soma das linhas de cada produto, que ItemVenda.clean vê só uma a uma."""
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, erro_estoque=None, **kwargs):
+        # Erro de estoque levantado na gravação (ver VendaAdmin.changeform_view)
+        self.erro_estoque = erro_estoque
         super().__init__(*args, **kwargs)
 
-        # Obtém IDs dos produtos com estoque > 0
-        produtos_com_estoque = Estoque.objects.filter(quantidade__gt=0).values_list('produto_id', flat=True)
+    def clean(self):
+        super().clean()
+        quantidades = defaultdict(int)
+        for form in self.forms:
+            dados = getattr(form, 'cleaned_data', None)
+            if not form.has_changed() or not dados or dados.get('DELETE'):
+                continue
+            if dados.get('produto') and dados.get('quantidade'):
+                quantidades[dados['produto']] += dados['quantidade']
+
+        disponiveis = dict(Estoque.objects.filter(produto__in=quantidades).values_list('produto_id', 'quantidade'))
+        erros = [
+            f"{produto.nome}: quantidade solicitada ({quantidade}) excede o estoque disponível "
+            f"({disponiveis.get(produto.pk, 0)})."
+            for produto, quantidade in quantidades.items()
+            if quantidade > disponiveis.get(produto.pk, 0)
+        ]
+        if erros:
+            raise ValidationError(erros)
+        if self.erro_estoque:
+            raise ValidationError(self.erro_estoque)
+
 
-        # Filtra o queryset do campo produto
-        self.fields['produto'].queryset = Produto.objects.filter(id__in=produtos_com_estoque)
+class ImportacaoEstoqueForm(forms.Form):
+    arquivo = forms.FileField(help_text="CSV ou XLSX com as colunas codigo_barras e quantidade.")
+    modo = forms.ChoiceField(choices=[
+        ('incremento', "Somar ao estoque atual"),
+        ('absoluto', "Substituir o estoque atual"),
+    ])
+    tudo_ou_nada = forms.BooleanField(required=False, label="Não importar nada se alguma linha tiver erro")
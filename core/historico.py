@@ -0,0 +1,81 @@
+"""Histórico de vendas paginado por cursor (keyset) em (data, id), para integrações que percorrem tudo.
+
+Cada página continua exatamente depois da última venda da anterior, então o custo por página é o
+mesmo na primeira e na milésima, ao contrário do OFFSET.
+"""
+import base64
+import binascii
+from datetime import datetime
+
+from django.core.exceptions import ValidationError
+from django.db.models import Prefetch, Q, prefetch_related_objects
+
+from .models import ItemVenda, Venda
+
+LIMITE_PADRAO = 100
+LIMITE_MAXIMO = 500
+
+
+def codificar_cursor(venda):
+    return base64.urlsafe_b64encode(f"{venda.data.isoformat()}|{venda.pk}".encode()).decode()
+
+
+def decodificar_cursor(cursor):
+    try:
+        data, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.fromisoformat(data), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValidationError("Cursor inválido.")
+
+
+def _serializar(venda):
+    return {
+        'id': venda.pk,
+        'data': venda.data.isoformat(),
+        'usuario': venda.usuario.username,
+        'forma_pagamento': venda.forma_pagamento,
+        'valor_total': str(venda.valor_total),
+        'quantidade_itens': venda.quantidade_itens,
+        'itens': [
+            {
+                'produto_id': item.produto_id,
+                'codigo_barras': item.produto.codigo_barras,
+                'produto': item.produto.nome,
+                'quantidade': item.quantidade,
+                'preco_unitario': str(item.preco_unitario),
+            }
+            for item in venda.itens.all()
+        ],
+    }
+
+
+def pagina_vendas(cursor=None, limite=LIMITE_PADRAO, usuario=None, forma_pagamento=None, inicio=None, fim=None):
+    """Uma página de vendas em ordem de (data, id) a partir do ``cursor``, com os itens embutidos.
+
+    ``inicio`` e ``fim`` são datetimes (fim exclusivo). Devolve {'vendas': [...], 'proximo': cursor ou None}.
+    São duas consultas por página, sem contagem: vendas (com o usuário) e itens (com o produto).
+    """
+    if not 1 <= limite <= LIMITE_MAXIMO:
+        raise ValidationError(f"O limite deve estar entre 1 e {LIMITE_MAXIMO}.")
+
+    vendas = Venda.objects.select_related('usuario').order_by('data', 'pk')
+
+    if usuario is not None:
+        vendas = vendas.filter(usuario=usuario)
+    if forma_pagamento:
+        vendas = vendas.filter(forma_pagamento=forma_pagamento)
+    if inicio is not None:
+        vendas = vendas.filter(data__gte=inicio)
+    if fim is not None:
+        vendas = vendas.filter(data__lt=fim)
+    if cursor:
+        data, pk = decodificar_cursor(cursor)
+        vendas = vendas.filter(Q(data__gt=data) | Q(data=data, pk__gt=pk))
+
+    # Um registro a mais diz se existe próxima página sem precisar contar
+    pagina = list(vendas[:limite + 1])
+    proximo = codificar_cursor(pagina[limite - 1]) if len(pagina) > limite else None
+    pagina = pagina[:limite]
+
+    prefetch_related_objects(pagina, Prefetch('itens', queryset=ItemVenda.objects.select_related('produto').order_by('pk')))
+    return {'vendas': [_serializar(venda) for venda in pagina], 'proximo': proximo}
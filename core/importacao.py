@@ -0,0 +1,175 @@
+"""Importação de estoque em massa a partir de planilhas de fornecedor (CSV ou XLSX).
+
+Cada linha traz o código de barras do produto e uma quantidade, que é somada ao estoque atual
+(modo 'incremento') ou passa a ser o estoque (modo 'absoluto'). Tudo é gravado numa única transação,
+com bulk_update/bulk_create em lotes; as linhas com problema são devolvidas com o número e o motivo.
+"""
+import csv
+import io
+
+from django.db import transaction
+from django.utils import timezone
+
+from .catalogo import invalidar_produtos
+from .models import Estoque, MovimentoEstoque, Produto
+
+MODOS = ('incremento', 'absoluto')
+TAMANHO_LOTE = 1000
+COLUNA_CODIGO = 'codigo_barras'
+COLUNA_QUANTIDADE = 'quantidade'
+
+
+class ImportacaoInvalida(Exception):
+    """O arquivo não pode ser importado (formato ou colunas) ou houve erros com tudo_ou_nada ativo."""
+
+    def __init__(self, mensagem, erros=()):
+        super().__init__(mensagem)
+        self.erros = list(erros)
+
+
+def ler_arquivo(arquivo, nome):
+    """Linhas (número, dict) de um CSV ou XLSX; o número conta o cabeçalho como linha 1."""
+    if nome.lower().endswith('.xlsx'):
+        return _ler_xlsx(arquivo)
+
+    conteudo = arquivo.read()
+    if isinstance(conteudo, bytes):
+        try:
+            conteudo = conteudo.decode('utf-8-sig')
+        except UnicodeDecodeError:
+            raise ImportacaoInvalida("O CSV precisa estar em UTF-8.")
+    try:
+        dialeto = csv.Sniffer().sniff(conteudo[:4096], delimiters=',;\t')
+    except csv.Error:
+        dialeto = csv.excel
+    leitor = csv.DictReader(io.StringIO(conteudo), dialect=dialeto)
+    _validar_colunas(leitor.fieldnames or [])
+    return [(numero, linha) for numero, linha in enumerate(leitor, start=2)]
+
+
+def _ler_xlsx(arquivo):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ImportacaoInvalida("Arquivos XLSX exigem o openpyxl instalado; envie um CSV.")
+
+    planilha = load_workbook(arquivo, read_only=True, data_only=True).active
+    linhas = planilha.iter_rows(values_only=True)
+    cabecalho = [str(coluna or '').strip() for coluna in next(linhas, ())]
+    _validar_colunas(cabecalho)
+    return [(numero, dict(zip(cabecalho, valores))) for numero, valores in enumerate(linhas, start=2)]
+
+
+def _validar_colunas(colunas):
+    faltando = {COLUNA_CODIGO, COLUNA_QUANTIDADE} - {coluna.strip() for coluna in colunas}
+    if faltando:
+        raise ImportacaoInvalida(f"Colunas obrigatórias ausentes: {', '.join(sorted(faltando))}.")
+
+
+def _lotes(valores, tamanho):
+    valores = list(valores)
+    for inicio in range(0, len(valores), tamanho):
+        yield valores[inicio:inicio + tamanho]
+
+
+def _quantidades_por_codigo(linhas, modo, erros):
+    """Valida as linhas e junta as repetidas: no incremento elas somam, no absoluto vale a última."""
+    quantidades = {}
+    numeros = {}
+    for numero, linha in linhas:
+        linha = {str(chave).strip(): valor for chave, valor in linha.items() if chave is not None}
+        codigo = str(linha.get(COLUNA_CODIGO) or '').strip()
+        if not codigo:
+            erros.append((numero, "Código de barras vazio."))
+            continue
+        valor = linha.get(COLUNA_QUANTIDADE)
+        if isinstance(valor, float) and valor.is_integer():  # Números do XLSX chegam como float
+            valor = int(valor)
+        try:
+            quantidade = int(str(valor).strip())
+        except ValueError:
+            erros.append((numero, f"Quantidade inválida: {valor!r}."))
+            continue
+        if modo == 'absoluto' and quantidade < 0:
+            erros.append((numero, "A quantidade absoluta não pode ser negativa."))
+            continue
+
+        if modo == 'incremento':
+            quantidades[codigo] = quantidades.get(codigo, 0) + quantidade
+        else:
+            quantidades[codigo] = quantidade
+        numeros.setdefault(codigo, []).append(numero)
+    return quantidades, numeros
+
+
+def importar_estoque(linhas, modo='incremento', tamanho_lote=TAMANHO_LOTE, tudo_ou_nada=False, usuario=None):
+    """Aplica as quantidades das linhas (pares número, dict) ao estoque dos produtos pelo código de barras.
+
+    Devolve {'atualizados', 'criados', 'erros'}, com erros como lista de (número da linha, mensagem).
+    Com ``tudo_ou_nada``, qualquer erro desfaz a importação inteira e levanta ImportacaoInvalida.
+    Cada variação de estoque é lançada no livro de movimentos em nome de ``usuario``.
+    """
+    if modo not in MODOS:
+        raise ImportacaoInvalida(f"Modo inválido: use {' ou '.join(MODOS)}.")
+
+    erros = []
+    quantidades, numeros = _quantidades_por_codigo(linhas, modo, erros)
+
+    with transaction.atomic():
+        produtos = {}
+        for lote in _lotes(quantidades, tamanho_lote):
+            produtos.update(Produto.objects.filter(codigo_barras__in=lote).values_list('codigo_barras', 'id'))
+
+        # Trava os estoques existentes para que vendas simultâneas não se percam entre a leitura e a gravação
+        estoques = {}
+        for lote in _lotes(produtos.values(), tamanho_lote):
+            estoques.update(
+                (estoque.produto_id, estoque)
+                for estoque in Estoque.objects.select_for_update().filter(produto_id__in=lote)
+            )
+
+        atualizar, criar, movimentos = [], [], []
+        for codigo, quantidade in quantidades.items():
+            if codigo not in produtos:
+                erros.extend((numero, f"Produto {codigo} não cadastrado.") for numero in numeros[codigo])
+                continue
+
+            estoque = estoques.get(produtos[codigo])
+            atual = estoque.quantidade if estoque else 0
+            nova = atual + quantidade if modo == 'incremento' else quantidade
+            if nova < 0:
+                erros.extend(
+                    (numero, f"Estoque de {codigo} ficaria negativo ({atual} disponível).")
+                    for numero in numeros[codigo]
+                )
+                continue
+
+            if nova != atual:
+                movimentos.append(MovimentoEstoque(
+                    produto_id=produtos[codigo],
+                    tipo='REPOSICAO' if nova > atual and modo == 'incremento' else 'AJUSTE',
+                    quantidade=nova - atual,
+                    usuario=usuario,
+                    observacao="Importação de estoque",
+                ))
+            if estoque:
+                estoque.quantidade = nova
+                atualizar.append(estoque)
+            else:
+                criar.append(Estoque(produto_id=produtos[codigo], quantidade=nova))
+
+        erros.sort()
+        if erros and tudo_ou_nada:
+            raise ImportacaoInvalida(f"{len(erros)} linha(s) com erro; nada foi importado.", erros)
+
+        agora = timezone.now()  # bulk_update não aplica o auto_now
+        for estoque in atualizar:
+            estoque.atualizado_em = agora
+        Estoque.objects.bulk_update(atualizar, ['quantidade', 'atualizado_em'], batch_size=tamanho_lote)
+        Estoque.objects.bulk_create(criar, batch_size=tamanho_lote)
+        MovimentoEstoque.objects.bulk_create(movimentos, batch_size=tamanho_lote)
+
+        # bulk_update/bulk_create não disparam sinais: o cache do catálogo é limpo aqui
+        invalidar_produtos([estoque.produto_id for estoque in atualizar + criar])
+
+    return {'atualizados': len(atualizar), 'criados': len(criar), 'erros': erros}
@@ -0,0 +1,61 @@
+import json
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Sum
+from django.utils import timezone
+from core.models import Venda, ItemVenda
+
+
+class Command(BaseCommand):
+    help = (
+        "Mostra o plano de execução e o tempo médio das consultas de filtro do dashboard e do admin. "
+        "Use com uma base populada (ex.: popular_dados) para avaliar os índices."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeticoes', type=int, default=5, help="Execuções de cada consulta para a média.")
+        parser.add_argument('--json', action='store_true', help="Emite o resultado em JSON.")
+
+    def consultas(self):
+        agora = timezone.localtime()
+        inicio_mes = agora.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        inicio_semana = agora - timedelta(days=7)
+        venda = Venda.objects.order_by('-pk').values('pk', 'usuario_id').first() or {'pk': 0, 'usuario_id': 0}
+        item = ItemVenda.objects.filter(venda_id=venda['pk']).values('produto_id').first() or {'produto_id': 0}
+
+        return {
+            'vendas_do_mes_por_forma': Venda.objects.filter(data__gte=inicio_mes).values('forma_pagamento').annotate(
+                total=Count('id')
+            ).order_by(),
+            'itens_do_mes_por_produto': ItemVenda.objects.filter(venda__data__gte=inicio_mes).values(
+                'produto_id'
+            ).annotate(total=Sum('quantidade')).order_by(),
+            'admin_filtro_data_forma': Venda.objects.filter(
+                data__gte=inicio_semana, forma_pagamento='PIX'
+            ).order_by('-data')[:100],
+            'admin_filtro_usuario_data': Venda.objects.filter(
+                usuario_id=venda['usuario_id'], data__gte=inicio_semana
+            ).order_by('-data')[:100],
+            'item_da_venda_por_produto': ItemVenda.objects.filter(venda_id=venda['pk'], produto_id=item['produto_id']),
+        }
+
+    def handle(self, *args, **options):
+        resultados = []
+        for nome, queryset in self.consultas().items():
+            plano = queryset.explain()
+            inicio = time.perf_counter()
+            for _ in range(options['repeticoes']):
+                list(queryset.all())  # .all() descarta o cache do queryset
+            media_ms = (time.perf_counter() - inicio) * 1000 / options['repeticoes']
+            resultados.append({'consulta': nome, 'tempo_medio_ms': round(media_ms, 3), 'plano': plano})
+
+        if options['json']:
+            self.stdout.write(json.dumps(resultados, indent=2, ensure_ascii=False))
+            return
+
+        for resultado in resultados:
+            self.stdout.write(self.style.MIGRATE_HEADING(f"{resultado['consulta']}: {resultado['tempo_medio_ms']} ms"))
+            self.stdout.write(resultado['plano'])
+            self.stdout.write('')
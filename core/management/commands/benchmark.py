@@ -0,0 +1,130 @@
+import json
+import platform
+import statistics
+import time
+import uuid
+
+import django
+from django.contrib import admin
+from django.contrib.admin.models import LogEntry
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from core.models import Produto, Estoque, Venda, ItemVenda
+from core.resources import VendaResource, ItemVendaResource, EstoqueResource
+from core.services import registrar_venda
+from core.views import DashboardVendasView
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede tempo e número de consultas dos caminhos críticos (criação de venda, dashboard, "
+        "changelists do admin e exportações) e emite o resultado em JSON. Nada é gravado na base."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeticoes', type=int, default=5)
+        parser.add_argument('--itens', type=int, default=10, help="Itens por venda nos cenários de criação.")
+        parser.add_argument('--limite-exportacao', type=int, default=10000,
+                            help="Máximo de linhas por exportação (0 = todas).")
+        parser.add_argument('--saida', help="Arquivo JSON de saída (padrão: stdout).")
+
+    def handle(self, *args, **options):
+        self.fabrica = RequestFactory()
+        self.options = options
+
+        resultado = {
+            'executado_em': timezone.now().isoformat(),
+            'django': django.get_version(),
+            'python': platform.python_version(),
+            'banco': connection.vendor,
+            'volume': {
+                'produtos': Produto.objects.count(),
+                'vendas': Venda.objects.count(),
+                'itens_venda': ItemVenda.objects.count(),
+            },
+            'cenarios': {},
+        }
+
+        # Tudo roda numa transação desfeita no final, inclusive as vendas criadas
+        with transaction.atomic():
+            # Nome único: um usuário 'benchmark' já existente na base não pode atrapalhar a medição
+            self.usuario = User.objects.create_superuser(f'benchmark-{uuid.uuid4().hex[:8]}', password=None)
+            self.produtos = list(
+                Estoque.objects.filter(quantidade__gte=options['repeticoes'] * 2).values_list('produto_id', flat=True)[:options['itens']]
+            )
+            for nome, cenario in self.cenarios():
+                resultado['cenarios'][nome] = self.medir(cenario)
+            transaction.set_rollback(True)
+
+        saida = json.dumps(resultado, indent=2, ensure_ascii=False)
+        if options['saida']:
+            with open(options['saida'], 'w', encoding='utf-8') as arquivo:
+                arquivo.write(saida)
+        else:
+            self.stdout.write(saida)
+
+    def medir(self, cenario):
+        tempos, consultas = [], []
+        for _ in range(self.options['repeticoes']):
+            with CaptureQueriesContext(connection) as capturadas:
+                inicio = time.perf_counter()
+                cenario()
+                tempos.append((time.perf_counter() - inicio) * 1000)
+            consultas.append(len(capturadas))
+        return {
+            'tempo_mediana_ms': round(statistics.median(tempos), 3),
+            'tempo_min_ms': round(min(tempos), 3),
+            'tempo_max_ms': round(max(tempos), 3),
+            'consultas': max(consultas),
+        }
+
+    def requisicao(self, caminho='/'):
+        request = self.fabrica.get(caminho)
+        request.user = self.usuario
+        return request
+
+    def cenarios(self):
+        if not self.produtos:
+            raise CommandError("Não há produtos com estoque suficiente. Rode popular_dados antes.")
+
+        def venda_item_a_item():
+            venda = Venda.objects.create(usuario=self.usuario)
+            for produto_id in self.produtos:
+                ItemVenda.objects.create(venda=venda, produto_id=produto_id, quantidade=1)
+
+        def venda_registrar_venda():
+            registrar_venda(self.usuario, 'PIX', [(produto_id, 1) for produto_id in self.produtos])
+
+        def dashboard():
+            DashboardVendasView.as_view()(self.requisicao('/dashboard/')).render()
+
+        def changelist(modelo):
+            def executar():
+                admin.site._registry[modelo].changelist_view(self.requisicao()).render()
+            return executar
+
+        def exportacao(resource_class):
+            def executar():
+                resource = resource_class()
+                queryset = resource.get_queryset().order_by('-pk')
+                if self.options['limite_exportacao']:
+                    queryset = queryset.filter(pk__in=queryset.values('pk')[:self.options['limite_exportacao']])
+                resource.export(queryset)
+            return executar
+
+        return [
+            ('criar_venda_item_a_item', venda_item_a_item),
+            ('criar_venda_registrar_venda', venda_registrar_venda),
+            ('dashboard', dashboard),
+            ('admin_changelist_venda', changelist(Venda)),
+            ('admin_changelist_itemvenda', changelist(ItemVenda)),
+            ('admin_changelist_estoque', changelist(Estoque)),
+            ('admin_changelist_logentry', changelist(LogEntry)),
+            ('exportar_vendas', exportacao(VendaResource)),
+            ('exportar_itens', exportacao(ItemVendaResource)),
+            ('exportar_estoque', exportacao(EstoqueResource)),
+        ]
@@ -0,0 +1,104 @@
+import json
+import statistics
+import threading
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, close_old_connections, connection
+from django.utils import timezone
+from core.models import Produto, Estoque, Venda, MovimentoEstoque
+from core.services import registrar_venda
+
+PREFIXO_CODIGO = '999'  # Produtos criados só para a medição, removidos no final
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede vendas gravadas em paralelo por vários caixas (threads com conexões próprias) no perfil de "
+        "banco configurado e emite o resultado em JSON. Grava de verdade no banco e remove tudo no final: "
+        "use uma cópia da base."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--caixas', type=int, default=8, help="Threads gravando vendas ao mesmo tempo.")
+        parser.add_argument('--vendas', type=int, default=50, help="Vendas por caixa.")
+        parser.add_argument('--itens', type=int, default=3, help="Itens por venda.")
+        parser.add_argument('--saida', help="Arquivo JSON de saída (padrão: stdout).")
+
+    def handle(self, *args, **options):
+        if Produto.objects.filter(codigo_barras__startswith=PREFIXO_CODIGO).exists():
+            raise CommandError(f"Já existem produtos com código {PREFIXO_CODIGO}...; remova-os antes de medir.")
+
+        usuario, _ = User.objects.get_or_create(username='benchmark_concorrencia')
+        produtos = Produto.objects.bulk_create([
+            Produto(codigo_barras=f'{PREFIXO_CODIGO}{numero:010d}', nome=f'Benchmark {numero}', preco=1)
+            for numero in range(options['itens'])
+        ])
+        Estoque.objects.bulk_create([Estoque(produto=produto, quantidade=10 ** 9) for produto in produtos])
+        itens = [(produto.pk, 1) for produto in produtos]
+
+        tempos, falhas = [], []
+        trava = threading.Lock()
+
+        def caixa():
+            close_old_connections()
+            try:
+                for _ in range(options['vendas']):
+                    inicio = time.perf_counter()
+                    try:
+                        registrar_venda(usuario, 'PIX', itens)
+                    except OperationalError as erro:  # "database is locked" e afins
+                        with trava:
+                            falhas.append(str(erro))
+                        continue
+                    with trava:
+                        tempos.append((time.perf_counter() - inicio) * 1000)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=caixa) for _ in range(options['caixas'])]
+        inicio = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        duracao = time.perf_counter() - inicio
+
+        resultado = {
+            'executado_em': timezone.now().isoformat(),
+            'perfil': self.perfil(),
+            'caixas': options['caixas'],
+            'vendas_gravadas': len(tempos),
+            'vendas_com_erro': len(falhas),
+            'erros': sorted(set(falhas)),
+            'vendas_por_segundo': round(len(tempos) / duracao, 1),
+            'latencia_mediana_ms': round(statistics.median(tempos), 3) if tempos else None,
+            'latencia_p95_ms': round(statistics.quantiles(tempos, n=20, method='inclusive')[-1], 3) if len(tempos) > 1 else None,
+            'latencia_max_ms': round(max(tempos), 3) if tempos else None,
+        }
+
+        # Remove o que foi gravado; os sinais de exclusão mantêm o resumo diário consistente
+        Venda.objects.filter(usuario=usuario).delete()
+        MovimentoEstoque.objects.filter(produto__in=produtos).delete()
+        Produto.objects.filter(pk__in=[produto.pk for produto in produtos]).delete()
+        usuario.delete()
+
+        saida = json.dumps(resultado, indent=2, ensure_ascii=False)
+        if options['saida']:
+            with open(options['saida'], 'w', encoding='utf-8') as arquivo:
+                arquivo.write(saida)
+        else:
+            self.stdout.write(saida)
+
+    def perfil(self):
+        perfil = {'banco': connection.vendor, 'opcoes': {
+            chave: valor for chave, valor in connection.settings_dict['OPTIONS'].items() if chave != 'password'
+        }}
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA journal_mode')
+                perfil['journal_mode'] = cursor.fetchone()[0]
+        else:
+            perfil['conn_max_age'] = connection.settings_dict['CONN_MAX_AGE']
+        return perfil
@@ -0,0 +1,42 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from core.models import Produto
+from core.movimentos import compactar, divergencias
+
+
+class Command(BaseCommand):
+    help = ("Grava um corte de saldos do livro de estoque, para que o saldo atual só precise somar os "
+            "movimentos recentes, e confere o livro com o estoque.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--margem', type=int, default=5,
+                            help="Minutos antes de agora em que o corte é feito, para não cortar "
+                                 "transações ainda abertas (padrão: 5).")
+        parser.add_argument('--descartar', action='store_true',
+                            help="Apaga movimentos e cortes anteriores ao novo corte (perde o histórico).")
+        parser.add_argument('--verificar', action='store_true',
+                            help="Compara o saldo do livro com o estoque e falha se houver divergência; roda "
+                                 "mesmo quando já existe um corte recente.")
+
+    def handle(self, *args, **options):
+        corte = timezone.now() - timedelta(minutes=options['margem'])
+        try:
+            produtos = compactar(corte, descartar=options['descartar'])
+        except ValueError as erro:
+            # Corte recente (por exemplo logo depois do migrate): a verificação usa o que já existe
+            if not options['verificar']:
+                raise CommandError(str(erro))
+            self.stdout.write(self.style.WARNING(f"{erro} Nenhum corte novo; verificando a partir do último."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Corte de {corte:%d/%m/%Y %H:%M} gravado com {produtos} produtos."))
+
+        if options['verificar']:
+            diferentes = divergencias()
+            nomes = dict(Produto.objects.filter(pk__in=diferentes).values_list('pk', 'nome'))
+            for produto_id, (estoque, livro) in sorted(diferentes.items()):
+                self.stdout.write(f"{nomes.get(produto_id, produto_id)}: estoque {estoque}, livro {livro}")
+            if diferentes:
+                raise CommandError(f"{len(diferentes)} produtos com estoque diferente do livro de movimentos.")
+            self.stdout.write(self.style.SUCCESS("Livro de movimentos confere com o estoque."))
@@ -0,0 +1,47 @@
+from datetime import timedelta
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from core.exports import RECURSOS
+from core.sincronizacao import ATRASO_PADRAO, FORMATOS_ALTERACOES, exportar_alteracoes, marca_salva, salvar_marca
+
+
+class Command(BaseCommand):
+    help = ("Exporta as vendas, itens ou estoque alterados desde a última sincronização do consumidor "
+            "e guarda a nova marca depois que a saída foi gravada.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('consumidor', help="Nome da integração que recebe as alterações.")
+        parser.add_argument('recurso', choices=sorted(RECURSOS))
+        parser.add_argument('--formato', choices=FORMATOS_ALTERACOES, default='jsonl')
+        parser.add_argument('--saida', help="Arquivo de saída (padrão: saída padrão).")
+        parser.add_argument('--limite', type=int, help="Máximo de linhas nesta rodada (padrão: todas).")
+        parser.add_argument('--atraso', type=int, default=int(ATRASO_PADRAO.total_seconds()),
+                            help="Segundos de margem para transações ainda abertas (padrão: %(default)s).")
+        parser.add_argument('--reiniciar', action='store_true',
+                            help="Ignora a marca guardada e exporta tudo desde o começo.")
+
+    def handle(self, *args, **options):
+        consumidor, recurso = options['consumidor'], options['recurso']
+        if options['limite'] is not None and options['limite'] < 1:
+            raise CommandError("O limite precisa ser pelo menos 1.")
+        marca = None if options['reiniciar'] else marca_salva(consumidor, recurso)
+
+        try:
+            if options['saida']:
+                with open(options['saida'], 'w', newline='', encoding='utf-8') as saida:
+                    total, nova_marca = self._exportar(recurso, saida, marca, options)
+            else:
+                total, nova_marca = self._exportar(recurso, self.stdout, marca, options)
+        except ValidationError as erro:
+            raise CommandError(erro.messages[0])
+
+        # Só avança a marca com a saída completa: se algo falhar antes, a próxima rodada repete o lote
+        if nova_marca:
+            salvar_marca(consumidor, recurso, nova_marca)
+        self.stderr.write(f"{total} linhas de {recurso} exportadas para {consumidor}.")
+
+    def _exportar(self, recurso, saida, marca, options):
+        return exportar_alteracoes(
+            recurso, saida, options['formato'], marca, options['limite'], timedelta(seconds=options['atraso']),
+        )
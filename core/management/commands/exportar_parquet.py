@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+from core import colunar
+
+
+class Command(BaseCommand):
+    help = ("Grava um instantâneo colunar (Parquet) dos itens vendidos, com os dados da venda e do produto, "
+            "para análise fora do sistema. Precisa do pyarrow.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('saida', help="Arquivo .parquet ou, com --particionar, diretório de saída.")
+        parser.add_argument('--particionar', action='store_true',
+                            help="Uma partição mes=AAAA-MM por mês fechado, em vez de um arquivo único.")
+        parser.add_argument('--acrescentar', action='store_true',
+                            help="Com --particionar, grava só os meses que ainda não têm partição.")
+        parser.add_argument('--compressao', choices=colunar.COMPRESSOES, default='zstd')
+        parser.add_argument('--bloco', type=int, default=50000,
+                            help="Linhas por bloco (row group) gravado (padrão: 50000).")
+
+    def handle(self, *args, **options):
+        if colunar.pa is None:
+            raise CommandError("O instantâneo em Parquet precisa do pyarrow: pip install -r requirements-opcionais.txt")
+        if options['bloco'] < 1:
+            raise CommandError("O bloco precisa ter pelo menos 1 linha.")
+
+        try:
+            gravados = colunar.gravar_instantaneo(
+                options['saida'], options['particionar'], options['acrescentar'], options['compressao'],
+                options['bloco'],
+            )
+        except ValueError as erro:
+            raise CommandError(str(erro))
+
+        for (ano, mes), linhas in sorted(gravados.items()):
+            self.stdout.write(f"{mes:02d}/{ano}: {linhas} itens")
+        self.stdout.write(self.style.SUCCESS(
+            f"{sum(gravados.values())} itens gravados em {options['saida']} ({len(gravados)} meses)."
+        ))
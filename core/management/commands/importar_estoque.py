@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from core.importacao import MODOS, TAMANHO_LOTE, ImportacaoInvalida, importar_estoque, ler_arquivo
+
+
+class Command(BaseCommand):
+    help = "Importa quantidades de estoque de um CSV/XLSX com as colunas codigo_barras e quantidade."
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivo', help="Caminho do arquivo CSV ou XLSX.")
+        parser.add_argument('--modo', choices=MODOS, default='incremento',
+                            help="Soma a quantidade ao estoque atual ou a grava como o novo estoque.")
+        parser.add_argument('--lote', type=int, default=TAMANHO_LOTE, help="Registros por comando de gravação.")
+        parser.add_argument('--tudo-ou-nada', action='store_true',
+                            help="Não importa nada se alguma linha tiver erro.")
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        try:
+            with open(options['arquivo'], 'rb') as arquivo:
+                linhas = ler_arquivo(arquivo, options['arquivo'])
+            resultado = importar_estoque(linhas, options['modo'], options['lote'], options['tudo_ou_nada'])
+        except OSError as erro:
+            raise CommandError(f"Não foi possível ler o arquivo: {erro}")
+        except ImportacaoInvalida as erro:
+            for numero, mensagem in erro.erros:
+                self.stderr.write(f"Linha {numero}: {mensagem}")
+            raise CommandError(str(erro))
+
+        for numero, mensagem in resultado['erros']:
+            self.stderr.write(f"Linha {numero}: {mensagem}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(linhas)} linhas em {time.perf_counter() - inicio:.1f}s: {resultado['atualizados']} estoques "
+            f"atualizados, {resultado['criados']} criados, {len(resultado['erros'])} linhas com erro."
+        ))
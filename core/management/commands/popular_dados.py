@@ -0,0 +1,91 @@
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from core.models import Produto, Estoque, Venda, ItemVenda, MovimentoEstoque
+
+
+class Command(BaseCommand):
+    help = "Popula a base com dados sintéticos reproduzíveis (produtos, estoque, usuários e vendas) para testes de carga."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--produtos', type=int, default=200)
+        parser.add_argument('--vendas', type=int, default=10000)
+        parser.add_argument('--max-itens', type=int, default=5, help="Máximo de itens por venda.")
+        parser.add_argument('--usuarios', type=int, default=5)
+        parser.add_argument('--dias', type=int, default=365, help="Período, até hoje, em que as vendas são distribuídas.")
+        parser.add_argument('--semente', type=int, default=42, help="Semente do gerador aleatório.")
+        parser.add_argument('--lote', type=int, default=5000, help="Vendas inseridas por lote.")
+
+    def handle(self, *args, **options):
+        aleatorio = random.Random(options['semente'])
+        formas = [forma for forma, _ in Venda.FORMA_PAGAMENTO_CHOICES]
+
+        usuarios = [
+            User.objects.get_or_create(username=f'vendedor{numero}')[0]
+            for numero in range(1, options['usuarios'] + 1)
+        ]
+
+        # Códigos de barras sequenciais, continuando a numeração de cargas anteriores
+        inicio = Produto.objects.filter(codigo_barras__startswith='200').count()
+        produtos = Produto.objects.bulk_create([
+            Produto(
+                codigo_barras=f'200{numero:010d}',
+                nome=f'Produto {numero}',
+                preco=Decimal(aleatorio.randint(100, 50000)) / 100,
+            )
+            for numero in range(inicio, inicio + options['produtos'])
+        ], batch_size=1000)
+        estoques = Estoque.objects.bulk_create([
+            Estoque(produto=produto, quantidade=aleatorio.randint(0, 1000)) for produto in produtos
+        ], batch_size=1000)
+        MovimentoEstoque.objects.bulk_create([
+            MovimentoEstoque(produto=estoque.produto, tipo='REPOSICAO', quantidade=estoque.quantidade)
+            for estoque in estoques if estoque.quantidade
+        ], batch_size=1000)
+
+        agora = timezone.now()
+        segundos = options['dias'] * 24 * 60 * 60
+        campo_data = Venda._meta.get_field('data')
+        restantes = options['vendas']
+
+        # Desliga o auto_now_add para gravar as datas sorteadas no histórico
+        campo_data.auto_now_add = False
+        try:
+            while restantes > 0:
+                tamanho = min(options['lote'], restantes)
+                restantes -= tamanho
+                with transaction.atomic():
+                    vendas, itens_por_venda = [], []
+                    for _ in range(tamanho):
+                        itens = [
+                            ItemVenda(produto=produto, quantidade=aleatorio.randint(1, 5), preco_unitario=produto.preco)
+                            for produto in aleatorio.sample(produtos, aleatorio.randint(1, min(options['max_itens'], len(produtos))))
+                        ]
+                        vendas.append(Venda(
+                            usuario=aleatorio.choice(usuarios),
+                            forma_pagamento=aleatorio.choice(formas),
+                            data=agora - timedelta(seconds=aleatorio.randint(0, segundos)),
+                            valor_total=sum(item.subtotal() for item in itens),
+                            quantidade_itens=sum(item.quantidade for item in itens),
+                        ))
+                        itens_por_venda.append(itens)
+
+                    Venda.objects.bulk_create(vendas, batch_size=1000)
+                    for venda, itens in zip(vendas, itens_por_venda):
+                        for item in itens:
+                            item.venda = venda
+                    ItemVenda.objects.bulk_create([item for itens in itens_por_venda for item in itens], batch_size=1000)
+                self.stdout.write(f"{options['vendas'] - restantes} vendas inseridas...")
+        finally:
+            campo_data.auto_now_add = True
+
+        call_command('reconstruir_resumo_vendas', stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(produtos)} produtos, {len(usuarios)} usuários e {options['vendas']} vendas gerados."
+        ))
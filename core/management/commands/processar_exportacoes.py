@@ -0,0 +1,50 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from core.exports import processar_exportacao, recuperar_exportacoes_travadas
+from core.models import Exportacao
+
+
+class Command(BaseCommand):
+    help = "Processa as exportações pendentes em segundo plano, sem depender de um broker externo."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help="Quantidade de exportações simultâneas.")
+        parser.add_argument('--intervalo', type=float, default=5, help="Segundos entre as verificações de novas exportações.")
+        parser.add_argument('--uma-vez', action='store_true', help="Processa as pendentes e encerra.")
+        parser.add_argument('--limite-minutos', type=int, default=60,
+                            help="Minutos em processamento após os quais a exportação volta para a fila, "
+                                 "por ter ficado presa num worker que caiu. Deve ser maior que a exportação "
+                                 "mais demorada (padrão: 60).")
+
+    def handle(self, *args, **options):
+        limite = timedelta(minutes=options['limite_minutos'])
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            # {futuro: id da exportação}, mexido só nesta thread: os workers não tocam no dicionário
+            em_andamento = {}
+            while True:
+                em_andamento = {futuro: pk for futuro, pk in em_andamento.items() if not futuro.done()}
+
+                recuperadas = recuperar_exportacoes_travadas(limite, em_andamento.values())
+                if recuperadas:
+                    self.stderr.write(f"{recuperadas} exportações presas em processamento voltaram para a fila.")
+
+                pendentes = Exportacao.objects.filter(status='PENDENTE').exclude(pk__in=list(em_andamento.values()))
+                for exportacao_id in pendentes.order_by('criada_em').values_list('pk', flat=True):
+                    em_andamento[executor.submit(self.processar, exportacao_id)] = exportacao_id
+
+                if options['uma_vez']:
+                    break
+                time.sleep(options['intervalo'])
+
+    def processar(self, exportacao_id):
+        try:
+            if processar_exportacao(exportacao_id):
+                self.stdout.write(self.style.SUCCESS(f"Exportação {exportacao_id} concluída."))
+        except Exception as erro:
+            self.stderr.write(f"Exportação {exportacao_id} falhou: {erro!r}")
+        finally:
+            connection.close()  # Cada thread usa sua própria conexão com o banco
@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Sum, Count
+from django.db.models.functions import TruncDate
+from core.dashboard import invalidar_dashboard
+from core.models import Venda, VendaDiaria
+from core.relatorios import invalidar_relatorios
+
+
+class Command(BaseCommand):
+    help = "Reconstrói do zero o resumo diário de vendas (VendaDiaria)."
+
+    def handle(self, *args, **options):
+        # Leitura e substituição na mesma transação, com o resumo travado antes de ler as vendas: uma venda
+        # gravada no meio entra na leitura ou soma depois sobre o resumo novo, mas não se perde
+        with transaction.atomic():
+            _travar_resumo()
+
+            # Uma única consulta agrupada sobre os totais já gravados em cada venda
+            linhas = Venda.objects.annotate(dia=TruncDate('data')).values('dia', 'forma_pagamento').annotate(
+                vendas=Count('id'),
+                valor=Sum('valor_total'),
+                itens=Sum('quantidade_itens'),
+            ).order_by()
+
+            resumos = [
+                VendaDiaria(
+                    data=linha['dia'],
+                    forma_pagamento=linha['forma_pagamento'],
+                    valor_total=linha['valor'] or 0,
+                    quantidade_itens=linha['itens'] or 0,
+                    quantidade_vendas=linha['vendas'],
+                )
+                for linha in linhas
+            ]
+            VendaDiaria.objects.bulk_create(resumos, batch_size=1000)
+        invalidar_dashboard()
+        invalidar_relatorios()
+
+        self.stdout.write(self.style.SUCCESS(f"{len(resumos)} resumos diários gerados."))
+
+
+def _travar_resumo():
+    """Apaga o resumo segurando a escrita nele até o fim da transação.
+
+    No PostgreSQL a tabela é travada contra escritas (as vendas que atualizam o resumo esperam); no
+    SQLite o DELETE já pega o lock de escrita do banco, e a leitura seguinte vê tudo o que foi confirmado.
+    """
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(f'LOCK TABLE {connection.ops.quote_name(VendaDiaria._meta.db_table)} IN EXCLUSIVE MODE')
+    VendaDiaria.objects.all().delete()
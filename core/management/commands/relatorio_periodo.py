@@ -0,0 +1,77 @@
+import json
+from datetime import datetime, timedelta
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+from django.utils.timezone import localdate
+from core.relatorios import LIMITE_PRODUTOS, relatorio_periodo
+
+
+def _variacao(valor):
+    return "sem base" if valor is None else f"{valor:+.1f}%"
+
+
+class Command(BaseCommand):
+    help = ("Relatório de vendas de um período (padrão: o mês passado): faturamento por usuário, produtos "
+            "mais vendidos, ticket médio, formas de pagamento e comparação com o período anterior.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mes', help="Mês do relatório (AAAA-MM).")
+        parser.add_argument('--inicio', help="Data inicial (AAAA-MM-DD).")
+        parser.add_argument('--fim', help="Data final, inclusive (AAAA-MM-DD).")
+        parser.add_argument('--produtos', type=int, default=LIMITE_PRODUTOS,
+                            help="Quantos produtos listar (padrão: %(default)s).")
+        parser.add_argument('--json', action='store_true', help="Escreve o relatório em JSON.")
+        parser.add_argument('--recalcular', action='store_true', help="Ignora o relatório guardado do período.")
+
+    def _periodo(self, options):
+        if options['mes']:
+            try:
+                inicio = datetime.strptime(options['mes'], '%Y-%m').date()
+            except ValueError:
+                raise CommandError("Mês inválido, use AAAA-MM.")
+            return inicio, (inicio + timedelta(days=31)).replace(day=1) - timedelta(days=1)
+
+        if options['inicio'] or options['fim']:
+            inicio, fim = parse_date(options['inicio'] or ''), parse_date(options['fim'] or '')
+            if not inicio or not fim:
+                raise CommandError("Informe --inicio e --fim no formato AAAA-MM-DD.")
+            return inicio, fim
+
+        fim = localdate().replace(day=1) - timedelta(days=1)
+        return fim.replace(day=1), fim
+
+    def handle(self, *args, **options):
+        inicio, fim = self._periodo(options)
+        try:
+            relatorio = relatorio_periodo(inicio, fim, options['produtos'], recalcular=options['recalcular'])
+        except ValidationError as erro:
+            raise CommandError(erro.messages[0])
+
+        if options['json']:
+            self.stdout.write(json.dumps(relatorio, ensure_ascii=False, indent=2))
+            return
+
+        totais, anterior, variacao = relatorio['totais'], relatorio['anterior'], relatorio['variacao']
+        self.stdout.write(self.style.MIGRATE_HEADING(f"Vendas de {inicio:%d/%m/%Y} a {fim:%d/%m/%Y}"))
+        self.stdout.write(f"Faturamento: {totais['valor']} ({_variacao(variacao['valor'])} sobre {anterior['valor']})")
+        self.stdout.write(f"Vendas: {totais['vendas']} ({_variacao(variacao['vendas'])} sobre {anterior['vendas']})")
+        self.stdout.write(f"Ticket médio: {totais['ticket_medio']} "
+                          f"({_variacao(variacao['ticket_medio'])} sobre {anterior['ticket_medio']})")
+        self.stdout.write(f"Itens: {totais['itens']}")
+
+        self.stdout.write(self.style.MIGRATE_HEADING("Formas de pagamento"))
+        for forma in relatorio['formas_pagamento']:
+            self.stdout.write(f"  {forma['rotulo']}: {forma['valor']} ({forma['percentual_valor']}%), "
+                              f"{forma['vendas']} vendas")
+
+        self.stdout.write(self.style.MIGRATE_HEADING("Faturamento por usuário"))
+        for usuario in relatorio['usuarios']:
+            self.stdout.write(f"  {usuario['usuario']}: {usuario['valor']} em {usuario['vendas']} vendas "
+                              f"(ticket {usuario['ticket_medio']})")
+
+        self.stdout.write(self.style.MIGRATE_HEADING("Produtos mais vendidos"))
+        for posicao, produto in enumerate(relatorio['produtos'], 1):
+            self.stdout.write(f"  {posicao}. {produto['nome']} ({produto['codigo_barras']}): "
+                              f"{produto['unidades']} un., {produto['valor']}")
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+from core.reposicao import escrever_csv, relatorio_reposicao
+
+
+class Command(BaseCommand):
+    help = "Gera em CSV o relatório de reposição: giro diário e dias de estoque restantes de cada produto."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=30, help="Janela de vendas usada no giro (padrão: 30).")
+        parser.add_argument('--limiar', type=float, default=7,
+                            help="Dias de estoque abaixo dos quais o produto é crítico (padrão: 7).")
+        parser.add_argument('--cobertura', type=int, default=30,
+                            help="Dias de venda que a sugestão de compra deve cobrir (padrão: 30).")
+        parser.add_argument('--todos', action='store_true', help="Lista também os produtos que não são críticos.")
+        parser.add_argument('--saida', help="Arquivo CSV de saída (padrão: saída padrão).")
+
+    def handle(self, *args, **options):
+        if options['dias'] < 1:
+            raise CommandError("A janela precisa ter pelo menos 1 dia.")
+
+        relatorio = relatorio_reposicao(
+            options['dias'], options['limiar'], options['cobertura'], apenas_criticos=not options['todos'],
+        )
+        if options['saida']:
+            with open(options['saida'], 'w', newline='', encoding='utf-8') as saida:
+                escrever_csv(relatorio, saida)
+            self.stderr.write(f"{len(relatorio)} produtos gravados em {options['saida']}.")
+        else:
+            escrever_csv(relatorio, self.stdout)
@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Sum, F, Value, DecimalField, ExpressionWrapper
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.timezone import localdate
+from core.dashboard import invalidar_dashboard
+from core.models import Venda, VendaDiaria
+from core.relatorios import invalidar_relatorios
+
+
+class Command(BaseCommand):
+    help = "Compara os totais gravados em cada venda com a soma dos seus itens e aponta divergências."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--corrigir', action='store_true', help="Regrava os totais das vendas divergentes.")
+
+    def handle(self, *args, **options):
+        divergentes = Venda.objects.annotate(
+            soma_valor=Coalesce(
+                Sum(ExpressionWrapper(F('itens__quantidade') * F('itens__preco_unitario'), output_field=DecimalField())),
+                Value(0),
+                output_field=DecimalField(),
+            ),
+            soma_itens=Coalesce(Sum('itens__quantidade'), Value(0)),
+        ).exclude(valor_total=F('soma_valor'), quantidade_itens=F('soma_itens'))
+
+        total = 0
+        for venda in divergentes.iterator(chunk_size=1000):
+            total += 1
+            self.stdout.write(
+                f"Venda {venda.pk}: gravado {venda.valor_total} / {venda.quantidade_itens} itens, "
+                f"calculado {venda.soma_valor} / {venda.soma_itens} itens"
+            )
+            if options['corrigir']:
+                with transaction.atomic():
+                    Venda.objects.filter(pk=venda.pk).update(
+                        valor_total=venda.soma_valor, quantidade_itens=venda.soma_itens, atualizado_em=timezone.now(),
+                    )
+                    # O resumo diário soma os totais gravados: leva a mesma diferença
+                    VendaDiaria.registrar(
+                        localdate(venda.data),
+                        venda.forma_pagamento,
+                        valor=venda.soma_valor - venda.valor_total,
+                        itens=venda.soma_itens - venda.quantidade_itens,
+                    )
+
+        if not total:
+            self.stdout.write(self.style.SUCCESS("Nenhuma divergência encontrada."))
+        elif options['corrigir']:
+            invalidar_dashboard()
+            invalidar_relatorios()  # O faturamento por usuário sai dos totais gravados nas vendas
+            self.stdout.write(self.style.WARNING(f"{total} vendas corrigidas."))
+        else:
+            raise CommandError(f"{total} vendas com totais divergentes (use --corrigir).")
@@ -0,0 +1,165 @@
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+logger = logging.getLogger('core.metricas')
+
+
+def configuracao(nome, padrao):
+    return getattr(settings, f'METRICAS_{nome}', padrao)
+
+
+class _ColetorConsultas:
+    """Consultas (sql, duração em ms) feitas durante uma requisição, em qualquer thread."""
+
+    def __init__(self):
+        self.consultas = []
+
+    @property
+    def tempo_total_ms(self):
+        return sum(duracao for _, duracao in self.consultas)
+
+
+# Coletor da requisição em andamento. sync_to_async copia o contexto para a thread que executa
+# o código síncrono, então as consultas das threads de trabalho também chegam ao coletor certo.
+_coletor_atual = ContextVar('coletor_consultas', default=None)
+
+
+def _medir(execute, sql, params, many, context):
+    """execute_wrapper fixo de cada conexão: cronometra a consulta se houver requisição sendo medida."""
+    coletor = _coletor_atual.get()
+    if coletor is None:
+        return execute(sql, params, many, context)
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        coletor.consultas.append((sql, (time.perf_counter() - inicio) * 1000))
+
+
+@receiver(connection_created)
+def _medir_nova_conexao(sender, connection, **kwargs):
+    # Toda conexão, em qualquer thread, passa a ser medida; o receiver é ligado em CoreConfig.ready
+    if _medir not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_medir)
+
+
+class RegistroMetricas:
+    """Guarda, em memória do processo, as últimas amostras de cada view."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._amostras = defaultdict(lambda: deque(maxlen=configuracao('AMOSTRAS_POR_VIEW', 1000)))
+
+    def registrar(self, view, duracao_ms, consultas, tempo_db_ms):
+        with self._lock:
+            self._amostras[view].append((duracao_ms, consultas, tempo_db_ms))
+
+    def limpar(self):
+        with self._lock:
+            self._amostras.clear()
+
+    def resumo(self):
+        """Percentis de tempo, consultas e tempo de banco por view, das mais lentas para as mais rápidas."""
+        with self._lock:
+            amostras = {view: list(valores) for view, valores in self._amostras.items()}
+
+        linhas = []
+        for view, valores in amostras.items():
+            duracoes, consultas, tempos_db = (sorted(coluna) for coluna in zip(*valores))
+            linhas.append({
+                'view': view,
+                'requisicoes': len(valores),
+                'p50_ms': _percentil(duracoes, 50),
+                'p95_ms': _percentil(duracoes, 95),
+                'p99_ms': _percentil(duracoes, 99),
+                'consultas_p50': _percentil(consultas, 50),
+                'consultas_max': consultas[-1],
+                'db_p95_ms': _percentil(tempos_db, 95),
+            })
+        return sorted(linhas, key=lambda linha: linha['p95_ms'], reverse=True)
+
+
+def _percentil(valores_ordenados, percentil):
+    indice = min(len(valores_ordenados) - 1, int(len(valores_ordenados) * percentil / 100))
+    return round(valores_ordenados[indice], 2)
+
+
+registro = RegistroMetricas()
+
+SEM_ROTA = '<sem rota>'
+
+
+class MetricasRequisicaoMiddleware:
+    """Mede tempo total, número de consultas e tempo de banco de cada requisição.
+
+    Funciona nos modos WSGI e ASGI; no ASGI as views assíncronas não passam por uma thread síncrona
+    por causa dele. As consultas são contadas em qualquer thread que execute código da requisição,
+    inclusive as de sync_to_async(thread_sensitive=False) usadas pelo dashboard assíncrono.
+
+    Requisições acima de METRICAS_LIMIAR_LENTO_MS ou METRICAS_LIMIAR_CONSULTAS são registradas
+    no log ``core.metricas`` com as consultas mais demoradas. Requisições que não casam com nenhuma
+    rota ficam todas em SEM_ROTA, para que URLs aleatórias não criem uma entrada cada.
+
+    Só se mede até a view devolver a resposta: consultas feitas enquanto o corpo de uma
+    StreamingHttpResponse é consumido (o CSV de /exportar/) não entram na contagem nem no tempo.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.assincrono = iscoroutinefunction(get_response)
+        if self.assincrono:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.assincrono:
+            return self.__acall__(request)
+
+        coletor = _ColetorConsultas()
+        token = _coletor_atual.set(coletor)
+        inicio = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _coletor_atual.reset(token)
+        self._registrar(request, coletor, (time.perf_counter() - inicio) * 1000)
+        return response
+
+    async def __acall__(self, request):
+        coletor = _ColetorConsultas()
+        token = _coletor_atual.set(coletor)
+        inicio = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _coletor_atual.reset(token)
+        self._registrar(request, coletor, (time.perf_counter() - inicio) * 1000)
+        return response
+
+    def _registrar(self, request, coletor, duracao_ms):
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match and match.view_name else SEM_ROTA
+        registro.registrar(view, duracao_ms, len(coletor.consultas), coletor.tempo_total_ms)
+
+        if duracao_ms >= configuracao('LIMIAR_LENTO_MS', 500) or len(coletor.consultas) >= configuracao('LIMIAR_CONSULTAS', 50):
+            mais_lentas = sorted(coletor.consultas, key=lambda consulta: consulta[1], reverse=True)
+            logger.warning(
+                "Requisição lenta: %s %s (%s) - %.1f ms, %d consultas, %.1f ms no banco\n%s",
+                request.method,
+                request.path,
+                view,
+                duracao_ms,
+                len(coletor.consultas),
+                coletor.tempo_total_ms,
+                "\n".join(f"  {tempo:.1f} ms: {sql}" for sql, tempo in mais_lentas[:configuracao('CONSULTAS_NO_LOG', 5)]),
+            )
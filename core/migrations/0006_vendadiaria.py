@@ -0,0 +1,57 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:40
+
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum
+from django.db.models.functions import TruncDate
+
+
+def popular_resumo(apps, schema_editor):
+    Venda = apps.get_model('core', 'Venda')
+    ItemVenda = apps.get_model('core', 'ItemVenda')
+    VendaDiaria = apps.get_model('core', 'VendaDiaria')
+
+    resumos = {}
+    vendas = Venda.objects.annotate(dia=TruncDate('data')).values('dia', 'forma_pagamento').annotate(
+        total=Count('id')
+    ).order_by()
+    for linha in vendas:
+        chave = (linha['dia'], linha['forma_pagamento'])
+        resumos[chave] = VendaDiaria(data=chave[0], forma_pagamento=chave[1], quantidade_vendas=linha['total'])
+
+    itens = ItemVenda.objects.annotate(dia=TruncDate('venda__data')).values('dia', 'venda__forma_pagamento').annotate(
+        valor=Sum(ExpressionWrapper(F('quantidade') * F('preco_unitario'), output_field=DecimalField())),
+        quantidade=Sum('quantidade'),
+    ).order_by()
+    for linha in itens:
+        resumo = resumos[(linha['dia'], linha['venda__forma_pagamento'])]
+        resumo.valor_total = linha['valor'] or 0
+        resumo.quantidade_itens = linha['quantidade'] or 0
+
+    VendaDiaria.objects.bulk_create(resumos.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_venda_forma_pagamento'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VendaDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.DateField()),
+                ('forma_pagamento', models.CharField(choices=[('PIX', 'PIX'), ('DEBITO', 'Débito'), ('DINHEIRO', 'Dinheiro'), ('CREDITO', 'Crédito')], max_length=8)),
+                ('valor_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('quantidade_itens', models.PositiveIntegerField(default=0)),
+                ('quantidade_vendas', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Resumo diário de vendas',
+                'verbose_name_plural': 'Resumos diários de vendas',
+                'constraints': [models.UniqueConstraint(fields=('data', 'forma_pagamento'), name='venda_diaria_unica')],
+            },
+        ),
+        migrations.RunPython(popular_resumo, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:42
+
+from django.db import migrations, models
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def preencher_totais(apps, schema_editor):
+    Venda = apps.get_model('core', 'Venda')
+    ItemVenda = apps.get_model('core', 'ItemVenda')
+
+    itens = ItemVenda.objects.filter(venda=OuterRef('pk')).values('venda')
+    Venda.objects.update(
+        valor_total=Coalesce(
+            Subquery(itens.annotate(total=Sum(ExpressionWrapper(
+                F('quantidade') * F('preco_unitario'), output_field=DecimalField()
+            ))).values('total')),
+            Value(0),
+            output_field=DecimalField(),
+        ),
+        quantidade_itens=Coalesce(Subquery(itens.annotate(total=Sum('quantidade')).values('total')), Value(0)),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_vendadiaria'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='venda',
+            name='quantidade_itens',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='venda',
+            name='valor_total',
+            field=models.DecimalField(db_index=True, decimal_places=2, default=0, editable=False, max_digits=12),
+        ),
+        migrations.RunPython(preencher_totais, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:45
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_venda_valor_total_quantidade_itens'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Exportacao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recurso', models.CharField(choices=[('vendas', 'Vendas'), ('itens', 'Itens de venda'), ('estoque', 'Estoque')], max_length=10)),
+                ('formato', models.CharField(choices=[('csv', 'CSV'), ('xlsx', 'XLSX')], default='csv', max_length=4)),
+                ('inicio', models.DateField(blank=True, null=True, verbose_name='Data inicial')),
+                ('fim', models.DateField(blank=True, null=True, verbose_name='Data final')),
+                ('ids', models.JSONField(blank=True, editable=False, null=True)),
+                ('status', models.CharField(choices=[('PENDENTE', 'Pendente'), ('PROCESSANDO', 'Processando'), ('CONCLUIDA', 'Concluída'), ('ERRO', 'Erro')], db_index=True, default='PENDENTE', max_length=11)),
+                ('linhas_processadas', models.PositiveIntegerField(default=0)),
+                ('total_linhas', models.PositiveIntegerField(blank=True, null=True)),
+                ('arquivo', models.FileField(blank=True, upload_to='exportacoes/')),
+                ('erro', models.TextField(blank=True)),
+                ('criada_em', models.DateTimeField(auto_now_add=True)),
+                ('iniciada_em', models.DateTimeField(blank=True, null=True)),
+                ('concluida_em', models.DateTimeField(blank=True, null=True)),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Exportação',
+                'verbose_name_plural': 'Exportações',
+                'ordering': ['-criada_em'],
+            },
+        ),
+    ]
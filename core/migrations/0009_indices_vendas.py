@@ -0,0 +1,27 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:45
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_exportacao'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='itemvenda',
+            index=models.Index(fields=['venda', 'produto'], name='itemvenda_venda_produto_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='venda',
+            index=models.Index(fields=['data', 'forma_pagamento'], name='venda_data_forma_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='venda',
+            index=models.Index(fields=['usuario', 'data'], name='venda_usuario_data_idx'),
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.7 on 2026-10-18 19:00
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def saldo_inicial(apps, schema_editor):
+    # O estoque atual vira o primeiro corte do livro; os movimentos passam a contar daqui em diante
+    Estoque = apps.get_model('core', 'Estoque')
+    SaldoEstoque = apps.get_model('core', 'SaldoEstoque')
+
+    corte = timezone.now()
+    SaldoEstoque.objects.bulk_create([
+        SaldoEstoque(produto_id=produto_id, data=corte, quantidade=quantidade)
+        for produto_id, quantidade in Estoque.objects.exclude(quantidade=0).values_list('produto_id', 'quantidade')
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_indices_vendas'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovimentoEstoque',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('VENDA', 'Venda'), ('REPOSICAO', 'Reposição'), ('AJUSTE', 'Ajuste'), ('DEVOLUCAO', 'Devolução')], max_length=9)),
+                ('quantidade', models.IntegerField()),
+                ('criado_em', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('observacao', models.CharField(blank=True, max_length=200)),
+                ('produto', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='movimentos', to='core.produto')),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('venda', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='movimentos', to='core.venda')),
+            ],
+            options={
+                'verbose_name': 'Movimento de estoque',
+                'verbose_name_plural': 'Movimentos de estoque',
+                'indexes': [models.Index(fields=['produto', 'criado_em'], name='movimento_produto_data_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SaldoEstoque',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.DateTimeField(db_index=True)),
+                ('quantidade', models.IntegerField()),
+                ('produto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='saldos', to='core.produto')),
+            ],
+            options={
+                'verbose_name': 'Saldo de estoque',
+                'verbose_name_plural': 'Saldos de estoque',
+                'constraints': [models.UniqueConstraint(fields=('data', 'produto'), name='saldo_estoque_unico')],
+            },
+        ),
+        migrations.RunPython(saldo_inicial, migrations.RunPython.noop),
+    ]
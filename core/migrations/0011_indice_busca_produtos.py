@@ -0,0 +1,82 @@
+from django.db import migrations
+
+# SQLite: tabela FTS5 ligada a core_produto, mantida por gatilhos (cobrem também bulk_create e update()).
+SQLITE_CRIAR = [
+    """
+    CREATE VIRTUAL TABLE core_produto_busca USING fts5(
+        nome, codigo_barras,
+        content='core_produto', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER core_produto_busca_insert AFTER INSERT ON core_produto BEGIN
+        INSERT INTO core_produto_busca(rowid, nome, codigo_barras) VALUES (new.id, new.nome, new.codigo_barras);
+    END
+    """,
+    """
+    CREATE TRIGGER core_produto_busca_delete AFTER DELETE ON core_produto BEGIN
+        INSERT INTO core_produto_busca(core_produto_busca, rowid, nome, codigo_barras)
+        VALUES ('delete', old.id, old.nome, old.codigo_barras);
+    END
+    """,
+    """
+    CREATE TRIGGER core_produto_busca_update AFTER UPDATE OF nome, codigo_barras ON core_produto BEGIN
+        INSERT INTO core_produto_busca(core_produto_busca, rowid, nome, codigo_barras)
+        VALUES ('delete', old.id, old.nome, old.codigo_barras);
+        INSERT INTO core_produto_busca(rowid, nome, codigo_barras) VALUES (new.id, new.nome, new.codigo_barras);
+    END
+    """,
+    "INSERT INTO core_produto_busca(core_produto_busca) VALUES ('rebuild')",
+]
+SQLITE_REMOVER = [
+    "DROP TRIGGER IF EXISTS core_produto_busca_insert",
+    "DROP TRIGGER IF EXISTS core_produto_busca_delete",
+    "DROP TRIGGER IF EXISTS core_produto_busca_update",
+    "DROP TABLE IF EXISTS core_produto_busca",
+]
+
+# PostgreSQL: índice de trigramas, usado tanto pelo icontains do admin quanto pela busca por semelhança.
+POSTGRESQL_CRIAR = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS produto_nome_trgm_idx ON core_produto USING gin (nome gin_trgm_ops)",
+]
+POSTGRESQL_REMOVER = [
+    "DROP INDEX IF EXISTS produto_nome_trgm_idx",
+]
+
+
+def _executar(schema_editor, comandos):
+    for comando in comandos:
+        schema_editor.execute(comando)
+
+
+def criar_indice(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+            if not cursor.fetchone()[0]:
+                return  # Sem FTS5 a busca continua com LIKE (ver core/busca.py)
+        _executar(schema_editor, SQLITE_CRIAR)
+    elif vendor == 'postgresql':
+        _executar(schema_editor, POSTGRESQL_CRIAR)
+
+
+def remover_indice(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        _executar(schema_editor, SQLITE_REMOVER)
+    elif vendor == 'postgresql':
+        _executar(schema_editor, POSTGRESQL_REMOVER)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_movimentoestoque_saldoestoque'),
+    ]
+
+    operations = [
+        migrations.RunPython(criar_indice, remover_indice),
+    ]
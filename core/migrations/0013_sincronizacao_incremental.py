@@ -0,0 +1,65 @@
+# Generated by Django 5.2.7 on 2026-10-18 19:08
+
+from django.conf import settings
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_indice_venda_data_id'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MarcaSincronizacao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('consumidor', models.CharField(max_length=50)),
+                ('recurso', models.CharField(choices=[('vendas', 'Vendas'), ('itens', 'Itens de venda'), ('estoque', 'Estoque')], max_length=10)),
+                ('atualizado_em', models.DateTimeField(blank=True, null=True)),
+                ('ultimo_id', models.BigIntegerField(default=0)),
+                ('confirmada_em', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Marca de sincronização',
+                'verbose_name_plural': 'Marcas de sincronização',
+            },
+        ),
+        migrations.AddField(
+            model_name='estoque',
+            name='atualizado_em',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='itemvenda',
+            name='atualizado_em',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='venda',
+            name='atualizado_em',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name='estoque',
+            index=models.Index(fields=['atualizado_em', 'id'], name='estoque_atualizado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='itemvenda',
+            index=models.Index(fields=['atualizado_em', 'id'], name='itemvenda_atualizado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='venda',
+            index=models.Index(fields=['atualizado_em', 'id'], name='venda_atualizado_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='marcasincronizacao',
+            constraint=models.UniqueConstraint(fields=('consumidor', 'recurso'), name='marca_sincronizacao_unica'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.7 on 2026-10-18 19:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_sincronizacao_incremental'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatorioPeriodo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('inicio', models.DateField()),
+                ('fim', models.DateField()),
+                ('anterior_inicio', models.DateField()),
+                ('limite_produtos', models.PositiveSmallIntegerField()),
+                ('dados', models.JSONField()),
+                ('gerado_em', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Relatório de período',
+                'verbose_name_plural': 'Relatórios de período',
+                'constraints': [models.UniqueConstraint(fields=('inicio', 'fim', 'limite_produtos'), name='relatorio_periodo_unico')],
+            },
+        ),
+    ]
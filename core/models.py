@@ -1,10 +1,16 @@
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
-from django.db import models
-from django.db.models import Sum
+from django.db import models, transaction
+from django.db.models import Sum, F
+from django.utils import timezone
+from django.utils.timezone import localdate
 from decimal import Decimal
 
 
+class EstoqueInsuficiente(ValidationError):
+    """Levantada quando não há estoque suficiente para concluir a venda de um item."""
+
+
 class Produto(models.Model):
     codigo_barras = models.CharField(max_length=20, unique=True)  # Novo campo
     nome = models.CharField(max_length=100)
@@ -18,6 +24,12 @@ class Produto(models.Model):
 class Estoque(models.Model):
     produto = models.OneToOneField(Produto, on_delete=models.CASCADE)
     quantidade = models.PositiveIntegerField(default=0)
+    atualizado_em = models.DateTimeField(auto_now=True)  # Marca d'água da sincronização incremental
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['atualizado_em', 'id'], name='estoque_atualizado_idx'),
+        ]
 
     def __str__(self):
         return f"{self.produto.nome} - {self.quantidade}"
@@ -39,24 +51,44 @@ class Venda(models.Model):
         default='DINHEIRO',
         verbose_name="Forma de Pagamento"
     )
+    # Totais desnormalizados, mantidos pelos itens (ver ItemVenda.save e registrar_venda)
+    valor_total = models.DecimalField(max_digits=12, decimal_places=2, default=0, editable=False, db_index=True)
+    quantidade_itens = models.PositiveIntegerField(default=0, editable=False)
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Filtros por período (dashboard, admin) com ou sem forma de pagamento
+            models.Index(fields=['data', 'forma_pagamento'], name='venda_data_forma_idx'),
+            # Filtro do admin por usuário dentro de um período
+            models.Index(fields=['usuario', 'data'], name='venda_usuario_data_idx'),
+            models.Index(fields=['data', 'id'], name='venda_data_id_idx'),  # Cursor do histórico de vendas
+            models.Index(fields=['atualizado_em', 'id'], name='venda_atualizado_idx'),
+        ]
 
     def __str__(self):
         return f"Venda {self.id} - {self.data.strftime('%d/%m/%Y %H:%M')}"
 
-    @property
-    def valor_total(self):
-        total = self.itens.aggregate(
-            total=models.Sum(models.F('quantidade') * models.F('preco_unitario'),
-                             output_field=models.DecimalField())
-        )['total']
-        return total or 0
+    def save(self, *args, **kwargs):
+        nova = self._state.adding
+        super().save(*args, **kwargs)
 
+        # Contabiliza a venda no resumo diário
+        if nova:
+            VendaDiaria.registrar(localdate(self.data), self.forma_pagamento, vendas=1)
 
 class ItemVenda(models.Model):
     venda = models.ForeignKey(Venda, related_name='itens', on_delete=models.CASCADE)
     produto = models.ForeignKey(Produto, on_delete=models.PROTECT)
     quantidade = models.PositiveIntegerField()
     preco_unitario = models.DecimalField(max_digits=10, decimal_places=2, blank=True)
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['venda', 'produto'], name='itemvenda_venda_produto_idx'),
+            models.Index(fields=['atualizado_em', 'id'], name='itemvenda_atualizado_idx'),
+        ]
 
     def __str__(self):
         return f"{self.quantidade}x {self.produto.nome}"
@@ -65,9 +97,11 @@ class ItemVenda(models.Model):
         return self.quantidade * self.preco_unitario
 
     def clean(self):
-        from django.db.models import Sum
+        if self.produto_id is None or self.quantidade is None:
+            return  # Os erros dos próprios campos já são informados pelo formulário
+
         # Busca o estoque atual do produto
-        estoque = Estoque.objects.filter(produto=self.produto).first()
+        estoque = Estoque.objects.filter(produto_id=self.produto_id).first()
         if estoque and self.quantidade > estoque.quantidade:
             raise ValidationError({
                 'quantidade': f"Quantidade solicitada ({self.quantidade}) excede o estoque disponível ({estoque.quantidade})."
@@ -77,11 +111,226 @@ class ItemVenda(models.Model):
         # Sempre atualiza o preço com o valor atual do produto
         if not self.preco_unitario:
             self.preco_unitario = self.produto.preco
+        # O subtotal é calculado em memória: um preço em texto ('10.00') repetiria a string em vez de multiplicar
+        self.preco_unitario = self._meta.get_field('preco_unitario').to_python(self.preco_unitario)
 
-        self.full_clean()  # Garante que o clean() seja chamado antes de salvar
-        super().save(*args, **kwargs)
+        novo = self._state.adding
+        with transaction.atomic():
+            # Baixa o estoque antes de gravar o item, dentro da mesma transação
+            if novo:
+                self.baixar_estoque()
+            super().save(*args, **kwargs)
+
+            if novo:
+                # Soma o item aos totais da venda
+                Venda.objects.filter(pk=self.venda_id).update(
+                    valor_total=F('valor_total') + self.subtotal(),
+                    quantidade_itens=F('quantidade_itens') + self.quantidade,
+                    atualizado_em=timezone.now(),  # update() não aplica o auto_now
+                )
+
+                # Soma o item ao resumo diário da venda
+                VendaDiaria.registrar(
+                    localdate(self.venda.data),
+                    self.venda.forma_pagamento,
+                    valor=self.subtotal(),
+                    itens=self.quantidade,
+                )
+
+    def baixar_estoque(self):
+        """Debita o estoque com um único UPDATE condicional (seguro entre caixas concorrentes)."""
+        atualizados = Estoque.objects.filter(
+            produto_id=self.produto_id,
+            quantidade__gte=self.quantidade,
+        ).update(quantidade=F('quantidade') - self.quantidade, atualizado_em=timezone.now())
+
+        if not atualizados:
+            disponivel = Estoque.objects.filter(produto_id=self.produto_id).values_list('quantidade', flat=True).first()
+            raise EstoqueInsuficiente({
+                'quantidade': f"Quantidade solicitada ({self.quantidade}) excede o estoque disponível ({disponivel or 0})."
+            })
+
+        MovimentoEstoque.objects.create(
+            produto_id=self.produto_id, tipo='VENDA', quantidade=-self.quantidade, venda_id=self.venda_id,
+        )
+
+        from .catalogo import invalidar_produtos  # Evita import circular
+        invalidar_produtos([self.produto_id])
+
+
+class VendaDiaria(models.Model):
+    """Resumo pré-agregado das vendas por dia e forma de pagamento."""
+
+    data = models.DateField()
+    forma_pagamento = models.CharField(max_length=8, choices=Venda.FORMA_PAGAMENTO_CHOICES)
+    valor_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    quantidade_itens = models.PositiveIntegerField(default=0)
+    quantidade_vendas = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Resumo diário de vendas"
+        verbose_name_plural = "Resumos diários de vendas"
+        constraints = [
+            models.UniqueConstraint(fields=['data', 'forma_pagamento'], name='venda_diaria_unica'),
+        ]
+
+    def __str__(self):
+        return f"{self.data.strftime('%d/%m/%Y')} - {self.get_forma_pagamento_display()}"
+
+    @classmethod
+    def registrar(cls, data, forma_pagamento, valor=0, itens=0, vendas=0):
+        """Soma (ou subtrai, com valores negativos) os totais no resumo do dia."""
+        linhas = cls.objects.filter(data=data, forma_pagamento=forma_pagamento)
+        incrementos = {
+            'valor_total': F('valor_total') + valor,
+            'quantidade_itens': F('quantidade_itens') + itens,
+            'quantidade_vendas': F('quantidade_vendas') + vendas,
+        }
+        if not linhas.update(**incrementos):
+            cls.objects.get_or_create(data=data, forma_pagamento=forma_pagamento)
+            linhas.update(**incrementos)
+
+
+class Exportacao(models.Model):
+    """Exportação gerada fora da requisição pelo comando processar_exportacoes."""
+
+    RECURSO_CHOICES = [
+        ('vendas', 'Vendas'),
+        ('itens', 'Itens de venda'),
+        ('estoque', 'Estoque'),
+    ]
+    FORMATO_CHOICES = [
+        ('csv', 'CSV'),
+        ('xlsx', 'XLSX'),
+    ]
+    STATUS_CHOICES = [
+        ('PENDENTE', 'Pendente'),
+        ('PROCESSANDO', 'Processando'),
+        ('CONCLUIDA', 'Concluída'),
+        ('ERRO', 'Erro'),
+    ]
+
+    usuario = models.ForeignKey(User, on_delete=models.PROTECT)
+    recurso = models.CharField(max_length=10, choices=RECURSO_CHOICES)
+    formato = models.CharField(max_length=4, choices=FORMATO_CHOICES, default='csv')
+    inicio = models.DateField(null=True, blank=True, verbose_name="Data inicial")
+    fim = models.DateField(null=True, blank=True, verbose_name="Data final")
+    ids = models.JSONField(null=True, blank=True, editable=False)  # Seleção feita por uma ação do admin
+    status = models.CharField(max_length=11, choices=STATUS_CHOICES, default='PENDENTE', db_index=True)
+    linhas_processadas = models.PositiveIntegerField(default=0)
+    total_linhas = models.PositiveIntegerField(null=True, blank=True)
+    arquivo = models.FileField(upload_to='exportacoes/', blank=True)
+    erro = models.TextField(blank=True)
+    criada_em = models.DateTimeField(auto_now_add=True)
+    iniciada_em = models.DateTimeField(null=True, blank=True)
+    concluida_em = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Exportação"
+        verbose_name_plural = "Exportações"
+        ordering = ['-criada_em']
 
-        # Atualiza o estoque
-        estoque = Estoque.objects.get(produto=self.produto)
-        estoque.quantidade -= self.quantidade
-        estoque.save()
+    def __str__(self):
+        return f"Exportação {self.id} - {self.get_recurso_display()} ({self.get_formato_display()})"
+
+    @property
+    def duracao(self):
+        if self.iniciada_em and self.concluida_em:
+            return self.concluida_em - self.iniciada_em
+        return None
+
+
+class MovimentoEstoque(models.Model):
+    """Lançamento no livro de estoque: só é inserido, nunca alterado.
+
+    ``quantidade`` é a variação com sinal (negativa nas saídas). O saldo de um produto em qualquer
+    instante é o último SaldoEstoque anterior somado aos movimentos desde então (ver core/movimentos.py).
+    """
+
+    TIPO_CHOICES = [
+        ('VENDA', 'Venda'),
+        ('REPOSICAO', 'Reposição'),
+        ('AJUSTE', 'Ajuste'),
+        ('DEVOLUCAO', 'Devolução'),
+    ]
+
+    produto = models.ForeignKey(Produto, on_delete=models.PROTECT, related_name='movimentos')
+    tipo = models.CharField(max_length=9, choices=TIPO_CHOICES)
+    quantidade = models.IntegerField()
+    criado_em = models.DateTimeField(default=timezone.now, db_index=True)
+    venda = models.ForeignKey(Venda, null=True, blank=True, on_delete=models.SET_NULL, related_name='movimentos')
+    usuario = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL)
+    observacao = models.CharField(max_length=200, blank=True)
+
+    class Meta:
+        verbose_name = "Movimento de estoque"
+        verbose_name_plural = "Movimentos de estoque"
+        indexes = [
+            models.Index(fields=['produto', 'criado_em'], name='movimento_produto_data_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} {self.quantidade:+d} {self.produto}"
+
+
+class SaldoEstoque(models.Model):
+    """Saldo dos produtos num corte: soma de todos os movimentos com criado_em anterior a ``data``.
+
+    Cada corte grava uma linha por produto com saldo diferente de zero; produto ausente do corte tem saldo zero.
+    """
+
+    produto = models.ForeignKey(Produto, on_delete=models.CASCADE, related_name='saldos')
+    data = models.DateTimeField(db_index=True)
+    quantidade = models.IntegerField()
+
+    class Meta:
+        verbose_name = "Saldo de estoque"
+        verbose_name_plural = "Saldos de estoque"
+        constraints = [
+            models.UniqueConstraint(fields=['data', 'produto'], name='saldo_estoque_unico'),
+        ]
+
+    def __str__(self):
+        return f"{self.produto} em {self.data:%d/%m/%Y %H:%M}: {self.quantidade}"
+
+
+class MarcaSincronizacao(models.Model):
+    """Até onde cada consumidor já recebeu as alterações de um recurso (ver core/sincronizacao.py)."""
+
+    consumidor = models.CharField(max_length=50)
+    recurso = models.CharField(max_length=10, choices=Exportacao.RECURSO_CHOICES)
+    atualizado_em = models.DateTimeField(null=True, blank=True)
+    ultimo_id = models.BigIntegerField(default=0)
+    confirmada_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Marca de sincronização"
+        verbose_name_plural = "Marcas de sincronização"
+        constraints = [
+            models.UniqueConstraint(fields=['consumidor', 'recurso'], name='marca_sincronizacao_unica'),
+        ]
+
+    def __str__(self):
+        return f"{self.consumidor} - {self.get_recurso_display()}"
+
+
+class RelatorioPeriodo(models.Model):
+    """Relatório de um período já encerrado, guardado para não ser recalculado (ver core/relatorios.py)."""
+
+    inicio = models.DateField()
+    fim = models.DateField()
+    # Início do período de comparação, que termina no dia anterior a ``inicio``
+    anterior_inicio = models.DateField()
+    limite_produtos = models.PositiveSmallIntegerField()
+    dados = models.JSONField()
+    gerado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Relatório de período"
+        verbose_name_plural = "Relatórios de período"
+        constraints = [
+            models.UniqueConstraint(fields=['inicio', 'fim', 'limite_produtos'], name='relatorio_periodo_unico'),
+        ]
+
+    def __str__(self):
+        return f"{self.inicio:%d/%m/%Y} a {self.fim:%d/%m/%Y}"
@@ -0,0 +1,111 @@
+"""Livro de movimentos de estoque: lançamentos, saldos em qualquer instante e compactação.
+
+Estoque.quantidade continua sendo o contador conferido a cada venda (é ele que impede vender sem
+estoque); cada alteração nele é acompanhada de um MovimentoEstoque. O saldo pelo livro é o último
+corte de SaldoEstoque somado aos movimentos posteriores, o que permite auditar e reconstituir o estoque.
+"""
+from django.db import transaction
+from django.db.models import F, Max, Sum
+from django.utils import timezone
+
+from .catalogo import invalidar_produtos
+from .models import Estoque, EstoqueInsuficiente, MovimentoEstoque, SaldoEstoque
+
+
+def movimentar(produto_id, tipo, quantidade, usuario=None, observacao='', venda=None):
+    """Aplica a variação ``quantidade`` (com sinal) ao estoque do produto e lança o movimento.
+
+    Saídas usam o mesmo UPDATE condicional da venda e levantam EstoqueInsuficiente se faltar estoque.
+    """
+    with transaction.atomic():
+        if quantidade < 0:
+            atualizados = Estoque.objects.filter(produto_id=produto_id, quantidade__gte=-quantidade).update(
+                quantidade=F('quantidade') + quantidade, atualizado_em=timezone.now()
+            )
+            if not atualizados:
+                raise EstoqueInsuficiente({'quantidade': "Estoque insuficiente para a saída informada."})
+        elif not Estoque.objects.filter(produto_id=produto_id).update(
+            quantidade=F('quantidade') + quantidade, atualizado_em=timezone.now()
+        ):
+            Estoque.objects.create(produto_id=produto_id, quantidade=quantidade)
+
+        movimento = MovimentoEstoque.objects.create(
+            produto_id=produto_id, tipo=tipo, quantidade=quantidade, usuario=usuario, observacao=observacao, venda=venda,
+        )
+        invalidar_produtos([produto_id])
+    return movimento
+
+
+def ultimo_corte(em=None):
+    """Data do último corte de saldos anterior ou igual a ``em`` (ou o mais recente), ou None."""
+    cortes = SaldoEstoque.objects.all()
+    if em is not None:
+        cortes = cortes.filter(data__lte=em)
+    return cortes.aggregate(data=Max('data'))['data']
+
+
+def saldos(produto_ids=None, em=None):
+    """Saldo pelo livro de cada produto no instante ``em`` (agora, se None): {produto_id: quantidade}.
+
+    São três consultas independentemente do número de produtos: o corte, os saldos do corte e a soma
+    dos movimentos entre o corte e ``em``. Produtos sem saldo nem movimento ficam de fora (saldo zero).
+    """
+    corte = ultimo_corte(em)
+
+    resultado = {}
+    if corte is not None:
+        base = SaldoEstoque.objects.filter(data=corte)
+        if produto_ids is not None:
+            base = base.filter(produto_id__in=produto_ids)
+        resultado.update(base.values_list('produto_id', 'quantidade'))
+
+    movimentos = MovimentoEstoque.objects.all()
+    if corte is not None:
+        movimentos = movimentos.filter(criado_em__gte=corte)
+    if em is not None:
+        movimentos = movimentos.filter(criado_em__lt=em)
+    if produto_ids is not None:
+        movimentos = movimentos.filter(produto_id__in=produto_ids)
+    for produto_id, variacao in movimentos.values_list('produto_id').annotate(total=Sum('quantidade')).order_by():
+        resultado[produto_id] = resultado.get(produto_id, 0) + variacao
+    return resultado
+
+
+def saldo(produto_id, em=None):
+    """Saldo pelo livro de um produto no instante ``em`` (agora, se None)."""
+    return saldos([produto_id], em).get(produto_id, 0)
+
+
+def divergencias():
+    """Produtos cujo Estoque.quantidade difere do saldo pelo livro: {produto_id: (estoque, livro)}."""
+    livro = saldos()
+    estoque = dict(Estoque.objects.values_list('produto_id', 'quantidade'))
+    return {
+        produto_id: (estoque.get(produto_id, 0), livro.get(produto_id, 0))
+        for produto_id in estoque.keys() | livro.keys()
+        if estoque.get(produto_id, 0) != livro.get(produto_id, 0)
+    }
+
+
+def compactar(corte, descartar=False, tamanho_lote=1000):
+    """Grava um novo corte de saldos em ``corte`` e devolve quantos produtos ele tem.
+
+    Com ``descartar``, apaga os movimentos e cortes anteriores: o saldo atual não muda, mas deixa de ser
+    possível consultar instantes anteriores ao corte.
+    """
+    with transaction.atomic():
+        anterior = ultimo_corte()
+        if anterior is not None and anterior >= corte:
+            raise ValueError("Já existe um corte igual ou posterior a essa data.")
+
+        atuais = saldos(em=corte)
+        SaldoEstoque.objects.bulk_create([
+            SaldoEstoque(produto_id=produto_id, data=corte, quantidade=quantidade)
+            for produto_id, quantidade in atuais.items()
+            if quantidade
+        ], batch_size=tamanho_lote)
+
+        if descartar:
+            MovimentoEstoque.objects.filter(criado_em__lt=corte).delete()
+            SaldoEstoque.objects.filter(data__lt=corte).delete()
+    return sum(1 for quantidade in atuais.values() if quantidade)
@@ -0,0 +1,67 @@
+"""Paginador do admin que evita o COUNT(*) completo nas tabelas grandes."""
+from django.core.paginator import EmptyPage, Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+class PaginadorEstimado(Paginator):
+    """Conta no máximo ``limite_contagem`` registros e, sem filtros no PostgreSQL, usa a estatística da tabela.
+
+    A contagem vai sempre algumas páginas além de ``pagina`` (a página pedida), então dá para seguir
+    navegando além do limite. Quando o total é aproximado, ``contagem_limitada`` (há mais registros que
+    ``count``) ou ``contagem_estimada`` (total da estatística) ficam verdadeiros, para que a listagem não o
+    mostre como exato, e páginas além da última conhecida continuam válidas.
+    """
+
+    limite_contagem = 10000
+    paginas_adiante = 10
+
+    def __init__(self, *args, pagina=1, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pagina = pagina
+        self.contagem_limitada = self.contagem_estimada = False
+
+    @property
+    def limite(self):
+        return max(self.limite_contagem, (self.pagina + self.paginas_adiante) * self.per_page)
+
+    def _estimativa_postgresql(self):
+        queryset = self.object_list
+        if queryset.query.where or connections[queryset.db].vendor != 'postgresql':
+            return None
+        with connections[queryset.db].cursor() as cursor:
+            cursor.execute("SELECT reltuples FROM pg_class WHERE oid = %s::regclass", [queryset.model._meta.db_table])
+            linha = cursor.fetchone()
+        # reltuples é -1 enquanto a tabela não foi analisada
+        return int(linha[0]) if linha and linha[0] >= 0 else None
+
+    @cached_property
+    def count(self):
+        estimativa = self._estimativa_postgresql()
+        if estimativa is not None and estimativa > self.limite:
+            self.contagem_estimada = True
+            return estimativa
+        # COUNT sobre uma subconsulta com LIMIT: para de contar ao passar do limite
+        contados = self.object_list[:self.limite + 1].count()
+        self.contagem_limitada = contados > self.limite
+        return min(contados, self.limite)
+
+    @property
+    def aproximado(self):
+        return self.count is not None and (self.contagem_limitada or self.contagem_estimada)
+
+    def validate_number(self, number):
+        try:
+            return super().validate_number(number)
+        except EmptyPage:
+            # Com o total aproximado ainda pode haver registros depois da última página conhecida
+            if self.aproximado and int(number) > 1:
+                return int(number)
+            raise
+
+    def page(self, number):
+        number = self.validate_number(number)
+        if not self.aproximado:
+            return super().page(number)
+        inicio = (number - 1) * self.per_page
+        return self._get_page(self.object_list[inicio:inicio + self.per_page], number, self)
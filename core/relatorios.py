@@ -0,0 +1,164 @@
+"""Relatórios de vendas de um período qualquer, comparados com o período anterior.
+
+Cada relatório sai de três consultas agrupadas: o resumo diário por forma de pagamento (período atual e
+anterior juntos), as vendas por usuário e os produtos mais vendidos. Períodos encerrados não mudam mais,
+então o resultado deles fica guardado em RelatorioPeriodo e as próximas consultas não tocam nas vendas.
+Uma correção em dia já encerrado (exclusão de item ou venda, reconstrução do resumo) descarta os
+relatórios que cobrem aquele dia.
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Q, Sum
+from django.utils.timezone import localdate, make_aware
+
+from .models import ItemVenda, RelatorioPeriodo, Venda, VendaDiaria
+
+LIMITE_PRODUTOS = 10
+MAXIMO_PRODUTOS = 100
+
+_CENTAVOS = Decimal('0.01')
+
+
+def periodo_anterior(inicio, fim):
+    """Período de comparação: o mês anterior para um mês fechado, senão os mesmos dias logo antes."""
+    if inicio.day == 1 and (fim + timedelta(days=1)).day == 1:
+        anterior_fim = inicio - timedelta(days=1)
+        return anterior_fim.replace(day=1), anterior_fim
+    return inicio - (fim - inicio) - timedelta(days=1), inicio - timedelta(days=1)
+
+
+def _ticket(valor, vendas):
+    return valor / vendas if vendas else 0
+
+
+def _variacao(atual, anterior):
+    return round(float((atual - anterior) * 100 / anterior), 1) if anterior else None
+
+
+def _dinheiro(valor):
+    return str(Decimal(valor).quantize(_CENTAVOS))
+
+
+def _totais(valor, vendas, itens):
+    return {
+        'valor': _dinheiro(valor), 'vendas': vendas, 'itens': itens, 'ticket_medio': _dinheiro(_ticket(valor, vendas)),
+    }
+
+
+def _resumo(inicio, fim, anterior_inicio):
+    """Totais e formas de pagamento do período e do anterior, numa consulta ao resumo diário."""
+    atual, anterior = Q(data__gte=inicio), Q(data__lt=inicio)
+    linhas = VendaDiaria.objects.filter(data__gte=anterior_inicio, data__lte=fim).values('forma_pagamento').annotate(
+        valor=Sum('valor_total', filter=atual),
+        vendas=Sum('quantidade_vendas', filter=atual),
+        itens=Sum('quantidade_itens', filter=atual),
+        valor_anterior=Sum('valor_total', filter=anterior),
+        vendas_anterior=Sum('quantidade_vendas', filter=anterior),
+        itens_anterior=Sum('quantidade_itens', filter=anterior),
+    ).order_by('forma_pagamento')
+
+    soma = dict.fromkeys(['valor', 'vendas', 'itens', 'valor_anterior', 'vendas_anterior', 'itens_anterior'], 0)
+    formas = []
+    for linha in linhas:
+        for campo in soma:
+            soma[campo] += linha[campo] or 0
+        if linha['vendas']:
+            formas.append({'forma_pagamento': linha['forma_pagamento'], 'vendas': linha['vendas'],
+                           'valor': linha['valor']})
+
+    rotulos = dict(Venda.FORMA_PAGAMENTO_CHOICES)
+    for forma in formas:
+        forma['rotulo'] = rotulos.get(forma['forma_pagamento'], forma['forma_pagamento'])
+        forma['percentual_valor'] = round(float(forma['valor'] * 100 / soma['valor']), 1) if soma['valor'] else 0.0
+        forma['valor'] = _dinheiro(forma['valor'])
+
+    atual = _totais(soma['valor'], soma['vendas'], soma['itens'])
+    anterior = _totais(soma['valor_anterior'], soma['vendas_anterior'], soma['itens_anterior'])
+    variacao = {
+        'valor': _variacao(soma['valor'], soma['valor_anterior']),
+        'vendas': _variacao(soma['vendas'], soma['vendas_anterior']),
+        'ticket_medio': _variacao(Decimal(atual['ticket_medio']), Decimal(anterior['ticket_medio'])),
+    }
+    return atual, anterior, variacao, formas
+
+
+def _usuarios(janela):
+    linhas = Venda.objects.filter(data__gte=janela[0], data__lt=janela[1]).values('usuario__username').annotate(
+        valor=Sum('valor_total'), vendas=Count('pk'),
+    ).order_by('-valor', 'usuario__username')
+    return [
+        {'usuario': linha['usuario__username'], 'vendas': linha['vendas'], 'valor': _dinheiro(linha['valor']),
+         'ticket_medio': _dinheiro(_ticket(linha['valor'], linha['vendas']))}
+        for linha in linhas
+    ]
+
+
+def _produtos(janela, limite):
+    valor = DecimalField(max_digits=14, decimal_places=2)
+    linhas = ItemVenda.objects.filter(venda__data__gte=janela[0], venda__data__lt=janela[1]).values(
+        'produto_id', nome=F('produto__nome'), codigo_barras=F('produto__codigo_barras'),
+    ).annotate(
+        unidades=Sum('quantidade'),
+        valor=Sum(ExpressionWrapper(F('quantidade') * F('preco_unitario'), output_field=valor), output_field=valor),
+    ).order_by('-valor', 'nome')[:limite]
+    return [{**linha, 'valor': _dinheiro(linha['valor'])} for linha in linhas]
+
+
+def _calcular(inicio, fim, anterior_inicio, limite_produtos):
+    # Datas do período como intervalo de datetimes (fim exclusivo), no fuso local
+    janela = (make_aware(datetime.combine(inicio, time.min)),
+              make_aware(datetime.combine(fim + timedelta(days=1), time.min)))
+    atual, anterior, variacao, formas = _resumo(inicio, fim, anterior_inicio)
+    return {
+        'inicio': inicio.isoformat(),
+        'fim': fim.isoformat(),
+        'anterior': {'inicio': anterior_inicio.isoformat(), 'fim': (inicio - timedelta(days=1)).isoformat(),
+                     **anterior},
+        'totais': atual,
+        'variacao': variacao,
+        'formas_pagamento': formas,
+        'usuarios': _usuarios(janela),
+        'produtos': _produtos(janela, limite_produtos),
+    }
+
+
+def relatorio_periodo(inicio, fim, limite_produtos=LIMITE_PRODUTOS, recalcular=False):
+    """Relatório das vendas de ``inicio`` a ``fim`` (datas, inclusive) com a comparação com o período anterior.
+
+    Períodos que terminaram antes de hoje são guardados na primeira consulta e lidos dali nas seguintes;
+    ``recalcular`` ignora e substitui o que estiver guardado. O período em curso é sempre calculado.
+    """
+    if fim < inicio:
+        raise ValidationError("A data final deve ser igual ou posterior à inicial.")
+    if not 1 <= limite_produtos <= MAXIMO_PRODUTOS:
+        raise ValidationError(f"O número de produtos deve estar entre 1 e {MAXIMO_PRODUTOS}.")
+
+    anterior_inicio, _ = periodo_anterior(inicio, fim)
+    encerrado = fim < localdate()
+    if encerrado and not recalcular:
+        guardado = RelatorioPeriodo.objects.filter(
+            inicio=inicio, fim=fim, limite_produtos=limite_produtos,
+        ).values_list('dados', flat=True).first()
+        if guardado is not None:
+            return guardado
+
+    dados = _calcular(inicio, fim, anterior_inicio, limite_produtos)
+    if encerrado:
+        RelatorioPeriodo.objects.update_or_create(
+            inicio=inicio, fim=fim, limite_produtos=limite_produtos,
+            defaults={'anterior_inicio': anterior_inicio, 'dados': dados},
+        )
+    return dados
+
+
+def invalidar_relatorios(dia=None):
+    """Descarta os relatórios guardados que usam o dia informado (ou todos, sem dia)."""
+    relatorios = RelatorioPeriodo.objects.all()
+    if dia is not None:
+        # O dia de hoje nunca está num relatório guardado: as vendas do caixa não custam consulta aqui
+        if dia >= localdate():
+            return
+        relatorios = relatorios.filter(anterior_inicio__lte=dia, fim__gte=dia)
+    relatorios.delete()
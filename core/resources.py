@@ -1,10 +1,43 @@
+from django.db.models import Prefetch, QuerySet
 from import_export import resources, fields
 from import_export.widgets import ForeignKeyWidget
 from .models import Venda, ItemVenda, Estoque
 from django.contrib.auth.models import User
 
 
-class VendaResource(resources.ModelResource):
+class ExportacaoOtimizadaResource(resources.ModelResource):
+    """Base dos resources de exportação: carrega as relações de uma vez e percorre em blocos."""
+
+    tamanho_bloco = 2000
+
+    def otimizar_queryset(self, queryset):
+        return queryset
+
+    def filter_export(self, queryset, **kwargs):
+        return self.otimizar_queryset(super().filter_export(queryset, **kwargs))
+
+    def get_chunk_size(self):
+        return self.tamanho_bloco
+
+    def iter_queryset(self, queryset):
+        # O iterator() aplica o prefetch_related a cada bloco, sem paginar com OFFSET
+        if isinstance(queryset, QuerySet):
+            if not queryset.query.order_by:
+                queryset = queryset.order_by('pk')
+            return queryset.iterator(chunk_size=self.get_chunk_size())
+        return iter(queryset)
+
+    def exportar_linhas(self, queryset=None):
+        """Gera o cabeçalho e depois cada linha da exportação, sem montar o dataset em memória."""
+        if queryset is None:
+            queryset = self.get_queryset()
+        queryset = self.filter_export(queryset)
+        yield self.get_export_headers()
+        for obj in self.iter_queryset(queryset):
+            yield self.export_resource(obj)
+
+
+class VendaResource(ExportacaoOtimizadaResource):
     usuario = fields.Field(
         column_name='usuario',
         attribute='usuario',
@@ -15,6 +48,11 @@ class VendaResource(resources.ModelResource):
     itens = fields.Field(column_name='itens')
     quantidade_total_itens = fields.Field(column_name='quantidade_total_itens')  # <-- novo campo
 
+    def otimizar_queryset(self, queryset):
+        return queryset.select_related('usuario').prefetch_related(
+            Prefetch('itens', queryset=ItemVenda.objects.select_related('produto'))
+        )
+
     def dehydrate_valor_total(self, obj):
         return f"{obj.valor_total:.2f}".replace('.', ',')
 
@@ -27,7 +65,7 @@ class VendaResource(resources.ModelResource):
         return " - ".join(itens_formatados)
 
     def dehydrate_quantidade_total_itens(self, obj):
-        return sum(item.quantidade for item in obj.itens.all())
+        return obj.quantidade_itens
 
     class Meta:
         model = Venda
@@ -35,13 +73,16 @@ class VendaResource(resources.ModelResource):
         export_order = ('id', 'data', 'usuario', 'forma_pagamento', 'quantidade_total_itens', 'itens', 'valor_total')
 
 
-class ItemVendaResource(resources.ModelResource):
+class ItemVendaResource(ExportacaoOtimizadaResource):
     venda_id = fields.Field(column_name='id_venda', attribute='venda', widget=ForeignKeyWidget(Venda, 'id'))
     data_venda = fields.Field(column_name='data_venda')
     usuario = fields.Field(column_name='usuario')
     produto = fields.Field(column_name='produto')
     forma_pagamento = fields.Field(column_name='forma_pagamento')
 
+    def otimizar_queryset(self, queryset):
+        return queryset.select_related('venda__usuario', 'produto')
+
     def dehydrate_subtotal(self, obj):
         return f"{obj.quantidade * obj.preco_unitario:.2f}".replace('.', ',')
 
@@ -68,10 +109,13 @@ class ItemVendaResource(resources.ModelResource):
                         'forma_pagamento')
 
 
-class EstoqueResource(resources.ModelResource):
+class EstoqueResource(ExportacaoOtimizadaResource):
     produto = fields.Field(column_name='produto')
     codigo_barras = fields.Field(column_name='codigo_barras')
 
+    def otimizar_queryset(self, queryset):
+        return queryset.select_related('produto')
+
     def dehydrate_produto(self, obj):
         return obj.produto.nome
 
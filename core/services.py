@@ -0,0 +1,95 @@
+from collections import defaultdict
+
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.db.models import Case, When, F, Q
+from django.utils import timezone
+from django.utils.timezone import localdate
+
+from .catalogo import invalidar_produtos
+from .models import Estoque, Venda, ItemVenda, VendaDiaria, EstoqueInsuficiente, MovimentoEstoque
+
+
+def registrar_venda(usuario, forma_pagamento, itens, venda=None):
+    """Grava uma venda com todos os seus itens usando um número constante de consultas.
+
+    ``itens`` é uma sequência de pares ``(produto, quantidade)``, onde ``produto`` pode ser a
+    instância ou o id. Produtos repetidos são somados. ``venda`` permite informar uma instância
+    ainda não salva (como a do admin). Levanta ``EstoqueInsuficiente`` sem gravar nada se
+    algum produto não tiver estoque, e ``ValidationError`` se alguma quantidade não for positiva.
+    """
+    quantidades = defaultdict(int)
+    for produto, quantidade in itens:
+        # Checada por linha: uma quantidade negativa não pode compensar outra do mesmo produto
+        if quantidade <= 0:
+            raise ValidationError({'quantidade': "A quantidade de cada item deve ser de pelo menos 1."})
+        quantidades[getattr(produto, 'pk', produto)] += quantidade
+
+    with transaction.atomic():
+        # Uma única consulta traz (e trava) o estoque e o preço de todos os produtos
+        estoques = {
+            estoque.produto_id: estoque
+            for estoque in Estoque.objects.select_for_update(of=('self',)).select_related('produto').filter(
+                produto_id__in=quantidades
+            )
+        }
+
+        erros = []
+        for produto_id, quantidade in quantidades.items():
+            estoque = estoques.get(produto_id)
+            disponivel = estoque.quantidade if estoque else 0
+            if quantidade > disponivel:
+                nome = estoque.produto.nome if estoque else f"Produto {produto_id}"
+                erros.append(f"{nome}: quantidade solicitada ({quantidade}) excede o estoque disponível ({disponivel}).")
+        if erros:
+            raise EstoqueInsuficiente({'quantidade': erros})
+
+        itens_venda = [
+            ItemVenda(
+                produto=estoques[produto_id].produto,
+                quantidade=quantidade,
+                preco_unitario=estoques[produto_id].produto.preco,
+            )
+            for produto_id, quantidade in quantidades.items()
+        ]
+
+        # Os totais já são conhecidos, então a venda é inserida completa
+        venda = venda or Venda()
+        venda.usuario = usuario
+        venda.forma_pagamento = forma_pagamento
+        venda.valor_total = sum(item.subtotal() for item in itens_venda)
+        venda.quantidade_itens = sum(quantidades.values())
+        venda.save()
+
+        if not quantidades:
+            return venda
+
+        for item in itens_venda:
+            item.venda = venda
+        ItemVenda.objects.bulk_create(itens_venda)
+
+        # Baixa todo o estoque num único UPDATE; a condição por produto protege bancos sem SELECT FOR UPDATE
+        condicao = Q()
+        for produto_id, quantidade in quantidades.items():
+            condicao |= Q(produto_id=produto_id, quantidade__gte=quantidade)
+        atualizados = Estoque.objects.filter(condicao).update(quantidade=Case(
+            *[When(produto_id=produto_id, then=F('quantidade') - quantidade) for produto_id, quantidade in quantidades.items()],
+            default=F('quantidade'),
+            output_field=models.PositiveIntegerField(),
+        ), atualizado_em=timezone.now())
+        if atualizados != len(quantidades):
+            raise EstoqueInsuficiente({'quantidade': "O estoque foi alterado por outra venda. Tente novamente."})
+        MovimentoEstoque.objects.bulk_create([
+            MovimentoEstoque(produto_id=produto_id, tipo='VENDA', quantidade=-quantidade, venda=venda, usuario=usuario)
+            for produto_id, quantidade in quantidades.items()
+        ])
+        invalidar_produtos(quantidades)
+
+        VendaDiaria.registrar(
+            localdate(venda.data),
+            venda.forma_pagamento,
+            valor=venda.valor_total,
+            itens=venda.quantidade_itens,
+        )
+
+    return venda
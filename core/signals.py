@@ -0,0 +1,54 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.timezone import localdate
+from .catalogo import invalidar_produtos
+from .dashboard import invalidar_dashboard
+from .relatorios import invalidar_relatorios
+from .models import Produto, Estoque, Venda, ItemVenda, VendaDiaria
+
+
+@receiver(post_delete, sender=ItemVenda)
+def remover_item_do_resumo(sender, instance, **kwargs):
+    # Desconta o item excluído dos totais da venda e do resumo diário
+    Venda.objects.filter(pk=instance.venda_id).update(
+        valor_total=F('valor_total') - instance.subtotal(),
+        quantidade_itens=F('quantidade_itens') - instance.quantidade,
+        atualizado_em=timezone.now(),
+    )
+    VendaDiaria.registrar(
+        localdate(instance.venda.data),
+        instance.venda.forma_pagamento,
+        valor=-instance.subtotal(),
+        itens=-instance.quantidade,
+    )
+
+
+@receiver(post_delete, sender=Venda)
+def remover_venda_do_resumo(sender, instance, **kwargs):
+    # Desconta a venda excluída do resumo diário
+    VendaDiaria.registrar(localdate(instance.data), instance.forma_pagamento, vendas=-1)
+
+
+@receiver([post_save, post_delete], sender=Venda)
+@receiver([post_save, post_delete], sender=ItemVenda)
+def invalidar_cache_dashboard(sender, instance, **kwargs):
+    # Só invalida depois do commit, para que o próximo acesso já veja a venda gravada
+    venda = instance if sender is Venda else instance.venda
+    transaction.on_commit(partial(invalidar_dashboard, localdate(venda.data)))
+    # Correção em dia encerrado: os relatórios guardados que cobrem o dia deixam de valer
+    transaction.on_commit(partial(invalidar_relatorios, localdate(venda.data)))
+
+
+@receiver([post_save, post_delete], sender=Produto)
+def invalidar_cache_produto(sender, instance, **kwargs):
+    invalidar_produtos([instance.pk])
+
+
+@receiver([post_save, post_delete], sender=Estoque)
+def invalidar_cache_estoque(sender, instance, **kwargs):
+    invalidar_produtos([instance.produto_id])
@@ -0,0 +1,127 @@
+"""Exportação incremental (feed de alterações) de vendas, itens e estoque para as integrações.
+
+Venda, ItemVenda e Estoque têm atualizado_em, indexado junto com o id. Cada consumidor guarda uma marca
+(atualizado_em, id) da última linha que recebeu e só pede o que mudou depois dela, então o custo da
+sincronização acompanha o movimento do dia e não o histórico inteiro. As colunas são as mesmas dos
+resources de exportação, precedidas de id e atualizado_em.
+
+Exclusões não aparecem no feed: o consumidor que precisar delas ainda depende da exportação completa.
+"""
+import base64
+import binascii
+import csv
+import json
+from datetime import datetime, timedelta
+
+from django.core.exceptions import ValidationError
+from django.utils import timezone
+
+from .exports import RECURSOS
+from .models import MarcaSincronizacao
+
+FORMATOS_ALTERACOES = ('jsonl', 'csv')
+
+# Linhas alteradas há menos que isso ficam para a próxima rodada: uma transação que gravou
+# atualizado_em antes pode confirmar depois de outra mais nova já exportada, e seria pulada.
+ATRASO_PADRAO = timedelta(seconds=60)
+
+
+def codificar_marca(atualizado_em, pk):
+    return base64.urlsafe_b64encode(f"{atualizado_em.isoformat()}|{pk}".encode()).decode()
+
+
+def decodificar_marca(marca):
+    try:
+        atualizado_em, pk = base64.urlsafe_b64decode(marca.encode()).decode().split('|')
+        return datetime.fromisoformat(atualizado_em), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValidationError("Marca de sincronização inválida.")
+
+
+def marca_salva(consumidor, recurso):
+    """Marca confirmada pelo consumidor para o recurso, ou None se ele ainda não sincronizou."""
+    marca = MarcaSincronizacao.objects.filter(consumidor=consumidor, recurso=recurso).first()
+    if marca is None or marca.atualizado_em is None:
+        return None
+    return codificar_marca(marca.atualizado_em, marca.ultimo_id)
+
+
+def salvar_marca(consumidor, recurso, marca):
+    atualizado_em, pk = decodificar_marca(marca)
+    MarcaSincronizacao.objects.update_or_create(
+        consumidor=consumidor, recurso=recurso, defaults={'atualizado_em': atualizado_em, 'ultimo_id': pk},
+    )
+
+
+def _alterados(resource, fim, inicio=None, limite=None):
+    """Objetos do resource alterados depois de ``inicio`` (atualizado_em, id) e antes de ``fim``, em ordem.
+
+    Cada bloco busca primeiro só as chaves na tabela do recurso, o que o índice (atualizado_em, id)
+    resolve sozinho, e depois os objetos dessas chaves com as relações da exportação. Assim o plano não
+    depende da ordem de joins que o banco escolher. Devolve pares (chave, objeto).
+    """
+    modelo = resource._meta.model
+    while limite is None or limite > 0:
+        tamanho = resource.get_chunk_size() if limite is None else min(limite, resource.get_chunk_size())
+        pendentes = modelo.objects.filter(atualizado_em__lt=fim).order_by('atualizado_em', 'pk').values_list(
+            'atualizado_em', 'pk',
+        )
+        if inicio is None:
+            chaves = list(pendentes[:tamanho])
+        else:
+            # Empates no instante da marca primeiro (as linhas da migração 0013 têm todas o mesmo), depois o
+            # resto: cada parte é uma busca direta no índice, o que um OR entre as duas não seria
+            atualizado_em, pk = inicio
+            chaves = list(pendentes.filter(atualizado_em=atualizado_em, pk__gt=pk)[:tamanho])
+            if len(chaves) < tamanho:
+                chaves += pendentes.filter(atualizado_em__gt=atualizado_em)[:tamanho - len(chaves)]
+        if not chaves:
+            return
+
+        objetos = resource.filter_export(resource.get_queryset().filter(pk__in=[pk for _, pk in chaves]))
+        por_id = {obj.pk: obj for obj in objetos}
+        for chave in chaves:
+            # Apagado entre as duas consultas: não há o que exportar
+            if chave[1] in por_id:
+                yield chave, por_id[chave[1]]
+
+        inicio = chaves[-1]
+        if limite is not None:
+            limite -= len(chaves)
+
+
+def exportar_alteracoes(recurso, saida, formato='jsonl', marca=None, limite=None, atraso=ATRASO_PADRAO):
+    """Escreve em ``saida`` as linhas de ``recurso`` alteradas depois de ``marca``, na ordem do índice.
+
+    Devolve (quantidade de linhas, marca da última linha escrita); sem alterações, a marca é a recebida.
+    Quem chama só deve guardar a nova marca depois de entregar a saída inteira.
+    """
+    if recurso not in RECURSOS:
+        raise ValidationError("Recurso não disponível.")
+    if formato not in FORMATOS_ALTERACOES:
+        raise ValidationError("Formato não disponível.")
+
+    resource = RECURSOS[recurso]()
+    inicio = decodificar_marca(marca) if marca else None
+
+    # O id do resource de vendas já vem como coluna própria do feed
+    cabecalho = resource.get_export_headers()
+    repetidas = {posicao for posicao, coluna in enumerate(cabecalho) if coluna in ('id', 'atualizado_em')}
+    colunas = ['id', 'atualizado_em'] + [coluna for posicao, coluna in enumerate(cabecalho) if posicao not in repetidas]
+    if formato == 'csv':
+        escritor = csv.writer(saida)
+        escritor.writerow(colunas)
+
+    total = 0
+    for (atualizado_em, pk), obj in _alterados(resource, timezone.now() - atraso, inicio, limite):
+        valores = resource.export_resource(obj)
+        linha = [pk, atualizado_em.isoformat()] + [
+            valor for posicao, valor in enumerate(valores) if posicao not in repetidas
+        ]
+        if formato == 'csv':
+            escritor.writerow(linha)
+        else:
+            saida.write(json.dumps(dict(zip(colunas, linha)), ensure_ascii=False, default=str) + '\n')
+        total += 1
+        marca = codificar_marca(atualizado_em, pk)
+    return total, marca
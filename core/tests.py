@@ -1,3 +1,987 @@
-from django.test import TestCase
+import io
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from unittest import mock, skipUnless
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.contrib import admin
+from django.contrib.admin.models import ADDITION, LogEntry
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, OperationalError
+from django.db.models import Sum
+from django.db.backends.sqlite3.base import DatabaseWrapper as SQLiteDatabaseWrapper
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.timezone import localdate
+
+from .agregacoes import agregar_resumo
+from .analise import _periodos, _quantidade_periodos, serie_vendas
+from .colunar import gravar_instantaneo, meses, pa, particao, pq
+from .exports import FORMATOS, processar_exportacao, recuperar_exportacoes_travadas
+from .busca import buscar_produtos, filtrar_produtos
+from .catalogo import cache_produtos
+from .dashboard import cache_dashboard, contexto_dashboard, totais
+from .historico import pagina_vendas
+from .importacao import ImportacaoInvalida, importar_estoque, ler_arquivo
+from .middleware import SEM_ROTA, MetricasRequisicaoMiddleware, registro
+from .models import (
+    Produto, Estoque, Venda, ItemVenda, EstoqueInsuficiente, Exportacao, MovimentoEstoque, SaldoEstoque,
+    RelatorioPeriodo, VendaDiaria,
+)
+from .movimentos import compactar, divergencias, movimentar, saldo
+from .paginacao import PaginadorEstimado
+from .relatorios import periodo_anterior, relatorio_periodo
+from .resources import VendaResource
+from .reposicao import relatorio_reposicao
+from .services import registrar_venda
+from .sincronizacao import exportar_alteracoes, marca_salva
+
+try:
+    from openpyxl import load_workbook
+except ImportError:
+    load_workbook = None  # Sem openpyxl o XLSX não está em FORMATOS
+
+
+class ResumoDiarioTests(TestCase):
+    def _resumo(self):
+        # Dias e formas que ficaram zerados depois de exclusões não existem na reconstrução
+        return {
+            (linha.data, linha.forma_pagamento): (linha.valor_total, linha.quantidade_itens, linha.quantidade_vendas)
+            for linha in VendaDiaria.objects.all()
+            if linha.quantidade_vendas or linha.quantidade_itens or linha.valor_total
+        }
+
+    def assertResumoIgualAoReconstruido(self):
+        incremental = self._resumo()
+        call_command('reconstruir_resumo_vendas', stdout=io.StringIO())
+        self.assertEqual(incremental, self._resumo())
+
+    def test_resumo_incremental_confere_com_a_reconstrucao(self):
+        usuario = User.objects.create_user('caixa')
+        produto = Produto.objects.create(codigo_barras='789000000000', nome='Arroz', preco='4.00')
+        Estoque.objects.create(produto=produto, quantidade=20)
+
+        venda = Venda.objects.create(usuario=usuario, forma_pagamento='DINHEIRO')
+        item = ItemVenda.objects.create(venda=venda, produto=produto, quantidade=2)
+        ItemVenda.objects.create(venda=venda, produto=produto, quantidade=1)
+        self.assertResumoIgualAoReconstruido()
+
+        registrar_venda(usuario, 'PIX', [(produto, 3)])
+        self.assertResumoIgualAoReconstruido()
+
+        item.delete()
+        self.assertResumoIgualAoReconstruido()
+
+        venda.delete()
+        self.assertResumoIgualAoReconstruido()
+        self.assertEqual(self._resumo(), {(localdate(), 'PIX'): (Decimal('12.00'), 3, 1)})
+
+    def test_correcao_de_totais_acerta_o_resumo_e_o_dashboard(self):
+        usuario = User.objects.create_user('caixa')
+        produto = Produto.objects.create(codigo_barras='789000000001', nome='Arroz', preco='4.00')
+        Estoque.objects.create(produto=produto, quantidade=20)
+        venda = registrar_venda(usuario, 'PIX', [(produto, 2)])
+        # Totais divergentes dos itens, na venda e no resumo
+        Venda.objects.filter(pk=venda.pk).update(valor_total=Decimal('99.00'), quantidade_itens=9)
+        VendaDiaria.objects.update(valor_total=Decimal('99.00'), quantidade_itens=9)
+        cache_dashboard().clear()
+        self.assertEqual(contexto_dashboard()['total_geral'], Decimal('99.00'))
+
+        call_command('verificar_totais_vendas', '--corrigir', stdout=io.StringIO())
+
+        self.assertEqual(self._resumo(), {(localdate(), 'PIX'): (Decimal('8.00'), 2, 1)})
+        self.assertEqual(contexto_dashboard()['total_geral'], Decimal('8.00'))
+        self.assertResumoIgualAoReconstruido()
+
+
+class BaixaEstoqueTests(TestCase):
+    def setUp(self):
+        self.usuario = User.objects.create_user('caixa')
+        self.produto = Produto.objects.create(codigo_barras='789000000001', nome='Café', preco='10.00')
+        Estoque.objects.create(produto=self.produto, quantidade=5)
+        self.venda = Venda.objects.create(usuario=self.usuario)
+
+    def test_baixa_estoque_ao_salvar_item(self):
+        ItemVenda.objects.create(venda=self.venda, produto=self.produto, quantidade=3)
+        self.assertEqual(Estoque.objects.get(produto=self.produto).quantidade, 2)
+
+        self.venda.refresh_from_db()
+        self.assertEqual(self.venda.valor_total, Decimal('30.00'))
+        self.assertEqual(self.venda.quantidade_itens, 3)
+
+    def test_preco_em_texto_e_multiplicado(self):
+        # O produto do setUp guarda o preço como texto em memória, como veio do create()
+        ItemVenda.objects.create(venda=self.venda, produto=self.produto, quantidade=2, preco_unitario='7.50')
+        ItemVenda.objects.create(venda=self.venda, produto=self.produto, quantidade=3)
+
+        self.venda.refresh_from_db()
+        self.assertEqual(self.venda.valor_total, Decimal('45.00'))
+        self.assertEqual(VendaDiaria.objects.get().valor_total, Decimal('45.00'))
+
+    def test_estoque_insuficiente_nao_grava_item(self):
+        with self.assertRaises(EstoqueInsuficiente):
+            ItemVenda.objects.create(venda=self.venda, produto=self.produto, quantidade=6)
+        self.assertFalse(ItemVenda.objects.exists())
+        self.assertEqual(Estoque.objects.get(produto=self.produto).quantidade, 5)
+
+
+class RegistrarVendaTests(TestCase):
+    def setUp(self):
+        self.usuario = User.objects.create_user('caixa')
+        self.produtos = [
+            Produto.objects.create(codigo_barras=f'78900000010{i}', nome=f'Produto {i}', preco='2.50')
+            for i in range(3)
+        ]
+        for produto in self.produtos:
+            Estoque.objects.create(produto=produto, quantidade=10)
+
+    def test_grava_itens_e_baixa_estoque(self):
+        venda = registrar_venda(self.usuario, 'PIX', [(produto, 2) for produto in self.produtos] + [(self.produtos[0], 1)])
+
+        self.assertEqual(venda.itens.count(), 3)
+        self.assertEqual(venda.itens.get(produto=self.produtos[0]).quantidade, 3)
+        self.assertEqual(Estoque.objects.get(produto=self.produtos[0]).quantidade, 7)
+        self.assertEqual(Estoque.objects.get(produto=self.produtos[1]).quantidade, 8)
+
+        venda.refresh_from_db()
+        self.assertEqual(venda.valor_total, Decimal('17.50'))
+        self.assertEqual(venda.quantidade_itens, 7)
+
+    def test_estoque_insuficiente_nao_grava_nada(self):
+        with self.assertRaises(EstoqueInsuficiente):
+            registrar_venda(self.usuario, 'PIX', [(self.produtos[0], 1), (self.produtos[1], 11)])
+
+        self.assertFalse(Venda.objects.exists())
+        self.assertEqual(Estoque.objects.get(produto=self.produtos[0]).quantidade, 10)
+
+    def test_quantidade_zero_ou_negativa(self):
+        for quantidade in (0, -1):
+            with self.assertRaisesMessage(ValidationError, "pelo menos 1"):
+                registrar_venda(self.usuario, 'PIX', [(self.produtos[0], 2), (self.produtos[0], quantidade)])
+
+        self.assertFalse(Venda.objects.exists())
+        self.assertEqual(Estoque.objects.get(produto=self.produtos[0]).quantidade, 10)
+
+
+class VendaAdminTests(TestCase):
+    def setUp(self):
+        self.usuario = User.objects.create_superuser('gerente', 'gerente@exemplo.com', 'senha')
+        self.client.force_login(self.usuario)
+        self.produto = Produto.objects.create(codigo_barras='789000000201', nome='Feijão', preco='8.00')
+        Estoque.objects.create(produto=self.produto, quantidade=5)
+
+    def _postar(self, *quantidades):
+        dados = {
+            'forma_pagamento': 'PIX',
+            'itens-TOTAL_FORMS': len(quantidades), 'itens-INITIAL_FORMS': 0,
+            'itens-MIN_NUM_FORMS': 0, 'itens-MAX_NUM_FORMS': 1000,
+        }
+        for numero, quantidade in enumerate(quantidades):
+            dados[f'itens-{numero}-produto'] = self.produto.pk
+            dados[f'itens-{numero}-quantidade'] = quantidade
+        return self.client.post(reverse('admin:core_venda_add'), dados)
+
+    def test_linhas_do_mesmo_produto_somadas_alem_do_estoque(self):
+        resposta = self._postar(3, 3)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertContains(resposta, "Feijão: quantidade solicitada (6) excede o estoque disponível (5).")
+        self.assertFalse(Venda.objects.exists())
+
+    def test_estoque_consumido_entre_validacao_e_gravacao(self):
+        erro = EstoqueInsuficiente({'quantidade': ["Feijão: quantidade solicitada (3) excede o estoque disponível (1)."]})
+        with mock.patch('core.admin.registrar_venda', side_effect=erro):
+            resposta = self._postar(3)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertContains(resposta, "excede o estoque disponível (1).")
+        self.assertFalse(Venda.objects.exists())
+
+        self.assertRedirects(self._postar(2, 3), reverse('admin:core_venda_changelist'))
+        self.assertEqual(Estoque.objects.get(produto=self.produto).quantidade, 0)
+
+    def test_autocomplete_do_item_so_mostra_produto_com_estoque(self):
+        sem_estoque = Produto.objects.create(codigo_barras='789000000202', nome='Feijão Preto', preco='9.00')
+        Estoque.objects.create(produto=sem_estoque, quantidade=0)
+
+        resposta = self.client.get(reverse('admin:autocomplete'), {
+            'term': 'feij', 'app_label': 'core', 'model_name': 'itemvenda', 'field_name': 'produto',
+        })
+        self.assertEqual([resultado['id'] for resultado in resposta.json()['results']], [str(self.produto.pk)])
+
+        # Fora do item de venda a busca continua trazendo todos
+        resposta = self.client.get(reverse('admin:core_produto_changelist'), {'q': 'feij'})
+        self.assertEqual(set(resposta.context['cl'].result_list), {self.produto, sem_estoque})
+
+    def test_quantidade_zero_no_inline(self):
+        resposta = self._postar(0)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertContains(resposta, "maior ou igual a 1")
+        self.assertFalse(Venda.objects.exists())
+
+
+class ExportacaoEmSegundoPlanoTests(TestCase):
+    def test_exportacao_presa_volta_para_a_fila(self):
+        usuario = User.objects.create_user('gerente')
+        agora = timezone.now()
+        presa = Exportacao.objects.create(usuario=usuario, recurso='vendas', status='PROCESSANDO',
+                                          iniciada_em=agora - timedelta(hours=2), linhas_processadas=5000)
+        recente = Exportacao.objects.create(usuario=usuario, recurso='vendas', status='PROCESSANDO', iniciada_em=agora)
+        propria = Exportacao.objects.create(usuario=usuario, recurso='itens', status='PROCESSANDO',
+                                            iniciada_em=agora - timedelta(hours=2))
+
+        self.assertEqual(recuperar_exportacoes_travadas(timedelta(hours=1), ignorar=[propria.pk]), 1)
+        presa.refresh_from_db()
+        self.assertEqual((presa.status, presa.iniciada_em, presa.linhas_processadas), ('PENDENTE', None, 0))
+        self.assertEqual(Exportacao.objects.get(pk=recente.pk).status, 'PROCESSANDO')
+        self.assertEqual(Exportacao.objects.get(pk=propria.pk).status, 'PROCESSANDO')
+
+    def _exportacao(self, **campos):
+        diretorio = tempfile.TemporaryDirectory()
+        self.addCleanup(diretorio.cleanup)
+        configuracao = self.settings(MEDIA_ROOT=diretorio.name)
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+
+        self.usuario = User.objects.create_superuser('gerente', 'gerente@exemplo.com', 'senha')
+        produto = Produto.objects.create(codigo_barras='789000000801', nome='Milho', preco=Decimal('3.00'))
+        Estoque.objects.create(produto=produto, quantidade=10)
+        for _ in range(3):
+            registrar_venda(self.usuario, 'PIX', [(produto, 1)])
+        return Exportacao.objects.create(usuario=self.usuario, recurso='vendas', **campos)
+
+    def test_exportacao_concluida_e_download(self):
+        exportacao = self._exportacao()
+        self.assertTrue(processar_exportacao(exportacao.pk))
+        self.assertFalse(processar_exportacao(exportacao.pk))
+
+        exportacao.refresh_from_db()
+        self.assertEqual((exportacao.status, exportacao.total_linhas, exportacao.linhas_processadas), ('CONCLUIDA', 3, 3))
+        with exportacao.arquivo.open('rb') as arquivo:
+            linhas = arquivo.read().decode('utf-8').splitlines()
+        self.assertEqual(len(linhas), 4)
+        self.assertTrue(linhas[0].startswith('id,'))
+
+        self.client.force_login(self.usuario)
+        resposta = self.client.get(reverse('admin:core_exportacao_baixar', args=[exportacao.pk]))
+        self.assertEqual(b''.join(resposta.streaming_content).decode('utf-8').splitlines(), linhas)
+        pendente = Exportacao.objects.create(usuario=self.usuario, recurso='itens')
+        self.assertEqual(self.client.get(reverse('admin:core_exportacao_baixar', args=[pendente.pk])).status_code, 404)
+
+    def test_erro_mantem_o_progresso_gravado(self):
+        exportacao = self._exportacao()
+
+        def falhar_no_meio(queryset=None):
+            yield ['id']
+            for numero in range(1, 5):
+                yield [numero]
+            raise RuntimeError("disco cheio")
+
+        with mock.patch('core.exports.INTERVALO_PROGRESSO', 2), \
+                mock.patch.object(VendaResource, 'exportar_linhas', side_effect=falhar_no_meio):
+            with self.assertRaisesMessage(RuntimeError, "disco cheio"):
+                processar_exportacao(exportacao.pk)
+
+        exportacao.refresh_from_db()
+        self.assertEqual((exportacao.status, exportacao.linhas_processadas), ('ERRO', 4))
+        self.assertIn("disco cheio", exportacao.erro)
+        self.assertFalse(exportacao.arquivo)
+
+
+class ExportacaoStreamingTests(TestCase):
+    def setUp(self):
+        self.usuario = User.objects.create_superuser('gerente', 'gerente@exemplo.com', 'senha')
+        self.client.force_login(self.usuario)
+        self.produto = Produto.objects.create(codigo_barras='789000000901', nome='Trigo', preco=Decimal('6.00'))
+
+    def _vendas(self, quantidade):
+        vendas = Venda.objects.bulk_create([
+            Venda(usuario=self.usuario, forma_pagamento='PIX', valor_total=Decimal('12.00'), quantidade_itens=2)
+            for _ in range(quantidade)
+        ])
+        ItemVenda.objects.bulk_create([
+            ItemVenda(venda=venda, produto=self.produto, quantidade=2, preco_unitario=Decimal('6.00')) for venda in vendas
+        ])
+
+    def _baixar(self, recurso, formato):
+        with CaptureQueriesContext(connection) as consultas:
+            resposta = self.client.get(reverse('exportar', args=[recurso, formato]))
+            self.assertEqual(resposta.status_code, 200)
+            conteudo = b''.join(resposta.streaming_content)
+        return conteudo, len(consultas)
+
+    def test_csv_e_xlsx_com_consultas_constantes(self):
+        self._vendas(10)
+        poucas = {(recurso, formato): self._baixar(recurso, formato)
+                  for recurso in ('vendas', 'itens') for formato in FORMATOS}
+        self._vendas(990)
+
+        for (recurso, formato), (_, consultas) in poucas.items():
+            with self.subTest(recurso=recurso, formato=formato):
+                conteudo, consultas_1000 = self._baixar(recurso, formato)
+                self.assertEqual(consultas_1000, consultas)
+                if formato == 'csv':
+                    linhas = conteudo.decode('utf-8').splitlines()
+                else:
+                    linhas = list(load_workbook(io.BytesIO(conteudo), read_only=True).active.values)
+                self.assertEqual(len(linhas), 1001)
+
+        linhas = self._baixar('vendas', 'csv')[0].decode('utf-8').splitlines()
+        self.assertTrue(linhas[0].startswith('id,data,usuario,forma_pagamento'))
+        self.assertIn('Trigo (Qtd: 2, Valor Unitario: 6.00)', linhas[1])
+        self.assertTrue(linhas[1].endswith('"12,00"'))
+
+
+class CargaEBenchmarkTests(TestCase):
+    def _popular(self, *argumentos):
+        call_command('popular_dados', '--produtos=5', '--vendas=20', '--lote=7', '--usuarios=2', '--dias=30',
+                     *argumentos, stdout=io.StringIO())
+
+    def test_popular_dados_e_benchmark(self):
+        self._popular()
+        self.assertEqual((Produto.objects.count(), Venda.objects.count()), (5, 20))
+        self.assertEqual(VendaDiaria.objects.aggregate(vendas=Sum('quantidade_vendas'))['vendas'], 20)
+        self.assertTrue(Venda.objects.filter(data__lt=timezone.now() - timedelta(days=1)).exists())
+        self.assertTrue(Venda._meta.get_field('data').auto_now_add)
+
+        # Um usuário 'benchmark' de uma execução anterior não pode quebrar a medição
+        User.objects.create_user('benchmark')
+        saida = io.StringIO()
+        call_command('benchmark', '--repeticoes=1', '--itens=2', stdout=saida)
+        resultado = json.loads(saida.getvalue())
+        self.assertEqual(resultado['volume']['vendas'], 20)
+        self.assertIn('admin_changelist_itemvenda', resultado['cenarios'])
+        self.assertTrue(all(cenario['consultas'] > 0 for cenario in resultado['cenarios'].values()))
+        # Nada do que o benchmark criou fica na base
+        self.assertEqual(Venda.objects.count(), 20)
+        self.assertEqual(User.objects.filter(username__startswith='benchmark').count(), 1)
+
+    def test_popular_dados_restaura_auto_now_add_depois_de_um_erro(self):
+        with mock.patch.object(ItemVenda.objects, 'bulk_create', side_effect=RuntimeError("falha no lote")):
+            with self.assertRaisesMessage(RuntimeError, "falha no lote"):
+                self._popular()
+        self.assertTrue(Venda._meta.get_field('data').auto_now_add)
+
+
+@skipUnless(connection.vendor == 'sqlite' and os.environ.get('DB_SQLITE_AJUSTES', '1') == '1',
+            "Ajustes do SQLite desligados ou outro banco")
+class AjustesSqliteTests(SimpleTestCase):
+    def test_pragmas_e_transacao_immediate(self):
+        # O banco de testes é em memória (sem WAL): abre um arquivo com as mesmas opções da configuração
+        with tempfile.TemporaryDirectory() as diretorio:
+            arquivo = os.path.join(diretorio, 'ajustes.sqlite3')
+            conexao = SQLiteDatabaseWrapper({**connection.settings_dict, 'NAME': arquivo}, alias='ajustes')
+            try:
+                with conexao.cursor() as cursor:
+                    cursor.execute('PRAGMA journal_mode')
+                    self.assertEqual(cursor.fetchone()[0], 'wal')
+                    cursor.execute('PRAGMA synchronous')
+                    self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+                    cursor.execute('PRAGMA busy_timeout')
+                    self.assertEqual(cursor.fetchone()[0], connection.settings_dict['OPTIONS']['timeout'] * 1000)
+
+                # A transação pega o lock de escrita logo no BEGIN, antes de qualquer escrita
+                conexao.set_autocommit(False, force_begin_transaction_with_broken_autocommit=True)
+                outra = sqlite3.connect(arquivo, timeout=0)
+                try:
+                    with self.assertRaisesMessage(sqlite3.OperationalError, "locked"):
+                        outra.execute('BEGIN IMMEDIATE')
+                finally:
+                    outra.close()
+                conexao.rollback()
+                conexao.set_autocommit(True)
+            finally:
+                conexao.close()
+
+
+class BaixaEstoqueConcorrenteTests(TransactionTestCase):
+    def test_caixas_simultaneos_nao_vendem_alem_do_estoque(self):
+        usuario = User.objects.create_user('caixa')
+        produto = Produto.objects.create(codigo_barras='789000000002', nome='Leite', preco='5.00')
+        Estoque.objects.create(produto=produto, quantidade=5)
+        vendas = [Venda.objects.create(usuario=usuario) for _ in range(10)]
+
+        inicio = threading.Barrier(len(vendas))
+        resultados = []
+
+        def vender(venda):
+            inicio.wait()
+            try:
+                while True:
+                    try:
+                        ItemVenda.objects.create(venda=venda, produto=produto, quantidade=1)
+                        resultados.append(True)
+                        return
+                    except EstoqueInsuficiente:
+                        resultados.append(False)
+                        return
+                    except OperationalError:
+                        # O SQLite em memória dos testes recusa escritas simultâneas; o caixa tenta de novo
+                        time.sleep(0.01)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=vender, args=(venda,)) for venda in vendas]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(resultados.count(True), 5)
+        self.assertEqual(resultados.count(False), 5)
+        self.assertEqual(Estoque.objects.get(produto=produto).quantidade, 0)
+        self.assertEqual(ItemVenda.objects.count(), 5)
+
+
+class ViewsAssincronasTests(TransactionTestCase):
+    # O dashboard assíncrono consulta em threads com conexão própria, que só enxergam dados confirmados
+    def setUp(self):
+        cache_dashboard().clear()
+        cache_produtos.limpar()
+        self.usuario = User.objects.create_user('gerente', is_staff=True)
+        self.produto = Produto.objects.create(codigo_barras='789000000301', nome='Café', preco=Decimal('12.00'))
+        Estoque.objects.create(produto=self.produto, quantidade=10)
+
+    async def test_dashboard_igual_ao_sincrono(self):
+        await sync_to_async(self._vendas_em_dois_meses)()
+        await self.async_client.aforce_login(self.usuario)
+        resposta = await self.async_client.get(reverse('dashboard_vendas_async'))
+        self.assertEqual(resposta.status_code, 200)
+        self.assertTrue(resposta.context['mostrar_serie'])
+
+        cache_dashboard().clear()
+        await sync_to_async(self.client.force_login)(self.usuario)
+        sincrona = await sync_to_async(self.client.get)(reverse('dashboard_vendas'))
+        for chave in ('total_geral', 'total_mes', 'total_itens_geral', 'total_itens_mes', 'formas_geral', 'formas_mes'):
+            self.assertEqual(resposta.context[chave], sincrona.context[chave], chave)
+        self.assertEqual(resposta.context['total_geral'], Decimal('36.00'))
+        self.assertEqual(resposta.context['total_mes'], Decimal('24.00'))
+
+    async def test_metricas_contam_as_consultas_das_threads_do_dashboard(self):
+        await self.async_client.aforce_login(self.usuario)
+        registro.limpar()
+        await self.async_client.get(reverse('dashboard_vendas_async'))
+
+        # Sessão, usuário e as duas janelas do dashboard, cada uma consultada numa thread própria
+        linha, = [linha for linha in registro.resumo() if linha['view'] == 'dashboard_vendas_async']
+        self.assertEqual(linha['consultas_max'], 4)
+        self.assertTrue(iscoroutinefunction(MetricasRequisicaoMiddleware(self.async_client.handler.get_response_async)))
+
+    def _vendas_em_dois_meses(self):
+        registrar_venda(self.usuario, 'PIX', [(self.produto, 2)])
+        registrar_venda(self.usuario, 'DINHEIRO', [(self.produto, 1)])
+        mes_passado = localdate().replace(day=1) - timedelta(days=1)
+        Venda.objects.filter(forma_pagamento='DINHEIRO').update(data=timezone.now() - timedelta(days=localdate().day))
+        VendaDiaria.objects.filter(forma_pagamento='DINHEIRO').update(data=mes_passado)
+
+    async def test_codigo_de_barras(self):
+        await self.async_client.aforce_login(self.usuario)
+        url = reverse('produto_por_codigo_barras_async', args=[self.produto.codigo_barras])
+
+        # Primeira leitura vem do banco e fica em cache
+        resposta = await self.async_client.get(url)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.json()['preco'], '12.00')
+        self.assertEqual(resposta.json()['estoque'], 10)
+
+        # A seguinte sai do cache: update() não dispara a invalidação
+        await Produto.objects.filter(pk=self.produto.pk).aupdate(preco=Decimal('13.00'))
+        resposta = await self.async_client.get(url)
+        self.assertEqual(resposta.json()['preco'], '12.00')
+
+        resposta = await self.async_client.get(reverse('produto_por_codigo_barras_async', args=['000']))
+        self.assertEqual(resposta.status_code, 404)
+        self.assertEqual(resposta.json(), {'erro': "Produto não encontrado."})
+
+
+class MetricasRequisicaoTests(TestCase):
+    def test_urls_sem_rota_ficam_numa_entrada_so(self):
+        registro.limpar()
+        for caminho in ('/nao-existe/', '/wp-login.php', '/nao-existe/2/'):
+            self.assertEqual(self.client.get(caminho).status_code, 404)
+
+        self.assertEqual([(linha['view'], linha['requisicoes']) for linha in registro.resumo()], [(SEM_ROTA, 3)])
+
+
+class AgregacoesTests(TestCase):
+    def setUp(self):
+        cache_dashboard().clear()
+        VendaDiaria.objects.create(data=date(2025, 1, 31), forma_pagamento='PIX', valor_total=Decimal('10.00'),
+                                   quantidade_itens=1, quantidade_vendas=1)
+        VendaDiaria.objects.create(data=date(2025, 2, 1), forma_pagamento='PIX', valor_total=Decimal('20.00'),
+                                   quantidade_itens=2, quantidade_vendas=1)
+        VendaDiaria.objects.create(data=date(2025, 2, 1), forma_pagamento='DINHEIRO', valor_total=Decimal('5.00'),
+                                   quantidade_itens=1, quantidade_vendas=2)
+
+    def test_janelas_abertas_e_fim_exclusivo(self):
+        fevereiro = date(2025, 2, 1)
+        resultado = agregar_resumo({
+            'antes': (None, fevereiro),
+            'depois': (fevereiro, None),
+            'tudo': (None, None),
+            'vazia': (date(2025, 1, 1), date(2025, 1, 31)),
+        })
+        self.assertEqual(resultado['antes'], {'valor': Decimal('10.00'), 'itens': 1, 'vendas': 1, 'formas': {'PIX': 1}})
+        self.assertEqual(resultado['depois'], {
+            'valor': Decimal('25.00'), 'itens': 3, 'vendas': 3, 'formas': {'DINHEIRO': 2, 'PIX': 1},
+        })
+        self.assertEqual(resultado['tudo']['valor'], Decimal('35.00'))
+        self.assertEqual(resultado['tudo']['formas'], {'DINHEIRO': 2, 'PIX': 2})
+        self.assertEqual(resultado['vazia'], {'valor': 0, 'itens': 0, 'vendas': 0, 'formas': {}})
+
+    def test_dashboard_calcula_as_duas_janelas_numa_consulta(self):
+        with self.assertNumQueries(1):
+            periodos = totais(date(2025, 2, 1))
+        self.assertEqual(periodos['historico']['valor'], Decimal('10.00'))
+        self.assertEqual(periodos['mes']['valor'], Decimal('25.00'))
+
+
+class CacheDashboardTests(TestCase):
+    def setUp(self):
+        cache_dashboard().clear()
+        self.usuario = User.objects.create_user('caixa')
+        self.produto = Produto.objects.create(codigo_barras='789000000401', nome='Arroz', preco=Decimal('5.00'))
+        Estoque.objects.create(produto=self.produto, quantidade=10)
+        self.inicio_mes = localdate().replace(day=1)
+
+    def test_segundo_acesso_nao_consulta_o_banco(self):
+        contexto = contexto_dashboard()
+        with self.assertNumQueries(0):
+            self.assertEqual(contexto_dashboard(), contexto)
+
+    def test_venda_nova_invalida_so_o_mes(self):
+        contexto_dashboard()
+        with self.captureOnCommitCallbacks(execute=True):
+            registrar_venda(self.usuario, 'PIX', [(self.produto, 2)])
+
+        with self.assertNumQueries(0):
+            totais(self.inicio_mes, ['historico'])
+        with self.assertNumQueries(1):
+            self.assertEqual(contexto_dashboard()['total_mes'], Decimal('10.00'))
+
+    def test_exclusao_em_mes_passado_invalida_o_historico(self):
+        venda = registrar_venda(self.usuario, 'PIX', [(self.produto, 2)])
+        Venda.objects.filter(pk=venda.pk).update(data=timezone.now() - timedelta(days=localdate().day))
+        VendaDiaria.objects.update(data=self.inicio_mes - timedelta(days=1))
+        self.assertEqual(contexto_dashboard()['total_geral'], Decimal('10.00'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Venda.objects.get(pk=venda.pk).delete()
+
+        with self.assertNumQueries(1):
+            self.assertEqual(contexto_dashboard()['total_geral'], 0)
+
+
+class SerieVendasTests(TestCase):
+    def setUp(self):
+        self.usuario = User.objects.create_user('caixa')
+        self.produto = Produto.objects.create(codigo_barras='789000000201', nome='Café', preco=Decimal('10.00'))
+        Estoque.objects.create(produto=self.produto, quantidade=10)
+        registrar_venda(self.usuario, 'PIX', [(self.produto, 3)])
+
+    def test_periodos_sem_venda_e_media_movel(self):
+        hoje = localdate()
+        dados = serie_vendas(hoje - timedelta(days=2), hoje, media_movel=3)
+
+        total = dados['series']['total']
+        self.assertEqual(len(dados['periodos']), 3)
+        self.assertEqual(total['receita'], [0.0, 0.0, 30.0])
+        self.assertEqual(total['receita_media_movel'], [0.0, 0.0, 10.0])
+        self.assertEqual(total['ticket_medio'], [None, None, 30.0])
+
+    def test_por_produto_e_por_hora(self):
+        hoje = localdate()
+        self.assertEqual(serie_vendas(hoje, hoje, dimensao='produto')['series'][str(self.produto.pk)]['quantidade'], [3])
+        self.assertEqual(sum(serie_vendas(hoje, hoje, granularidade='hora')['series']['total']['vendas']), 1)
+
+    def test_periodos_contados_sem_gerar_a_lista(self):
+        for inicio, fim in [(date(2024, 1, 1), date(2024, 3, 10)), (date(2023, 12, 31), date(2024, 1, 1))]:
+            for granularidade in ('hora', 'dia', 'semana', 'mes'):
+                with self.subTest(inicio=inicio, granularidade=granularidade):
+                    self.assertEqual(_quantidade_periodos(inicio, fim, granularidade),
+                                     len(_periodos(inicio, fim, granularidade)))
+
+        with mock.patch('core.analise._periodos') as periodos:
+            with self.assertRaisesMessage(ValidationError, "Intervalo grande demais"):
+                serie_vendas(date(1, 1, 1), localdate(), granularidade='hora')
+        periodos.assert_not_called()
+
+    def test_erros_de_parametro_na_api(self):
+        self.client.force_login(User.objects.create_superuser('gerente', 'gerente@exemplo.com', 'senha'))
+        url = reverse('serie_vendas')
+        self.assertEqual(self.client.get(url, {'limite': '-1'}).json(),
+                         {'erro': "O limite de séries deve ser de pelo menos 1."})
+        self.assertEqual(self.client.get(url, {'limite': 'dez'}).json(),
+                         {'erro': "media_movel e limite devem ser números inteiros."})
+        self.assertEqual(self.client.get(url, {'granularidade': 'hora', 'inicio': '0001-01-01'}).json(),
+                         {'erro': "Intervalo grande demais para essa granularidade."})
+
+    def test_produtos_com_o_mesmo_nome_ficam_separados(self):
+        outro = Produto.objects.create(codigo_barras='789000000202', nome='Café', preco=Decimal('20.00'))
+        Estoque.objects.create(produto=outro, quantidade=10)
+        registrar_venda(self.usuario, 'PIX', [(outro, 1)])
+
+        hoje = localdate()
+        series = serie_vendas(hoje, hoje, dimensao='produto')['series']
+        self.assertEqual(series[str(self.produto.pk)]['receita'], [30.0])
+        self.assertEqual(series[str(outro.pk)]['receita'], [20.0])
+        self.assertEqual({serie['rotulo'] for serie in series.values()}, {'Café'})
+
+
+class ImportacaoEstoqueTests(TestCase):
+    def setUp(self):
+        self.com_estoque = Produto.objects.create(codigo_barras='789000000301', nome='Arroz', preco=Decimal('5.00'))
+        self.sem_estoque = Produto.objects.create(codigo_barras='789000000302', nome='Feijão', preco=Decimal('7.00'))
+        Estoque.objects.create(produto=self.com_estoque, quantidade=4)
+
+    def _linhas(self, conteudo):
+        return ler_arquivo(io.BytesIO(conteudo.encode()), 'estoque.csv')
+
+    def test_incremento_soma_linhas_repetidas_e_reporta_erros(self):
+        resultado = importar_estoque(self._linhas(
+            "codigo_barras;quantidade\n789000000301;3\n789000000302;2\n789000000301;1\n000;5\n789000000302;x\n"
+        ))
+
+        self.assertEqual((resultado['atualizados'], resultado['criados']), (1, 1))
+        self.assertEqual([numero for numero, _ in resultado['erros']], [5, 6])
+        self.assertEqual(Estoque.objects.get(produto=self.com_estoque).quantidade, 8)
+        self.assertEqual(Estoque.objects.get(produto=self.sem_estoque).quantidade, 2)
+
+    def test_tudo_ou_nada_desfaz_a_importacao(self):
+        linhas = self._linhas("codigo_barras,quantidade\n789000000301,10\n789000000302,-1\n")
+        with self.assertRaises(ImportacaoInvalida):
+            importar_estoque(linhas, modo='absoluto', tudo_ou_nada=True)
+        self.assertEqual(Estoque.objects.get(produto=self.com_estoque).quantidade, 4)
+
+
+class MovimentoEstoqueTests(TestCase):
+    def setUp(self):
+        self.usuario = User.objects.create_user('caixa')
+        self.produto = Produto.objects.create(codigo_barras='789000000401', nome='Leite', preco=Decimal('4.00'))
+        movimentar(self.produto.pk, 'REPOSICAO', 10)
+
+    def test_vendas_e_devolucoes_entram_no_livro(self):
+        registrar_venda(self.usuario, 'PIX', [(self.produto, 3)])
+        ItemVenda.objects.create(venda=Venda.objects.create(usuario=self.usuario), produto=self.produto, quantidade=2)
+        movimentar(self.produto.pk, 'DEVOLUCAO', 1)
+
+        self.assertEqual(
+            list(MovimentoEstoque.objects.order_by('pk').values_list('tipo', 'quantidade')),
+            [('REPOSICAO', 10), ('VENDA', -3), ('VENDA', -2), ('DEVOLUCAO', 1)],
+        )
+        self.assertEqual(saldo(self.produto.pk), 6)
+        self.assertEqual(divergencias(), {})
+
+    def test_saldo_em_instante_passado_e_compactacao(self):
+        corte = timezone.now()
+        movimentar(self.produto.pk, 'AJUSTE', -4)
+
+        compactar(corte)
+        self.assertEqual(SaldoEstoque.objects.get(data=corte).quantidade, 10)
+        self.assertEqual(saldo(self.produto.pk, em=corte), 10)
+        self.assertEqual(saldo(self.produto.pk), 6)
+
+        with self.assertRaises(EstoqueInsuficiente):
+            movimentar(self.produto.pk, 'AJUSTE', -7)
+        self.assertEqual(saldo(self.produto.pk), 6)
+
+    def test_verificacao_com_corte_recente(self):
+        Estoque.objects.filter(produto=self.produto).update(quantidade=9)
+        compactar(timezone.now())
+
+        with self.assertRaisesMessage(CommandError, "Já existe um corte"):
+            call_command('compactar_movimentos_estoque', stdout=io.StringIO())
+        saida = io.StringIO()
+        with self.assertRaisesMessage(CommandError, "1 produtos com estoque diferente"):
+            call_command('compactar_movimentos_estoque', '--verificar', stdout=saida)
+        self.assertIn("Leite: estoque 9, livro 10", saida.getvalue())
+
+
+class RelatorioReposicaoTests(TestCase):
+    def test_giro_dias_restantes_e_sugestao(self):
+        usuario = User.objects.create_user('caixa')
+        acabando = Produto.objects.create(codigo_barras='789000000501', nome='Pão', preco=Decimal('1.00'))
+        folgado = Produto.objects.create(codigo_barras='789000000502', nome='Sal', preco=Decimal('2.00'))
+        Estoque.objects.create(produto=acabando, quantidade=40)
+        Estoque.objects.create(produto=folgado, quantidade=1000)
+        registrar_venda(usuario, 'PIX', [(acabando, 30), (folgado, 10)])
+
+        relatorio = relatorio_reposicao(dias=10, limiar_dias=7, cobertura_dias=10)
+
+        self.assertEqual([linha['nome'] for linha in relatorio], ['Pão'])
+        self.assertEqual(relatorio[0]['media_diaria'], 3.0)
+        self.assertEqual(relatorio[0]['dias_restantes'], 3.3)
+        self.assertEqual(relatorio[0]['sugestao_compra'], 20)
+        self.assertEqual(len(relatorio_reposicao(dias=10, apenas_criticos=False)), 2)
+
+    def test_itens_com_quantidade_zero_nao_tem_giro(self):
+        usuario = User.objects.create_user('caixa')
+        produto = Produto.objects.create(codigo_barras='789000000503', nome='Óleo', preco=Decimal('7.00'))
+        Estoque.objects.create(produto=produto, quantidade=10)
+        # Gravado antes de a venda exigir quantidade positiva
+        ItemVenda.objects.create(venda=Venda.objects.create(usuario=usuario), produto=produto, quantidade=0)
+
+        self.assertEqual(relatorio_reposicao(apenas_criticos=False), [])
+        self.assertEqual(relatorio_reposicao(), [])
+
+
+class PaginadorEstimadoTests(TestCase):
+    def test_contagem_limitada(self):
+        Produto.objects.bulk_create([
+            Produto(codigo_barras=f'78900000060{i}', nome=f'Produto {i}', preco=Decimal('1.00')) for i in range(5)
+        ])
+        with mock.patch.multiple(PaginadorEstimado, limite_contagem=3, paginas_adiante=0):
+            paginador = PaginadorEstimado(Produto.objects.order_by('pk'), 2)
+            self.assertEqual(paginador.count, 3)
+            self.assertTrue(paginador.contagem_limitada)
+            self.assertEqual(paginador.num_pages, 2)
+            # Além da última página conhecida ainda há registros
+            self.assertEqual([produto.nome for produto in paginador.page(3)], ['Produto 4'])
+
+            # Pedindo uma página adiante, a contagem vai até ela
+            adiante = PaginadorEstimado(Produto.objects.order_by('pk'), 2, pagina=3)
+            self.assertEqual(adiante.count, 5)
+            self.assertFalse(adiante.contagem_limitada)
+
+        exato = PaginadorEstimado(Produto.objects.order_by('pk'), 2)
+        self.assertEqual(exato.count, 5)
+        self.assertFalse(exato.aproximado)
+
+
+class ListagensAdminTests(TestCase):
+    # Sessão, usuário, contagem limitada e a página; o LogEntry ainda lista usuários e tipos no filtro
+    LISTAGENS = [
+        ('admin:core_itemvenda_changelist', 4),
+        ('admin:core_movimentoestoque_changelist', 4),
+        ('admin:admin_logentry_changelist', 6),
+    ]
+
+    def setUp(self):
+        self.usuario = User.objects.create_superuser('gerente', 'gerente@exemplo.com', 'senha')
+        self.client.force_login(self.usuario)
+        self.produto = Produto.objects.create(codigo_barras='789000000701', nome='Arroz', preco=Decimal('5.00'))
+        Estoque.objects.create(produto=self.produto, quantidade=100)
+
+    def _vender(self, vendas):
+        for _ in range(vendas):
+            venda = registrar_venda(self.usuario, 'PIX', [(self.produto, 1)])
+            LogEntry.objects.log_actions(self.usuario.pk, [venda], ADDITION)
+
+    def test_consultas_nao_crescem_com_as_linhas(self):
+        for vendas in (3, 40):
+            self._vender(vendas)
+            for nome, consultas in self.LISTAGENS:
+                with self.subTest(nome, vendas=vendas), self.assertNumQueries(consultas):
+                    self.assertEqual(self.client.get(reverse(nome)).status_code, 200)
+
+    def test_total_limitado_nao_aparece_como_exato(self):
+        self._vender(23)
+        url = reverse('admin:core_itemvenda_changelist')
+        with mock.patch.object(admin.site._registry[ItemVenda], 'list_per_page', 5), \
+                mock.patch.multiple(PaginadorEstimado, limite_contagem=10, paginas_adiante=0):
+            self.assertContains(self.client.get(url), "mais de 10 item vendas")
+            # As páginas continuam além do limite, até a última
+            resposta = self.client.get(url, {'p': 5})
+            self.assertEqual(len(resposta.context['cl'].result_list), 3)
+            self.assertContains(resposta, "23 item vendas")
+
+class BuscaProdutosTests(TestCase):
+    def setUp(self):
+        Produto.objects.create(codigo_barras='789100000001', nome='Café Torrado Extra Forte', preco=Decimal('15.00'))
+        Produto.objects.create(codigo_barras='789100000002', nome='Açúcar Refinado', preco=Decimal('4.50'))
+        self.renomeado = Produto.objects.create(codigo_barras='789200000003', nome='Feijão', preco=Decimal('8.00'))
+
+    def test_prefixo_sem_acento_e_codigo(self):
+        self.assertEqual([p['nome'] for p in buscar_produtos('cafe torr')], ['Café Torrado Extra Forte'])
+        self.assertEqual([p['nome'] for p in buscar_produtos('acucar')], ['Açúcar Refinado'])
+        self.assertEqual(len(buscar_produtos('7891')), 2)
+        self.assertEqual(buscar_produtos('!!'), [])
+
+    def test_indice_acompanha_alteracoes(self):
+        self.renomeado.nome = 'Lentilha'
+        self.renomeado.save()
+        Produto.objects.filter(codigo_barras='789100000002').delete()
+
+        self.assertFalse(filtrar_produtos(Produto.objects.all(), 'feijao').exists())
+        self.assertEqual(list(filtrar_produtos(Produto.objects.all(), 'lent')), [self.renomeado])
+        self.assertFalse(filtrar_produtos(Produto.objects.all(), 'acucar').exists())
+
+
+class CatalogoCodigoBarrasTests(TestCase):
+    def setUp(self):
+        cache_produtos.limpar()
+        self.usuario = User.objects.create_user('gerente', is_staff=True)
+        self.client.force_login(self.usuario)
+        self.produto = Produto.objects.create(codigo_barras='789000001001', nome='Aveia', preco=Decimal('9.00'))
+        Estoque.objects.create(produto=self.produto, quantidade=10)
+        self.url = reverse('produto_por_codigo_barras', args=[self.produto.codigo_barras])
+
+    def test_leituras_repetidas_saem_do_cache(self):
+        self.assertEqual(self.client.get(self.url).json()['estoque'], 10)
+        # Só sessão e usuário: o produto não é consultado de novo
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.get(self.url).json()['preco'], '9.00')
+        self.assertEqual(self.client.get(reverse('produto_por_codigo_barras', args=['000'])).status_code, 404)
+
+    def test_alteracoes_removem_o_produto_do_cache_depois_do_commit(self):
+        self.client.get(self.url)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.produto.preco = Decimal('9.50')
+            self.produto.save()
+        self.assertIsNotNone(cache_produtos.get(self.produto.codigo_barras))
+        for callback in callbacks:
+            callback()
+        self.assertIsNone(cache_produtos.get(self.produto.codigo_barras))
+        self.assertEqual(self.client.get(self.url).json()['preco'], '9.50')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            registrar_venda(self.usuario, 'PIX', [(self.produto, 3)])
+        self.assertEqual(self.client.get(self.url).json()['estoque'], 7)
+
+
+class HistoricoVendasTests(TestCase):
+    def test_cursor_percorre_todas_as_vendas_uma_vez(self):
+        usuario = User.objects.create_user('caixa')
+        produto = Produto.objects.create(codigo_barras='789000000701', nome='Água', preco=Decimal('2.00'))
+        Estoque.objects.create(produto=produto, quantidade=100)
+        vendas = [registrar_venda(usuario, 'PIX', [(produto, 1)]) for _ in range(5)]
+        # Duas vendas no mesmo instante: o id desempata
+        Venda.objects.filter(pk__in=[vendas[1].pk, vendas[2].pk]).update(data=vendas[1].data)
+
+        vistas, cursor = [], None
+        while True:
+            with self.assertNumQueries(2):
+                pagina = pagina_vendas(cursor, limite=2)
+            vistas += [venda['id'] for venda in pagina['vendas']]
+            cursor = pagina['proximo']
+            if cursor is None:
+                break
+
+        self.assertEqual(sorted(vistas), sorted(venda.pk for venda in vendas))
+        self.assertEqual(len(vistas), 5)
+        self.assertEqual(pagina['vendas'][-1]['itens'][0]['produto'], 'Água')
+
+
+class SincronizacaoIncrementalTests(TestCase):
+    def setUp(self):
+        self.usuario = User.objects.create_user('caixa')
+        self.produto = Produto.objects.create(codigo_barras='789000000801', nome='Pão', preco=Decimal('1.50'))
+        Estoque.objects.create(produto=self.produto, quantidade=100)
+
+    def test_lotes_trazem_so_o_que_mudou_desde_a_marca(self):
+        vendas = [registrar_venda(self.usuario, 'PIX', [(self.produto, 1)]) for _ in range(3)]
+
+        ids, marca = [], None
+        while True:
+            saida = io.StringIO()
+            total, marca = exportar_alteracoes('vendas', saida, marca=marca, limite=2, atraso=timedelta(0))
+            if not total:
+                break
+            ids += [json.loads(linha)['id'] for linha in saida.getvalue().splitlines()]
+        self.assertEqual(ids, [venda.pk for venda in vendas])
+
+        # Depois da marca, só a alteração nova volta
+        total, marca_estoque = exportar_alteracoes('estoque', io.StringIO(), 'csv', atraso=timedelta(0))
+        self.assertEqual(total, 1)
+        movimentar(self.produto.pk, 'AJUSTE', 5)
+        saida = io.StringIO()
+        self.assertEqual(exportar_alteracoes('estoque', saida, 'csv', marca_estoque, atraso=timedelta(0))[0], 1)
+        self.assertIn(',102', saida.getvalue())
+        self.assertEqual(exportar_alteracoes('vendas', io.StringIO(), marca=marca, atraso=timedelta(0))[0], 0)
+
+    def test_comando_guarda_a_marca_do_consumidor(self):
+        registrar_venda(self.usuario, 'PIX', [(self.produto, 2)])
+        saida = io.StringIO()
+        call_command('exportar_alteracoes', 'bi', 'itens', '--atraso=0', stdout=saida, stderr=io.StringIO())
+        self.assertIn('Pão', saida.getvalue())
+        self.assertIsNotNone(marca_salva('bi', 'itens'))
+        self.assertIsNone(marca_salva('outro', 'itens'))
+
+        saida = io.StringIO()
+        call_command('exportar_alteracoes', 'bi', 'itens', '--atraso=0', stdout=saida, stderr=io.StringIO())
+        self.assertEqual(saida.getvalue(), '')
+
+
+class InstantaneoColunarTests(TestCase):
+    def test_meses_atravessam_a_virada_do_ano(self):
+        inicio = timezone.make_aware(datetime(2024, 11, 30, 23, 0))
+        fim = timezone.make_aware(datetime(2025, 2, 1, 0, 30))
+        self.assertEqual(list(meses(inicio, fim)), [(2024, 11), (2024, 12), (2025, 1), (2025, 2)])
+
+    def test_comando_exige_pyarrow(self):
+        with mock.patch('core.colunar.pa', None):
+            with self.assertRaisesMessage(CommandError, "pyarrow"):
+                call_command('exportar_parquet', 'itens.parquet', stdout=io.StringIO())
+
+    @skipUnless(pa, "pyarrow não instalado")
+    def test_particoes_e_acrescimo(self):
+        usuario = User.objects.create_user('caixa')
+        produto = Produto.objects.create(codigo_barras='789000000501', nome='Feijão', preco=Decimal('8.00'))
+        Estoque.objects.create(produto=produto, quantidade=20)
+        agora = timezone.localtime()
+        inicio_mes = agora.replace(day=1, hour=12, minute=0, second=0, microsecond=0)
+        mes_passado = inicio_mes - timedelta(days=1)
+        retrasado = mes_passado.replace(day=1) - timedelta(days=1)
+
+        def vender(quando, quantidade):
+            venda = registrar_venda(usuario, 'PIX', [(produto, quantidade)])
+            Venda.objects.filter(pk=venda.pk).update(data=quando)
+
+        vender(retrasado, 2)
+        vender(agora, 1)
+        with tempfile.TemporaryDirectory() as saida:
+            # O mês corrente fica de fora; o mês passado, sem venda, não ganha partição
+            self.assertEqual(gravar_instantaneo(saida, particionar=True), {(retrasado.year, retrasado.month): 1})
+            arquivo = os.path.join(particao(saida, retrasado.year, retrasado.month), 'itens.parquet')
+            gravado_em = os.path.getmtime(arquivo)
+
+            vender(mes_passado, 3)
+            vender(retrasado, 4)
+            self.assertEqual(gravar_instantaneo(saida, particionar=True, acrescentar=True),
+                             {(mes_passado.year, mes_passado.month): 1})
+            self.assertEqual(os.path.getmtime(arquivo), gravado_em)
+
+            tabela = pq.read_table(saida).sort_by('venda_id')
+            self.assertEqual(tabela.column('quantidade').to_pylist(), [2, 3])
+            self.assertEqual(tabela.column('subtotal').to_pylist(), [Decimal('16.00'), Decimal('24.00')])
+            self.assertEqual(tabela.column('produto').to_pylist(), ['Feijão', 'Feijão'])
+
+
+class RelatorioPeriodoTests(TestCase):
+    def test_periodo_anterior(self):
+        self.assertEqual(periodo_anterior(date(2025, 3, 1), date(2025, 3, 31)), (date(2025, 2, 1), date(2025, 2, 28)))
+        self.assertEqual(periodo_anterior(date(2025, 3, 10), date(2025, 3, 12)), (date(2025, 3, 7), date(2025, 3, 9)))
+
+    def test_periodo_encerrado_fica_guardado_ate_uma_correcao(self):
+        usuario = User.objects.create_user('caixa')
+        produto = Produto.objects.create(codigo_barras='789000000901', nome='Leite', preco=Decimal('5.00'))
+        Estoque.objects.create(produto=produto, quantidade=10)
+        registrar_venda(usuario, 'PIX', [(produto, 2)])
+        registrar_venda(usuario, 'DINHEIRO', [(produto, 1)])
+        # Leva as vendas para ontem, que já é um período encerrado
+        ontem = localdate() - timedelta(days=1)
+        Venda.objects.update(data=timezone.now() - timedelta(days=1))
+        VendaDiaria.objects.update(data=ontem)
+
+        relatorio = relatorio_periodo(ontem, ontem)
+        self.assertEqual(relatorio['totais'], {'valor': '15.00', 'vendas': 2, 'itens': 3, 'ticket_medio': '7.50'})
+        self.assertEqual(relatorio['usuarios'][0]['valor'], '15.00')
+        self.assertEqual(relatorio['produtos'][0]['unidades'], 3)
+        with self.assertNumQueries(1):
+            self.assertEqual(relatorio_periodo(ontem, ontem), relatorio)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ItemVenda.objects.filter(venda__forma_pagamento='DINHEIRO').get().delete()
+        self.assertFalse(RelatorioPeriodo.objects.exists())
+        self.assertEqual(relatorio_periodo(ontem, ontem)['totais']['valor'], '10.00')
 
-# Create your tests here.
@@ -1,8 +1,24 @@
 from django import views
 from django.urls import path
-from .views import home, DashboardVendasView
+from .views import (
+    home, DashboardVendasView, DashboardVendasAsyncView, exportar, metricas_requisicoes, produto_por_codigo_barras,
+    produto_por_codigo_barras_async, serie_vendas_api, busca_produtos, historico_vendas,
+    alteracoes,
+)
 
 urlpatterns = [
     path('', home, name='home'),
     path('dashboard/', DashboardVendasView.as_view(), name='dashboard_vendas'),
+    path('exportar/<str:recurso>.<str:formato>', exportar, name='exportar'),
+    path('metricas/', metricas_requisicoes, name='metricas_requisicoes'),
+    path('api/produtos/codigo/<str:codigo_barras>/', produto_por_codigo_barras, name='produto_por_codigo_barras'),
+    path('api/produtos/busca/', busca_produtos, name='busca_produtos'),
+    path('api/vendas/', historico_vendas, name='historico_vendas'),
+    path('api/vendas/serie/', serie_vendas_api, name='serie_vendas'),
+    path('api/alteracoes/<str:recurso>.<str:formato>', alteracoes, name='alteracoes'),
+
+    # Versões assíncronas, para quando o projeto roda em ASGI (ver estoque_vendas/asgi.py)
+    path('async/dashboard/', DashboardVendasAsyncView.as_view(), name='dashboard_vendas_async'),
+    path('async/api/produtos/codigo/<str:codigo_barras>/', produto_por_codigo_barras_async,
+         name='produto_por_codigo_barras_async'),
 ]
\ No newline at end of file
@@ -1,7 +1,20 @@
-from django.utils.timezone import now
-from django.views.generic import TemplateView
-from .models import Venda, ItemVenda
-from django.db.models import Sum, ExpressionWrapper, F, DecimalField, Count
+import io
+from datetime import datetime, time, timedelta
+
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.exceptions import ValidationError
+from django.http import Http404, HttpResponse, JsonResponse
+from django.utils.dateparse import parse_date
+from django.utils.timezone import localdate, make_aware
+from django.views.generic import TemplateView, View
+from .middleware import configuracao as configuracao_metricas, registro as registro_metricas
+from .exports import RECURSOS, FORMATOS, filtrar_periodo, resposta_exportacao
+from .catalogo import produto_por_codigo, aproduto_por_codigo
+from .dashboard import contexto_dashboard, acontexto_dashboard
+from .analise import serie_vendas
+from .busca import buscar_produtos
+from .historico import LIMITE_PADRAO, pagina_vendas
+from .sincronizacao import FORMATOS_ALTERACOES, exportar_alteracoes, marca_salva, salvar_marca
 from django.shortcuts import render
 
 
@@ -15,56 +28,169 @@ class DashboardVendasView(TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
 
-        # Total geral vendido
-        total_geral = Venda.objects.annotate(
-            total_venda=Sum(
-                ExpressionWrapper(
-                    F('itens__quantidade') * F('itens__preco_unitario'),
-                    output_field=DecimalField()
-                )
-            )
-        ).aggregate(total=Sum('total_venda'))['total'] or 0
-
-        # Total vendido no mês atual
-        hoje = now()
-        total_mes = Venda.objects.filter(
-            data__year=hoje.year,
-            data__month=hoje.month
-        ).annotate(
-            total_venda=Sum(
-                ExpressionWrapper(
-                    F('itens__quantidade') * F('itens__preco_unitario'),
-                    output_field=DecimalField()
-                )
-            )
-        ).aggregate(total=Sum('total_venda'))['total'] or 0
-
-        # Quantidade total de itens vendidos
-        total_itens_geral = ItemVenda.objects.aggregate(total=Sum('quantidade'))['total'] or 0
-
-        # Quantidade de itens vendidos no mês atual
-        total_itens_mes = ItemVenda.objects.filter(
-            venda__data__year=hoje.year,
-            venda__data__month=hoje.month
-        ).aggregate(total=Sum('quantidade'))['total'] or 0
-
-        inicio_mes = hoje.replace(day=1)
-
-        # Contagem total por forma de pagamento
-        formas_geral = Venda.objects.values('forma_pagamento').annotate(total=Count('id'))
-
-        # Contagem mensal por forma de pagamento
-        formas_mes = Venda.objects.filter(data__gte=inicio_mes).values('forma_pagamento').annotate(total=Count('id'))
-
-        context['formas_geral'] = list(formas_geral)
-        context['formas_mes'] = list(formas_mes)
-
-        # Adiciona ao contexto do template
-        context.update({
-            'total_geral': total_geral,
-            'total_mes': total_mes,
-            'total_itens_geral': total_itens_geral,
-            'total_itens_mes': total_itens_mes,
-        })
+        # Totais lidos do resumo diário, com o histórico e o mês atual em cache separados
+        context.update(contexto_dashboard())
+        # A série vem de uma API só para a equipe
+        context['mostrar_serie'] = self.request.user.is_staff
 
         return context
+
+
+class DashboardVendasAsyncView(View):
+    """Mesmo dashboard, para o modo ASGI: os totais independentes são consultados em paralelo."""
+
+    template_name = DashboardVendasView.template_name
+
+    async def get(self, request, *args, **kwargs):
+        # request.user carrega o usuário de forma síncrona: no template isso quebraria a view assíncrona
+        user = await request.auser()
+        context = {**await acontexto_dashboard(), 'mostrar_serie': user.is_staff}
+        return render(request, self.template_name, context)
+
+
+@staff_member_required
+def exportar(request, recurso, formato):
+    if recurso not in RECURSOS or formato not in FORMATOS:
+        raise Http404("Exportação não disponível.")
+
+    resource = RECURSOS[recurso]()
+
+    # Filtro opcional por período (?inicio=AAAA-MM-DD&fim=AAAA-MM-DD)
+    queryset = filtrar_periodo(
+        recurso,
+        resource.get_queryset(),
+        parse_date(request.GET.get('inicio', '')),
+        parse_date(request.GET.get('fim', '')),
+    )
+
+    return resposta_exportacao(resource, formato, f"{recurso}-{localdate():%Y-%m-%d}", queryset)
+
+
+@staff_member_required
+def serie_vendas_api(request):
+    """Série temporal de vendas para os gráficos.
+
+    Parâmetros (todos opcionais): inicio e fim (AAAA-MM-DD, padrão últimos 30 dias), granularidade
+    (hora, dia, semana, mes), dimensao (forma_pagamento, produto), media_movel (períodos) e limite.
+    """
+    fim = parse_date(request.GET.get('fim', '')) or localdate()
+    inicio = parse_date(request.GET.get('inicio', '')) or fim - timedelta(days=29)
+    try:
+        media_movel = int(request.GET.get('media_movel', 7))
+        limite_series = int(request.GET.get('limite', 10))
+    except ValueError:
+        return JsonResponse({'erro': "media_movel e limite devem ser números inteiros."}, status=400)
+    try:
+        dados = serie_vendas(
+            inicio,
+            fim,
+            granularidade=request.GET.get('granularidade', 'dia'),
+            dimensao=request.GET.get('dimensao') or None,
+            media_movel=media_movel,
+            limite_series=limite_series,
+        )
+    except ValidationError as erro:
+        return JsonResponse({'erro': erro.messages[0]}, status=400)
+    return JsonResponse(dados)
+
+
+@staff_member_required
+def historico_vendas(request):
+    """Vendas com itens, em ordem de data, paginadas por cursor.
+
+    Parâmetros opcionais: inicio e fim (AAAA-MM-DD, inclusive), usuario (id), forma_pagamento, limite e
+    cursor (o valor de "proximo" da página anterior; ausente na última página).
+    """
+    inicio = parse_date(request.GET.get('inicio', ''))
+    fim = parse_date(request.GET.get('fim', ''))
+    try:
+        dados = pagina_vendas(
+            cursor=request.GET.get('cursor'),
+            limite=int(request.GET.get('limite', LIMITE_PADRAO)),
+            usuario=int(request.GET['usuario']) if request.GET.get('usuario') else None,
+            forma_pagamento=request.GET.get('forma_pagamento'),
+            inicio=make_aware(datetime.combine(inicio, time.min)) if inicio else None,
+            fim=make_aware(datetime.combine(fim + timedelta(days=1), time.min)) if fim else None,
+        )
+    except ValueError:
+        return JsonResponse({'erro': "usuario e limite devem ser números inteiros."}, status=400)
+    except ValidationError as erro:
+        return JsonResponse({'erro': erro.messages[0]}, status=400)
+    return JsonResponse(dados)
+
+
+# Tamanho do lote devolvido por chamada do feed de alterações
+LIMITE_ALTERACOES = 10000
+
+
+@staff_member_required
+def alteracoes(request, recurso, formato):
+    """Próximo lote de linhas alteradas para o consumidor (?consumidor=...), em JSON Lines ou CSV.
+
+    A marca do fim do lote vem no cabeçalho X-Marca. Ao pedir o lote seguinte com ?desde=<marca>, o
+    consumidor confirma o anterior e a marca é guardada; sem desde, continua da última marca confirmada.
+    Assim um lote perdido no caminho é entregue de novo. Sem linhas, o consumidor já está em dia.
+    """
+    if recurso not in RECURSOS or formato not in FORMATOS_ALTERACOES:
+        raise Http404("Exportação não disponível.")
+    consumidor = request.GET.get('consumidor', '').strip()
+    if not consumidor:
+        return JsonResponse({'erro': "Informe o consumidor."}, status=400)
+
+    saida = io.StringIO()
+    try:
+        limite = min(int(request.GET.get('limite', LIMITE_ALTERACOES)), LIMITE_ALTERACOES)
+        marca = request.GET.get('desde')
+        if marca:
+            salvar_marca(consumidor, recurso, marca)
+        else:
+            marca = marca_salva(consumidor, recurso)
+        total, nova_marca = exportar_alteracoes(recurso, saida, formato, marca, max(limite, 1))
+    except ValueError:
+        return JsonResponse({'erro': "limite deve ser um número inteiro."}, status=400)
+    except ValidationError as erro:
+        return JsonResponse({'erro': erro.messages[0]}, status=400)
+
+    content_type = 'text/csv' if formato == 'csv' else 'application/x-ndjson'
+    resposta = HttpResponse(saida.getvalue(), content_type=f'{content_type}; charset=utf-8')
+    resposta['X-Marca'] = nova_marca or ''
+    resposta['X-Linhas'] = total
+    return resposta
+
+
+@staff_member_required
+def metricas_requisicoes(request):
+    if request.method == 'POST':
+        registro_metricas.limpar()
+    return render(request, 'metricas_requisicoes.html', {
+        'metricas': registro_metricas.resumo(),
+        'limiar_lento_ms': configuracao_metricas('LIMIAR_LENTO_MS', 500),
+        'limiar_consultas': configuracao_metricas('LIMIAR_CONSULTAS', 50),
+    })
+
+
+@staff_member_required
+def produto_por_codigo_barras(request, codigo_barras):
+    """Consulta usada pelos leitores de código de barras no caixa: nome, preço e estoque disponível."""
+    dados = produto_por_codigo(codigo_barras)
+    if dados is None:
+        return JsonResponse({'erro': "Produto não encontrado."}, status=404)
+    return JsonResponse(dados)
+
+
+@staff_member_required
+def busca_produtos(request):
+    """Busca do caixa enquanto se digita: ?q=parte do nome ou do código de barras (&limite=20)."""
+    try:
+        limite = min(int(request.GET.get('limite', 20)), 100)
+    except ValueError:
+        return JsonResponse({'erro': "limite deve ser um número inteiro."}, status=400)
+    return JsonResponse({'produtos': buscar_produtos(request.GET.get('q', ''), limite)})
+
+
+@staff_member_required
+async def produto_por_codigo_barras_async(request, codigo_barras):
+    dados = await aproduto_por_codigo(codigo_barras)
+    if dados is None:
+        return JsonResponse({'erro': "Produto não encontrado."}, status=404)
+    return JsonResponse(dados)
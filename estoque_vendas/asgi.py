@@ -3,6 +3,15 @@ ASGI config for estoque_vendas project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Modo ASGI: as views em /async/ (dashboard e consulta por código de barras) são
+assíncronas e executam as consultas independentes em paralelo. Exemplo com uvicorn:
+
+    pip install uvicorn
+    uvicorn estoque_vendas.asgi:application --workers 4
+
+As views síncronas continuam funcionando normalmente nesse modo. Com mais de um
+worker, configure um cache compartilhado para o dashboard (DASHBOARD_CACHE_BACKEND).
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -46,6 +47,7 @@ INSTALLED_APPS += [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricasRequisicaoMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -57,6 +59,12 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'estoque_vendas.urls'
 
+# Métricas por requisição (core.middleware.MetricasRequisicaoMiddleware)
+METRICAS_LIMIAR_LENTO_MS = 500  # Requisições mais lentas que isso vão para o log
+METRICAS_LIMIAR_CONSULTAS = 50  # Requisições com mais consultas que isso vão para o log
+METRICAS_CONSULTAS_NO_LOG = 5  # Quantas das consultas mais lentas aparecem no log
+METRICAS_AMOSTRAS_POR_VIEW = 1000  # Amostras mantidas em memória por view para os percentis
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -78,13 +86,74 @@ WSGI_APPLICATION = 'estoque_vendas.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# Perfil escolhido por variáveis de ambiente: SQLite por padrão, DB_ENGINE=postgresql em produção.
+
+if os.environ.get('DB_ENGINE', 'sqlite') == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DB_NAME', 'estoque_vendas'),
+            'USER': os.environ.get('DB_USER', ''),
+            'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+            'HOST': os.environ.get('DB_HOST', ''),
+            'PORT': os.environ.get('DB_PORT', ''),
+            # Conexões persistentes entre requisições, testadas antes de reutilizar
+            'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {},
+        }
     }
+    if os.environ.get('DB_POOL') == '1':
+        # Pool do psycopg (exige psycopg[pool]); substitui as conexões persistentes
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': int(os.environ.get('DB_POOL_MIN', 2)),
+            'max_size': int(os.environ.get('DB_POOL_MAX', 10)),
+            'timeout': int(os.environ.get('DB_POOL_TIMEOUT', 10)),
+        }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'OPTIONS': {},
+        }
+    }
+    if os.environ.get('DB_SQLITE_AJUSTES', '1') == '1':
+        DATABASES['default']['OPTIONS'] = {
+            # Espera (busy_timeout, em segundos) em vez de falhar com "database is locked"
+            'timeout': int(os.environ.get('DB_TIMEOUT', 20)),
+            # Transações pegam o lock de escrita logo no início: sem deadlock ao promover leitura para escrita
+            'transaction_mode': 'IMMEDIATE',
+            # Executado a cada nova conexão. WAL deixa leituras seguirem durante uma escrita; com WAL,
+            # synchronous=NORMAL só sincroniza o disco nos checkpoints
+            'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL',
+        }
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# O dashboard usa um cache próprio. O padrão (memória local) vale por processo; com vários
+# workers, use um backend compartilhado, ex.: DASHBOARD_CACHE_BACKEND=django.core.cache.backends.filebased.FileBasedCache
+# e DASHBOARD_CACHE_LOCATION=/var/tmp/dashboard_cache
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'dashboard': {
+        'BACKEND': os.environ.get('DASHBOARD_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('DASHBOARD_CACHE_LOCATION', 'dashboard'),
+    },
 }
 
+DASHBOARD_CACHE_TTL_HISTORICO = 24 * 60 * 60  # Meses anteriores: invalidado por sinal, TTL só como garantia
+DASHBOARD_CACHE_TTL_MES = 60  # Mês atual
+
+# Cache em memória da consulta por código de barras (core.catalogo)
+CATALOGO_CACHE_TAMANHO = 10000  # Produtos mantidos em cache por processo
+CATALOGO_CACHE_TTL = 30  # Segundos; limita o atraso do estoque exibido entre processos
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -122,6 +191,28 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Arquivos gerados pelo sistema (ex.: exportações em segundo plano)
+MEDIA_URL = 'media/'
+MEDIA_ROOT = BASE_DIR / 'media'
+
+# Logging
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'core': {
+            'handlers': ['console'],
+            'level': 'INFO',
+        },
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 